@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+# --- ANALÍTICA DE FORMA SOBRE LA MATRIZ DE LA LIGA ---
+# Estadísticas por jugador calculadas de una vez para TODOS los jugadores con
+# operaciones vectorizadas sobre MatrizLiga (sin bucles por jugador ni consultas):
+# medias móviles, rachas por encima/debajo de un umbral, regularidad y jornadas a 0.
+# Una jornada sin registro cuenta como 0 puntos, igual que en la Tabla Completa.
+
+
+def medias_moviles(m, ventana, filas=None):
+    """Media de las últimas 'ventana' jornadas de cada jugador (o solo de 'filas') en
+    cada jornada de la liga. Devuelve un array float (jugadores, n_jornadas); en las
+    primeras jornadas la ventana es la que haya disponible. Dos lecturas de las sumas
+    prefijas por celda."""
+    acumulado = m.acumulado if filas is None else m.acumulado[filas]
+    ventana = max(1, int(ventana))
+    hasta = np.arange(1, len(m.jornadas) + 1)
+    desde = np.maximum(hasta - ventana, 0)
+    return (acumulado[:, hasta] - acumulado[:, desde]) / (hasta - desde)
+
+
+def longitudes_racha(cumple):
+    """Para una matriz booleana (n_jugadores, n_jornadas), la longitud de la racha de
+    True que termina en cada celda (0 donde no se cumple)."""
+    columnas = np.arange(cumple.shape[1])
+    # Última columna que rompió la racha (-1 si aún no se ha roto ninguna)
+    ultimo_corte = np.maximum.accumulate(np.where(cumple, -1, columnas), axis=1)
+    return np.where(cumple, columnas - ultimo_corte, 0)
+
+
+def rachas(cumple):
+    """(mejor racha, racha actual) de cada jugador sobre una matriz booleana."""
+    if cumple.shape[1] == 0:
+        ceros = np.zeros(cumple.shape[0], dtype=np.int64)
+        return ceros, ceros
+    longitudes = longitudes_racha(cumple)
+    return longitudes.max(axis=1), longitudes[:, -1]
+
+
+def dispersion(m):
+    """Media, desviación típica y coeficiente de variación (%) de cada jugador sobre
+    las jornadas con registro (sumas de x y x² de una pasada)."""
+    jugadas = m.acumulado_presente[:, -1]
+    divisor = np.maximum(jugadas, 1)
+    media = m.acumulado[:, -1] / divisor
+    cuadrados = np.einsum('ij,ij->i', m.puntos, m.puntos)
+    varianza = np.maximum(cuadrados / divisor - media ** 2, 0)
+    desviacion = np.sqrt(varianza)
+    variacion = np.divide(100 * desviacion, media, out=np.zeros_like(media), where=media > 0)
+    return media, desviacion, variacion
+
+
+def tabla_forma(m, ventana=5, umbral=50):
+    """Una fila por jugador con su forma (media de las últimas 'ventana' jornadas),
+    rachas con puntos >= umbral y < umbral, regularidad y jornadas a 0.
+    Ordenada por la forma (a igualdad, por orden alfabético)."""
+    columnas = ['jugador', 'Forma', 'Media', 'Diferencia', 'Racha Actual ≥ X', 'Mejor Racha ≥ X',
+                'Racha Actual < X', 'Peor Racha < X', 'Desviación', 'Coef. Variación (%)', 'Jornadas a 0']
+    if m.vacia:
+        return pd.DataFrame(columns=columnas)
+
+    forma = medias_moviles(m, ventana)[:, -1]
+    media, desviacion, variacion = dispersion(m)
+    encima = m.puntos >= umbral
+    mejor_encima, actual_encima = rachas(encima)
+    peor_debajo, actual_debajo = rachas(~encima)
+
+    df = pd.DataFrame({
+        'jugador': m.jugadores,
+        'Forma': np.round(forma, 2),
+        'Media': np.round(media, 2),
+        'Diferencia': np.round(forma - media, 2),
+        'Racha Actual ≥ X': actual_encima,
+        'Mejor Racha ≥ X': mejor_encima,
+        'Racha Actual < X': actual_debajo,
+        'Peor Racha < X': peor_debajo,
+        'Desviación': np.round(desviacion, 2),
+        'Coef. Variación (%)': np.round(variacion, 1),
+        'Jornadas a 0': (m.puntos == 0).sum(axis=1),
+    }, columns=columnas)
+    return df.sort_values(by='Forma', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def evolucion_forma(m, ventana, jugadores):
+    """Tabla jornadas × jugadores con la media móvil de los jugadores indicados (para el gráfico)."""
+    medias = medias_moviles(m, ventana, np.searchsorted(m.jugadores, jugadores))
+    return pd.DataFrame(np.round(medias.T, 2), index=pd.Index(m.jornadas, name='jornada'), columns=list(jugadores))
+
+
+# --- EVOLUCIÓN DE LA CLASIFICACIÓN ---
+# Sobre m.posiciones (puesto tras cada jornada, calculado una vez por versión de la liga).
+
+def evolucion_posiciones(m, jugadores):
+    """Tabla larga (jornada, jugador, puesto) de los jugadores indicados (para el gráfico)."""
+    filas = np.searchsorted(m.jugadores, jugadores)
+    puestos = m.posiciones[filas]
+    return pd.DataFrame({
+        'jornada': np.tile(m.jornadas, len(filas)),
+        'jugador': np.repeat(np.asarray(jugadores, dtype=object), len(m.jornadas)),
+        'puesto': puestos.ravel().astype(np.int64),
+    })
+
+
+def mayores_escaladas(m, j_desde):
+    """Puestos ganados por cada jugador desde la jornada 'j_desde' hasta la última,
+    con su mejor y peor puesto en ese tramo. Ordenada de más a menos puestos ganados."""
+    columnas = ['jugador', 'Puesto Inicial', 'Puesto Actual', 'Puestos Ganados', 'Mejor Puesto', 'Peor Puesto']
+    if m.vacia:
+        return pd.DataFrame(columns=columnas)
+    desde = min(np.searchsorted(m.jornadas, j_desde, side='left'), len(m.jornadas) - 1)
+    tramo = m.posiciones[:, desde:].astype(np.int64)
+    df = pd.DataFrame({
+        'jugador': m.jugadores,
+        'Puesto Inicial': tramo[:, 0],
+        'Puesto Actual': tramo[:, -1],
+        'Puestos Ganados': tramo[:, 0] - tramo[:, -1],
+        'Mejor Puesto': tramo.min(axis=1),
+        'Peor Puesto': tramo.max(axis=1),
+    }, columns=columnas)
+    return df.sort_values(by=['Puestos Ganados', 'Puesto Actual'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+
+# --- CARA A CARA ---
+# Victorias, empates y derrotas jornada a jornada entre cada par de jugadores, contando
+# solo las jornadas en las que ambos tienen registro. Las comparaciones se hacen por
+# difusión (bloque de filas × todos los jugadores × jornadas) en bloques de como mucho
+# CELDAS_CARA_A_CARA celdas; jornadas comunes y diferencia de puntos son productos de matrices.
+CELDAS_CARA_A_CARA = 8_000_000
+MAX_JUGADORES_MATRIZ = 500  # La matriz N×N completa solo se calcula y muestra hasta este tamaño
+
+def cara_a_cara(m, filas=None, celdas_por_bloque=CELDAS_CARA_A_CARA):
+    """Enfrentamientos de los jugadores de 'filas' (todos si es None) contra todos.
+    Devuelve (victorias, empates, derrotas, diferencia), arrays (len(filas), n_jugadores):
+    jornadas comunes ganadas / empatadas / perdidas y puntos a favor menos en contra en ellas."""
+    num_jugadores, num_jornadas = m.puntos.shape
+    filas = np.arange(num_jugadores) if filas is None else np.asarray(filas, dtype=np.int64)
+    tipo = np.min_scalar_type(max(num_jornadas, 1))
+
+    presente = m.presente.astype(np.float64)
+    puntos = m.puntos.astype(np.float64)
+    comunes = (presente[filas] @ presente.T).astype(tipo)
+    diferencia = (puntos[filas] @ presente.T - presente[filas] @ puntos.T).astype(np.int64)
+
+    # Las ausencias se sustituyen por extremos para que nunca ganen ni pierdan:
+    # así cada celda es una sola comparación, sin máscara de "ambos presentes"
+    minimo, maximo = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+    propios_ganan = np.where(m.presente, m.puntos, minimo).astype(np.int32)
+    propios_pierden = np.where(m.presente, m.puntos, maximo).astype(np.int32)
+
+    victorias = np.zeros((len(filas), num_jugadores), dtype=tipo)
+    derrotas = np.zeros((len(filas), num_jugadores), dtype=tipo)
+    tam_bloque = max(1, celdas_por_bloque // max(num_jugadores * num_jornadas, 1))
+    for desde in range(0, len(filas), tam_bloque):
+        bloque = filas[desde:desde + tam_bloque]
+        hasta = desde + len(bloque)
+        # (b, 1, J) contra (1, N, J)
+        victorias[desde:hasta] = (propios_ganan[bloque, None, :] > propios_pierden[None, :, :]).sum(axis=2, dtype=tipo)
+        derrotas[desde:hasta] = (propios_pierden[bloque, None, :] < propios_ganan[None, :, :]).sum(axis=2, dtype=tipo)
+    empates = comunes - victorias - derrotas
+    return victorias, empates, derrotas, diferencia
+
+
+def tabla_cara_a_cara(m, jugador):
+    """Balance de 'jugador' contra cada rival (una fila por rival), ordenado por victorias."""
+    columnas = ['Rival', 'Jornadas Comunes', 'Victorias', 'Empates', 'Derrotas', 'Diferencia de Puntos']
+    fila = np.searchsorted(m.jugadores, jugador)
+    if m.vacia or fila >= len(m.jugadores) or m.jugadores[fila] != jugador:
+        return pd.DataFrame(columns=columnas)
+    victorias, empates, derrotas, diferencia = (arr[0] for arr in cara_a_cara(m, [fila]))
+    rivales = np.arange(len(m.jugadores)) != fila
+    df = pd.DataFrame({
+        'Rival': m.jugadores[rivales],
+        'Jornadas Comunes': (victorias + empates + derrotas)[rivales],
+        'Victorias': victorias[rivales],
+        'Empates': empates[rivales],
+        'Derrotas': derrotas[rivales],
+        'Diferencia de Puntos': diferencia[rivales],
+    }, columns=columnas)
+    return df.sort_values(by=['Victorias', 'Diferencia de Puntos'], ascending=False, kind='stable').reset_index(drop=True)
+
+
+def matriz_cara_a_cara(m):
+    """Tabla N×N de victorias (fila sobre columna) de toda la liga, más el total por jugador."""
+    victorias, _, _, _ = cara_a_cara(m)
+    df = pd.DataFrame(victorias.astype(np.int64), index=pd.Index(m.jugadores, name='Jugador'), columns=m.jugadores)
+    df['TOTAL'] = df.sum(axis=1)
+    return df.sort_values(by='TOTAL', ascending=False, kind='stable')
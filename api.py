@@ -0,0 +1,239 @@
+import argparse
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from sqlalchemy import text
+import datos
+import matriz_liga
+from db_setup import setup_db
+
+# --- API JSON DE SOLO LECTURA ---
+# Servicio HTTP independiente de Streamlit para bots y paneles: clasificación, tabla
+# completa, media por jornada y récords de cada liga, con las mismas funciones de
+# consulta que app.py (datos.py y matriz_liga.py), sin importar Streamlit ni
+# autenticación: solo escucha en local por defecto.
+#
+# Cada respuesta lleva un ETag derivado de la versión de la liga (VersionesLiga). Cada
+# petición abre una transacción de lectura y consulta la versión vigente (una lectura
+# por clave primaria): un If-None-Match con esa versión devuelve 304 sin leer nada más,
+# y si hay que construir el cuerpo se hace en la misma transacción, así que los datos
+# corresponden exactamente a la versión con la que se guardan y se etiquetan.
+#
+# Uso:
+#   python api.py --puerto 8502
+#   curl -i http://127.0.0.1:8502/ligas/1/clasificacion
+#   curl -i -H 'If-None-Match: "1-7"' http://127.0.0.1:8502/ligas/1/clasificacion
+MAX_RESPUESTAS = 256 # Cuerpos JSON guardados (clave: ruta, parámetros y versión)
+MAX_MATRICES = 8     # Matrices de liga guardadas (clave: liga y versión)
+MAX_TAM_PAGINA = 1000
+
+engine = datos.engine
+
+class ErrorPeticion(Exception):
+    """Error de la petición: se responde con 'estado' y {'error': mensaje}."""
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+# --- LECTURA CONSISTENTE ---
+
+_cerrojo = threading.Lock()
+_respuestas = OrderedDict()
+_matrices = OrderedDict()
+
+@contextmanager
+def lectura():
+    """Conexión con una transacción de lectura abierta: la versión de la liga y los datos
+    leídos con ella salen de la misma instantánea de la BD (se deshace al salir)."""
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            # pysqlite no abre transacción para los SELECT: sin BEGIN cada consulta
+            # vería la BD tal como esté en ese momento
+            connection.exec_driver_sql("BEGIN")
+        yield connection
+
+def _guardar_lru(cache, clave, valor, maximo):
+    with _cerrojo:
+        cache[clave] = valor
+        cache.move_to_end(clave)
+        while len(cache) > maximo:
+            cache.popitem(last=False)
+
+def _leer_lru(cache, clave):
+    with _cerrojo:
+        valor = cache.get(clave)
+        if valor is not None:
+            cache.move_to_end(clave)
+        return valor
+
+def obtener_matriz(connection, liga_id, version):
+    """Matriz de la liga (la misma carga que app.obtener_matriz_liga), guardada por versión.
+    'connection' debe ser la transacción en la que se leyó 'version'."""
+    matriz = _leer_lru(_matrices, (liga_id, version))
+    if matriz is None:
+        matriz = matriz_liga.cargar_matriz_liga(connection, liga_id)
+        _guardar_lru(_matrices, (liga_id, version), matriz, MAX_MATRICES)
+    return matriz
+
+# --- RECURSOS ---
+# Cada recurso recibe (conexión, liga_id, versión, parámetros) y devuelve un objeto
+# serializable; la conexión es la transacción en la que se leyó la versión.
+
+def _registros(df):
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+def _parametro_entero(parametros, nombre, defecto, minimo=None, maximo=None):
+    valor = parametros.get(nombre, [None])[0]
+    if valor in (None, ""):
+        return defecto
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ErrorPeticion(HTTPStatus.BAD_REQUEST, f"'{nombre}' debe ser un entero")
+    if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+        raise ErrorPeticion(HTTPStatus.BAD_REQUEST, f"'{nombre}' fuera de rango ({minimo}-{maximo})")
+    return valor
+
+def recurso_clasificacion(connection, liga_id, version, parametros):
+    return _registros(datos.leer_clasificacion(connection, liga_id))
+
+def recurso_tabla(connection, liga_id, version, parametros):
+    """Tabla completa paginada (mismos parámetros que la página Tabla Completa)."""
+    matriz = obtener_matriz(connection, liga_id, version)
+    pagina = _parametro_entero(parametros, "pagina", 1, minimo=1)
+    tam_pagina = _parametro_entero(parametros, "tam", 50, minimo=1, maximo=MAX_TAM_PAGINA)
+    orden = parametros.get("orden", ["TOTAL"])[0]
+    columnas_jornada = {f"J{j}" for j in matriz.jornadas}
+    if orden not in ("TOTAL", "Jugador") and orden not in columnas_jornada:
+        raise ErrorPeticion(HTTPStatus.BAD_REQUEST, "'orden' debe ser TOTAL, Jugador o una jornada (J<n>)")
+    descendente = parametros.get("desc", ["1"])[0] not in ("0", "false")
+    busqueda = parametros.get("buscar", [""])[0]
+    j_inicio = _parametro_entero(parametros, "desde", None)
+    j_fin = _parametro_entero(parametros, "hasta", None)
+    if matriz.vacia:
+        return {"total_filas": 0, "pagina": pagina, "filas": []}
+    df, total_filas = matriz_liga.pagina_pivote(matriz, pagina, tam_pagina, orden, descendente,
+                                                busqueda, j_inicio, j_fin)
+    return {"total_filas": int(total_filas), "pagina": pagina, "filas": _registros(df)}
+
+def recurso_medias(connection, liga_id, version, parametros):
+    return _registros(matriz_liga.media_por_jornada(obtener_matriz(connection, liga_id, version)))
+
+def recurso_records(connection, liga_id, version, parametros):
+    k = _parametro_entero(parametros, "k", 5, minimo=1, maximo=100)
+    return {
+        "top_puntuaciones": _registros(datos.leer_top_puntuaciones(connection, liga_id, k)),
+        "mvp_jornadas": _registros(datos.leer_mvp_jornadas(connection, liga_id)),
+        "mejores_jugadores": _registros(datos.leer_mejores_jugadores(connection, liga_id)),
+    }
+
+RECURSOS = {
+    "clasificacion": recurso_clasificacion,
+    "tabla": recurso_tabla,
+    "medias": recurso_medias,
+    "records": recurso_records,
+}
+
+def _serializar(objeto):
+    return json.dumps(objeto, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def responder(ruta, consulta, si_no_coincide=None):
+    """Resuelve una petición GET. Devuelve (etag, cuerpo JSON); el cuerpo es None si el
+    cliente ya tiene esa versión (cabecera If-None-Match en 'si_no_coincide')."""
+    partes = [parte for parte in ruta.split("/") if parte]
+
+    if partes == ["ligas"]:
+        with lectura() as connection:
+            filas = connection.execute(text("""
+                SELECT l.id, l.nombre, COALESCE(v.version, 0)
+                FROM Ligas l LEFT JOIN VersionesLiga v ON v.liga_id = l.id
+                ORDER BY l.nombre
+            """)).all()
+        cuerpo = _serializar([{"id": liga_id, "nombre": nombre, "version": int(version)}
+                              for liga_id, nombre, version in filas])
+        etag = f'"ligas-{zlib.crc32(cuerpo):08x}"'
+        return etag, None if etag_coincide(si_no_coincide, etag) else cuerpo
+
+    if len(partes) != 3 or partes[0] != "ligas" or partes[2] not in RECURSOS:
+        raise ErrorPeticion(HTTPStatus.NOT_FOUND, "Rutas: /ligas, /ligas/<id>/{" + ",".join(RECURSOS) + "}")
+    try:
+        liga_id = int(partes[1])
+    except ValueError:
+        raise ErrorPeticion(HTTPStatus.NOT_FOUND, f"Liga desconocida: {partes[1]}")
+    parametros = parse_qs(consulta)
+
+    with lectura() as connection:
+        if connection.execute(text("SELECT 1 FROM Ligas WHERE id = :id"), {"id": liga_id}).scalar() is None:
+            raise ErrorPeticion(HTTPStatus.NOT_FOUND, f"Liga desconocida: {liga_id}")
+        version = datos.obtener_version_liga(connection, liga_id)
+        etag = f'"{liga_id}-{version}"'
+        if etag_coincide(si_no_coincide, etag):
+            return etag, None
+
+        clave = (partes[2], liga_id, version, tuple(sorted((k, tuple(v)) for k, v in parametros.items())))
+        cuerpo = _leer_lru(_respuestas, clave)
+        if cuerpo is None:
+            cuerpo = _serializar(RECURSOS[partes[2]](connection, liga_id, version, parametros))
+            _guardar_lru(_respuestas, clave, cuerpo, MAX_RESPUESTAS)
+    return etag, cuerpo
+
+def etag_coincide(cabecera, etag):
+    """Comparación débil de If-None-Match (lista de ETags o '*')."""
+    if not cabecera:
+        return False
+    candidatos = [candidato.strip() for candidato in cabecera.split(",")]
+    return "*" in candidatos or etag in (candidato.removeprefix("W/") for candidato in candidatos)
+
+# --- SERVIDOR HTTP ---
+
+class ManejadorApi(BaseHTTPRequestHandler):
+    server_version = "FantasyApi/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            etag, cuerpo = responder(url.path, url.query, self.headers.get("If-None-Match"))
+            if cuerpo is None:
+                self._enviar(HTTPStatus.NOT_MODIFIED, etag=etag)
+            else:
+                self._enviar(HTTPStatus.OK, cuerpo, etag=etag)
+        except ErrorPeticion as e:
+            self._enviar(e.estado, _serializar({"error": str(e)}))
+        except Exception as e:
+            self.log_error("Error en %s: %r", self.path, e)
+            self._enviar(HTTPStatus.INTERNAL_SERVER_ERROR, _serializar({"error": "Error interno"}))
+
+    def _enviar(self, estado, cuerpo=b"", etag=None):
+        self.send_response(estado)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache") # Siempre revalidar (barato: 304)
+        if estado != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        if estado != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(cuerpo)
+
+def crear_servidor(host="127.0.0.1", puerto=8502):
+    """Servidor HTTP (un hilo por petición) listo para serve_forever()."""
+    return ThreadingHTTPServer((host, puerto), ManejadorApi)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="API JSON de solo lectura de las ligas (clasificación, tabla, medias y récords).")
+    parser.add_argument("--host", default="127.0.0.1", help="Interfaz de escucha (por defecto, solo local).")
+    parser.add_argument("--puerto", type=int, default=8502)
+    args = parser.parse_args()
+
+    setup_db()
+    servidor = crear_servidor(args.host, args.puerto)
+    print(f"✅ API en http://{args.host}:{args.puerto}/ligas")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
@@ -1,82 +1,256 @@
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine, text
+import altair as alt
+from sqlalchemy import text
+import math
 import streamlit_authenticator as stauth
-from config import USER_CONFIG # Importamos la configuración de roles/usuarios
+from config import cargar_config_usuarios # Configuración de roles/usuarios (hashes precalculados)
+import autenticacion
+import matriz_liga
+import analitica
+import proyeccion
+import datos
+import parquet_ligas
+import diagnosticos
+import precalculo
+import escritor
+from io import BytesIO
+from db_setup import setup_db, iniciar_carga_masiva, finalizar_carga_masiva
 
 # --- CONEXIÓN A LA BASE DE DATOS ---
-engine = create_engine('sqlite:///fantasy.db')
-
-# --- FUNCIONES DE CACHÉ Y OBTENCIÓN DE DATOS ---
-@st.cache_data(ttl=600)
-def obtener_ligas():
-    """Obtiene la lista de todas las ligas disponibles."""
+# Engine compartido (WAL, pool y PRAGMAs configurados en datos.py)
+engine = datos.engine
+diagnosticos.instrumentar_engine(engine) # Tiempos de cada consulta para el panel de Diagnósticos
+diagnosticos.instrumentar_engine(escritor.engine) # ...también las del hilo escritor
+
+@st.cache_resource
+def inicializar_bd():
+    """Asegura (una vez por proceso) que existen las tablas necesarias."""
+    setup_db()
+
+def obtener_version_liga(liga_id):
+    """Versión actual de los datos de la liga (lectura por clave primaria, sin caché).
+    Se pasa a las funciones cacheadas para que cada escritura invalide solo su liga."""
     try:
-        df = pd.read_sql("SELECT id, nombre FROM Ligas ORDER BY nombre", engine)
-        return {row['nombre']: row['id'] for index, row in df.iterrows()}
+        with engine.connect() as connection:
+            return datos.obtener_version_liga(connection, liga_id)
     except:
-        return {}
-    
-# Cuenta los participantes directamente desde la base de datos
-@st.cache_data(ttl=600)
-def contar_participantes_por_liga(liga_id):
-    """Obtiene el número de participantes (jugadores) en una liga."""
-    try:
-        # Consulta SQL optimizada para contar jugadores distintos
-        query = f"SELECT COUNT(DISTINCT jugador) FROM Puntos WHERE liga_id = {liga_id}"
-        count = pd.read_sql(query, engine).iloc[0, 0]
-        return int(count)
-    except Exception as e:
-        # Maneja el caso donde la liga_id no existe o la tabla está vacía
-        # st.error(f"Error al contar participantes: {e}") # Puedes descomentar esto para debug
         return 0
 
-@st.cache_data(ttl=600)
-def obtener_jugadores(liga_id):
-    """Obtiene la lista de jugadores de la liga activa."""
-    try:
-        # Se incluye el jugador que tenga 0 puntos en la primera jornada para que aparezca
-        df = pd.read_sql(f"SELECT DISTINCT jugador FROM Puntos WHERE liga_id = {liga_id} ORDER BY jugador", engine)
-        return df['jugador'].tolist()
-    except:
-        return []
+def obtener_version_lectura(liga_id):
+    """Versión con la que leen las páginas de consulta: tras una escritura siguen con la
+    anterior (ya en caché) hasta que el precálculo en segundo plano termina la nueva.
+    Las páginas de gestión usan obtener_version_liga: el admin ve al momento lo que escribe."""
+    return precalculo.version_lectura(liga_id, obtener_version_liga(liga_id), calentar_liga, vistas_en_cache)
+
+def vistas_en_cache(liga_id, version):
+    """True si las vistas de la liga que se leen de la BD siguen en caché con esa versión
+    (las demás se calculan sobre la matriz, así que salen de esa misma versión)."""
+    return (diagnosticos.en_cache(obtener_matriz_liga, liga_id, version)
+            and diagnosticos.en_cache(obtener_clasificacion, liga_id, version)
+            and diagnosticos.en_cache(obtener_top_puntuaciones, liga_id, version, 5)
+            and diagnosticos.en_cache(obtener_mvp_jornadas, liga_id, version)
+            and diagnosticos.en_cache(obtener_mejores_jugadores, liga_id, version))
+
+def notificar_escritura(liga_id):
+    """Encarga al precálculo en segundo plano las vistas de la liga recién modificada."""
+    precalculo.programar(liga_id, calentar_liga)
 
-@st.cache_data(ttl=600)
-def obtener_max_jornada(liga_id):
-    """Obtiene el número de la última jornada registrada para la liga activa."""
+# --- FUNCIONES DE CACHÉ Y OBTENCIÓN DE DATOS ---
+def obtener_version_global():
+    """Versión conjunta de todas las ligas (sin caché), para las vistas que las abarcan a todas."""
     try:
         with engine.connect() as connection:
-            max_j = connection.execute(text(f"SELECT MAX(jornada) FROM Puntos WHERE liga_id = {liga_id}")).scalar()
-            return int(max_j) if max_j else 0
+            return datos.obtener_version_global(connection)
     except:
-        return 0
+        return (0, 0)
 
-def guardar_puntos(liga_id, jugador, jornada, puntos):
-    """Inserta o actualiza los puntos en la BD."""
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_ligas():
+    """Obtiene la lista de todas las ligas disponibles."""
+    return datos.leer_ligas(engine)
+    
+# Resumen de la Home: una sola consulta para todas las ligas, cacheada como una unidad
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_resumen_ligas(version_global):
+    """Participantes, última jornada, registros y líder de cada liga (una fila por liga)."""
+    return datos.leer_resumen_ligas(engine)
+
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_jugadores(liga_id, version):
+    """Obtiene la lista de jugadores de la liga activa."""
+    return datos.leer_jugadores(engine, liga_id)
+
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_max_jornada(liga_id, version):
+    """Obtiene el número de la última jornada registrada para la liga activa."""
+    return datos.leer_max_jornada(engine, liga_id)
+
+# Matriz de puntos de la liga (una sola consulta), compartida entre todas las sesiones.
+# Es de solo lectura: las páginas calculan sus vistas sobre ella sin volver a la BD.
+# La versión forma parte de la clave: solo se reconstruye cuando cambian los datos de la liga.
+@diagnosticos.cache_instrumentada(st.cache_resource(ttl=600, max_entries=32, show_spinner=False))
+def obtener_matriz_liga(liga_id, version):
+    """Obtiene la instantánea jugadores × jornadas de la liga activa."""
+    return matriz_liga.cargar_matriz_liga(engine, liga_id)
+
+# Tabla de forma de todos los jugadores (vectorizada sobre la matriz): se recalcula
+# solo al cambiar la versión de la liga, la ventana o el umbral.
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_forma(liga_id, version, ventana, umbral):
+    """Forma, rachas, regularidad y jornadas a 0 de cada jugador de la liga."""
+    return analitica.tabla_forma(obtener_matriz_liga(liga_id, version), ventana, umbral)
+
+# Simulación Monte Carlo del resto de la temporada: cara, se cachea por versión y parámetros
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_proyeccion(liga_id, version, jornadas_temporada, simulaciones):
+    """Probabilidades de título, podio y último puesto de cada jugador al final de la temporada."""
+    return proyeccion.simular(obtener_matriz_liga(liga_id, version), jornadas_temporada, simulaciones)
+
+# Cara a cara: la matriz N×N de la liga se cachea por versión (solo en ligas de hasta
+# analitica.MAX_JUGADORES_MATRIZ jugadores); el balance de un jugador es una sola fila.
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_matriz_cara_a_cara(liga_id, version):
+    """Victorias jornada a jornada de cada jugador (fila) sobre cada rival (columna)."""
+    return analitica.matriz_cara_a_cara(obtener_matriz_liga(liga_id, version))
+
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_cara_a_cara(liga_id, version, jugador):
+    """Victorias, empates, derrotas y diferencia de puntos del jugador contra cada rival."""
+    return analitica.tabla_cara_a_cara(obtener_matriz_liga(liga_id, version), jugador)
+
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_clasificacion(liga_id, version):
+    """Clasificación general leída de la tabla materializada Clasificacion (mantenida por triggers)."""
+    return datos.leer_clasificacion(engine, liga_id)
+
+# Récords: el top K recorre el índice por puntos y el resto lee las tablas mantenidas
+# por triggers (una fila por jornada / jugador), sin ordenar todos los puntos de la liga.
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_top_puntuaciones(liga_id, version, k=5):
+    """Las k mejores puntuaciones individuales (jugador, jornada, puntos) de la liga."""
+    return datos.leer_top_puntuaciones(engine, liga_id, k)
+
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_mvp_jornadas(liga_id, version):
+    """Máximo anotador de cada jornada de la liga."""
+    return datos.leer_mvp_jornadas(engine, liga_id)
+
+@diagnosticos.cache_instrumentada(st.cache_data(ttl=600, show_spinner=False))
+def obtener_mejores_jugadores(liga_id, version):
+    """Mejor jornada de cada jugador de la liga, de mayor a menor puntuación."""
+    return datos.leer_mejores_jugadores(engine, liga_id)
+
+# Rellena las cachés de una liga con su versión actual (lo ejecuta el hilo de precálculo).
+# Los parámetros son los valores por defecto de los widgets de cada página.
+# Ese hilo no tiene ScriptRunContext: por eso las funciones cacheadas van con
+# show_spinner=False (el spinner automático es lo único que necesita una sesión);
+# las páginas lentas, como Proyección, muestran su propio st.spinner.
+def calentar_liga(liga_id):
+    """Calcula y cachea las vistas de consulta de la liga. Devuelve la versión calculada."""
+    with diagnosticos.medir_pagina("Precálculo (segundo plano)"):
+        version = obtener_version_liga(liga_id)
+        matriz = obtener_matriz_liga(liga_id, version)
+        matriz.preparar_indices()
+        obtener_jugadores(liga_id, version)
+        obtener_max_jornada(liga_id, version)
+        obtener_clasificacion(liga_id, version)
+        obtener_top_puntuaciones(liga_id, version, 5)
+        obtener_mvp_jornadas(liga_id, version)
+        obtener_mejores_jugadores(liga_id, version)
+        if not matriz.vacia:
+            obtener_forma(liga_id, version, min(5, len(matriz.jornadas)), 50)
+            if len(matriz.jugadores) <= analitica.MAX_JUGADORES_MATRIZ:
+                obtener_matriz_cara_a_cara(liga_id, version)
+        obtener_resumen_ligas(obtener_version_global())
+    return version
+
+# --- ESCRITURAS ---
+# Todas las escrituras van al hilo escritor (escritor.py), que las agrupa en
+# transacciones y reintenta si la BD está bloqueada. Cada operación recibe la
+# conexión ya en transacción y no confirma: escritor.ejecutar devuelve su resultado
+# (o lanza su excepción) tras el commit.
+
+def crear_liga_bd(connection, nombre, temporada):
+    connection.execute(text(
+        "INSERT INTO Ligas (nombre, temporada) VALUES (:nombre, :temporada)"
+    ), {"nombre": nombre, "temporada": temporada})
+
+def eliminar_liga_bd(connection, liga_id):
+    # Borrar puntos y jugadores primero (dependientes), sin triggers fila a fila
+    iniciar_carga_masiva(connection, liga_id)
+    connection.execute(text("DELETE FROM Puntos WHERE liga_id = :id"), {"id": liga_id})
+    connection.execute(text("DELETE FROM Jugadores WHERE liga_id = :id"), {"id": liga_id})
+    finalizar_carga_masiva(connection, liga_id)
+    # Borrar la liga (y su contador de versión)
+    connection.execute(text("DELETE FROM VersionesLiga WHERE liga_id = :id"), {"id": liga_id})
+    connection.execute(text("DELETE FROM Ligas WHERE id = :id"), {"id": liga_id})
+
+def crear_jugador_bd(connection, liga_id, nombre):
+    # El jugador se da de alta en la tabla Jugadores (sin puntos hasta su primera jornada)
+    connection.execute(text(
+        "INSERT INTO Jugadores (liga_id, nombre) VALUES (:id, :nombre)"
+    ), {"id": liga_id, "nombre": nombre})
+    datos.incrementar_version_liga(connection, liga_id)
+
+def eliminar_jugador_bd(connection, liga_id, nombre):
+    jugador_id = datos.obtener_ids_jugadores(connection, liga_id, [nombre], crear=False).get(nombre)
+    connection.execute(text("DELETE FROM Puntos WHERE jugador_id = :jid"), {"jid": jugador_id})
+    connection.execute(text("DELETE FROM Jugadores WHERE id = :jid"), {"jid": jugador_id})
+    datos.incrementar_version_liga(connection, liga_id)
+
+def renombrar_jugador_bd(connection, liga_id, antiguo, nuevo):
+    # Solo cambia su fila en Jugadores: Puntos y Clasificacion usan el ID
+    connection.execute(text(
+        "UPDATE Jugadores SET nombre = :nuevo WHERE nombre = :antiguo AND liga_id = :id"
+    ), {"nuevo": nuevo, "antiguo": antiguo, "id": liga_id})
+    datos.incrementar_version_liga(connection, liga_id)
+
+def escribir_punto_individual(connection, liga_id, jugador, jornada, puntos):
+    jugador_id = datos.obtener_ids_jugadores(connection, liga_id, [jugador])[jugador]
+
+    # 1. Intentar actualizar el registro existente
+    # Esto funciona para correcciones de puntos ya existentes
+    update_result = connection.execute(text(
+        "UPDATE Puntos SET puntos = :puntos WHERE jugador_id = :jid AND jornada = :jornada"
+    ), {"puntos": puntos, "jid": jugador_id, "jornada": jornada})
+
+    # 2. Si no se actualizó ninguna fila (registro no existía), insertamos uno nuevo
+    # Esto funciona para jugadores olvidados en la entrada original
+    if update_result.rowcount == 0:
+        connection.execute(text(
+            "INSERT INTO Puntos (liga_id, jugador_id, jornada, puntos) VALUES (:id, :jid, :jornada, :puntos)"
+        ), {"id": liga_id, "jid": jugador_id, "jornada": jornada, "puntos": puntos})
+
+    datos.incrementar_version_liga(connection, liga_id)
+
+def eliminar_jornada_bd(connection, liga_id, jornada):
+    connection.execute(text(
+        "DELETE FROM Puntos WHERE liga_id = :id AND jornada = :jornada"
+    ), {"id": liga_id, "jornada": jornada})
+    datos.incrementar_version_liga(connection, liga_id)
+
+def guardar_puntos_lote(registros):
+    """Inserta o actualiza una lista de (liga_id, jugador, jornada, puntos) en una sola transacción."""
     try:
-        with engine.connect() as connection:
-            connection.execute(
-                text("""
-                    INSERT INTO Puntos (liga_id, jugador, jornada, puntos) 
-                    VALUES (:liga_id, :jugador, :jornada, :puntos)
-                    ON CONFLICT(liga_id, jugador, jornada) DO UPDATE SET puntos = :puntos;
-                """),
-                {"liga_id": liga_id, "jugador": jugador, "jornada": jornada, "puntos": puntos}
-            )
-            connection.commit()
-        
-        st.cache_data.clear() 
+        escritor.ejecutar(datos.escribir_puntos_lote, registros)
+        for liga_id in {registro[0] for registro in registros}:
+            notificar_escritura(liga_id)
         return True
     except Exception as e:
-        st.error(f"❌ Error al guardar en la BD: {e}")
+        st.error(f"❌ Error al guardar en la BD (no se ha guardado ningún punto del lote): {e}")
         return False
 
+def guardar_puntos(liga_id, jugador, jornada, puntos):
+    """Inserta o actualiza los puntos en la BD."""
+    return guardar_puntos_lote([(liga_id, jugador, jornada, puntos)])
+
 # --- PÁGINAS DE LA APLICACIÓN ---
 
 def gestionar_ligas(ligas_map):
     st.header("⚙️ Gestión de Ligas")
     
-    tab1, tab2 = st.tabs(["➕ Crear Liga", "🗑️ Eliminar Liga"])
+    tab1, tab2, tab3 = st.tabs(["➕ Crear Liga", "🗑️ Eliminar Liga", "💾 Copias (Parquet)"])
 
     with tab1:
         st.subheader("Crear una Nueva Liga")
@@ -86,12 +260,9 @@ def gestionar_ligas(ligas_map):
         if st.button("Crear Liga"):
             if nombre_liga and nombre_liga not in ligas_map:
                 try:
-                    with engine.connect() as connection:
-                        connection.execute(text(
-                            "INSERT INTO Ligas (nombre, temporada) VALUES (:nombre, :temporada)"
-                        ), {"nombre": nombre_liga, "temporada": temporada})
-                        connection.commit()
-                    st.cache_data.clear()
+                    escritor.ejecutar(crear_liga_bd, nombre_liga, temporada)
+                    obtener_ligas.clear()
+                    obtener_resumen_ligas.clear()
                     st.success(f"¡Liga '{nombre_liga}' creada con éxito!")
                 except Exception as e:
                     st.error(f"Error al crear la liga: {e}")
@@ -108,19 +279,53 @@ def gestionar_ligas(ligas_map):
         st.warning("Eliminar una liga borrará TODOS sus jugadores y puntos asociados.")
         if st.button("🔴 ELIMINAR LIGA PERMANENTEMENTE"):
             if liga_a_eliminar_id:
-                with engine.connect() as connection:
-                    # Borrar puntos primero (dependientes)
-                    connection.execute(text("DELETE FROM Puntos WHERE liga_id = :id"), {"id": liga_a_eliminar_id})
-                    # Borrar la liga
-                    connection.execute(text("DELETE FROM Ligas WHERE id = :id"), {"id": liga_a_eliminar_id})
-                    connection.commit()
-                st.cache_data.clear()
-                st.success(f"¡La liga '{liga_a_eliminar_nombre}' ha sido eliminada!")
+                try:
+                    escritor.ejecutar(eliminar_liga_bd, liga_a_eliminar_id)
+                    # Solo cambian el listado y el resumen de ligas: las entradas cacheadas de la liga
+                    # eliminada dejan de usarse (los IDs no se reutilizan) y caducan por TTL.
+                    obtener_ligas.clear()
+                    obtener_resumen_ligas.clear()
+                    st.success(f"¡La liga '{liga_a_eliminar_nombre}' ha sido eliminada!")
+                except Exception as e:
+                    st.error(f"Error al eliminar la liga: {e}")
+
+    with tab3:
+        st.subheader("Exportar Ligas")
+        opcion_todas = "(Todas las ligas)"
+        liga_a_exportar = st.selectbox("Liga a exportar:", [opcion_todas] + list(ligas_map.keys()))
+        if st.button("Generar copia Parquet"):
+            try:
+                buffer = BytesIO()
+                filas = parquet_ligas.exportar_ligas(engine, buffer, ligas_map.get(liga_a_exportar))
+                nombre_archivo = "ligas.parquet" if liga_a_exportar == opcion_todas else f"{liga_a_exportar}.parquet"
+                st.download_button(
+                    f"⬇️ Descargar {nombre_archivo} ({filas} filas)", buffer.getvalue(),
+                    file_name=nombre_archivo, mime="application/octet-stream"
+                )
+            except Exception as e:
+                st.error(f"Error al exportar: {e}")
+
+        st.subheader("Importar Ligas")
+        archivo = st.file_uploader("Copia Parquet (.parquet):", type=["parquet"])
+        st.warning("Si una liga de la copia ya existe, sus jugadores y puntos se SUSTITUYEN por los de la copia.")
+        if st.button("Importar copia") and archivo is not None:
+            try:
+                # El fichero se lee aquí; la escritura la hace el hilo escritor como las demás
+                tabla = parquet_ligas.leer_copia(archivo)
+                resultado = escritor.ejecutar(parquet_ligas.escribir_copia, tabla)
+                for liga_id, _ in resultado.values():
+                    notificar_escritura(liga_id)
+                obtener_ligas.clear()
+                obtener_resumen_ligas.clear()
+                resumen = ", ".join(f"{nombre} ({escritos} puntos)" for nombre, (_, escritos) in resultado.items())
+                st.success(f"¡Copia importada! Ligas: {resumen}")
+            except Exception as e:
+                st.error(f"❌ Error al importar (no se ha guardado nada): {e}")
 
 
 def gestionar_jugadores(liga_id, nombre_liga):
     st.header(f"👤 Gestión de Participantes de la Liga: {nombre_liga}")
-    jugadores_actuales = obtener_jugadores(liga_id)
+    jugadores_actuales = obtener_jugadores(liga_id, obtener_version_liga(liga_id))
     
     tab1, tab2, tab3 = st.tabs(["➕ Nuevo Jugador", "➖ Eliminar Jugador", "✏️ Renombrar Jugador"])
 
@@ -130,10 +335,12 @@ def gestionar_jugadores(liga_id, nombre_liga):
         
         if st.button("Crear Jugador", key="btn_crear_jugador"):
             if nuevo_nombre and nuevo_nombre not in jugadores_actuales:
-                # Insertamos un punto ficticio (0) en la jornada 1 para que aparezca en la lista
-                # Nota: Esto resuelve el problema de que el jugador aparezca en las listas, sin depender del ID inicial.
-                guardar_puntos(liga_id, nuevo_nombre, 1, 0)
-                st.success(f"¡{nuevo_nombre} añadido a la liga!")
+                try:
+                    escritor.ejecutar(crear_jugador_bd, liga_id, nuevo_nombre)
+                    notificar_escritura(liga_id)
+                    st.success(f"¡{nuevo_nombre} añadido a la liga!")
+                except Exception as e:
+                    st.error(f"Error al crear el jugador: {e}")
             elif nuevo_nombre in jugadores_actuales:
                  st.warning(f"Este jugador ya existe en la liga: '{nombre_liga}'.")
             else:
@@ -144,13 +351,12 @@ def gestionar_jugadores(liga_id, nombre_liga):
         jugador_a_eliminar = st.selectbox("Selecciona participante a eliminar:", jugadores_actuales, key="jugador_eliminar_select")
         
         if st.button("🔴 ELIMINAR PERMANENTEMENTE", help="Borrará todos sus datos de esta liga."):
-            with engine.connect() as connection:
-                connection.execute(text(
-                    "DELETE FROM Puntos WHERE jugador = :j AND liga_id = :id"
-                ), {"j": jugador_a_eliminar, "id": liga_id})
-                connection.commit()
-            st.cache_data.clear()
-            st.success(f"¡{jugador_a_eliminar} y todos sus puntos han sido eliminados de esta liga!")
+            try:
+                escritor.ejecutar(eliminar_jugador_bd, liga_id, jugador_a_eliminar)
+                notificar_escritura(liga_id)
+                st.success(f"¡{jugador_a_eliminar} y todos sus puntos han sido eliminados de esta liga!")
+            except Exception as e:
+                st.error(f"Error al eliminar el jugador: {e}")
 
 
     with tab3:
@@ -168,14 +374,12 @@ def gestionar_jugadores(liga_id, nombre_liga):
                 if nuevo_nombre_jugador in jugadores_actuales:
                     st.error("Ya existe un jugador con ese nombre.")
                 else:
-                    # Actualiza la columna 'jugador' en la tabla Puntos
-                    with engine.connect() as connection:
-                        connection.execute(text(
-                            "UPDATE Puntos SET jugador = :nuevo WHERE jugador = :antiguo AND liga_id = :id"
-                        ), {"nuevo": nuevo_nombre_jugador, "antiguo": jugador_antiguo, "id": liga_id})
-                        connection.commit()
-                    st.cache_data.clear()
-                    st.success(f"¡{jugador_antiguo} renombrado a {nuevo_nombre_jugador} con éxito!")
+                    try:
+                        escritor.ejecutar(renombrar_jugador_bd, liga_id, jugador_antiguo, nuevo_nombre_jugador)
+                        notificar_escritura(liga_id)
+                        st.success(f"¡{jugador_antiguo} renombrado a {nuevo_nombre_jugador} con éxito!")
+                    except Exception as e:
+                        st.error(f"Error al renombrar el jugador: {e}")
             else:
                 st.error("Debes seleccionar un jugador y proporcionar un nuevo nombre.")
 
@@ -184,7 +388,7 @@ def interfaz_entrada_multiple(liga_id, jugadores):
     st.subheader("➕ Entrada/Modificación de Puntos")
     st.markdown("**Modo rápido:** Introduce la jornada y los puntos de todos los jugadores a la vez. El valor **0** es válido.")
     
-    max_jornada = obtener_max_jornada(liga_id)
+    max_jornada = obtener_max_jornada(liga_id, obtener_version_liga(liga_id))
     
     with st.form("form_puntos_multiple", clear_on_submit=True):
         
@@ -204,7 +408,11 @@ def interfaz_entrada_multiple(liga_id, jugadores):
         puntos_actuales = {}
         if jornada_actual:
              # Obtener los puntos actuales de la jornada y liga para precargar el formulario (para modificación)
-             df_actual = pd.read_sql(f"SELECT jugador, puntos FROM Puntos WHERE liga_id = {liga_id} AND jornada = {int(jornada_actual)}", engine)
+             df_actual = pd.read_sql(f"""
+                 SELECT j.nombre AS jugador, p.puntos FROM Puntos p
+                 JOIN Jugadores j ON j.id = p.jugador_id
+                 WHERE p.liga_id = {liga_id} AND p.jornada = {int(jornada_actual)}
+             """, engine)
              puntos_actuales = df_actual.set_index('jugador')['puntos'].to_dict()
         
         cols = st.columns(3)
@@ -223,11 +431,11 @@ def interfaz_entrada_multiple(liga_id, jugadores):
         submitted = st.form_submit_button("💾 GUARDAR/MODIFICAR PUNTOS DE LA JORNADA")
         
         if submitted:
-            exito = True
-            for jugador, puntos in nuevos_puntos.items():
-                if not guardar_puntos(liga_id, jugador, int(jornada_actual), int(puntos)):
-                    exito = False
-                    break
+            # Todos los jugadores de la jornada se guardan juntos (todo o nada)
+            exito = guardar_puntos_lote([
+                (liga_id, jugador, int(jornada_actual), int(puntos))
+                for jugador, puntos in nuevos_puntos.items()
+            ])
             
             if exito:
                 st.success(f"✅ ¡Puntos de la Jornada {int(jornada_actual)} guardados/modificados con éxito!")
@@ -235,6 +443,8 @@ def interfaz_entrada_multiple(liga_id, jugadores):
 
 def interfaz_rendimiento_jugador(liga_id, jugadores):
     st.header("🧠 Rendimiento Individual y Estadísticas")
+    version = obtener_version_lectura(liga_id)
+    matriz = obtener_matriz_liga(liga_id, version)
     
     # 1. CONSULTA DE FRECUENCIA DE PUNTOS CON DETALLE
     st.subheader("1. Frecuencia de Puntos y Jornadas Detalladas")
@@ -254,19 +464,8 @@ def interfaz_rendimiento_jugador(liga_id, jugadores):
         
     if jugador_sel and st.button("Buscar Rendimiento", key="btn_buscar_rendimiento"):
         
-        # 1a. Consulta para OBTENER EL DETALLE de las jornadas
-        consulta_detalle = f"""
-            SELECT 
-                jugador, 
-                jornada, 
-                puntos 
-            FROM Puntos 
-            WHERE liga_id = {liga_id}
-            AND jugador = '{jugador_sel}'
-            AND puntos {op_simbolo} {int(puntos_crit)}
-            ORDER BY jornada ASC;
-        """
-        df_detalle = pd.read_sql(consulta_detalle, engine)
+        # 1a. Detalle de las jornadas que cumplen el criterio (calculado sobre la matriz de la liga)
+        df_detalle = matriz_liga.jornadas_por_criterio(matriz, jugador_sel, op_simbolo, int(puntos_crit))
         
         # 1b. Obtener el total de jornadas (igual al número de filas en el detalle)
         resultado = len(df_detalle)
@@ -286,21 +485,17 @@ def interfaz_rendimiento_jugador(liga_id, jugadores):
         else:
             st.info("No se encontraron jornadas que cumplan este criterio.")
 
+    # 2. EL MISMO CRITERIO PARA TODOS LOS JUGADORES (búsqueda binaria por jugador, sin recorrer la liga)
+    st.markdown("---")
+    st.subheader(f"2. Ranking: Jornadas con {operador} {int(puntos_crit)} puntos")
+    df_ranking = matriz_liga.ranking_por_criterio(matriz, op_simbolo, int(puntos_crit))
+    st.dataframe(df_ranking, use_container_width=True, hide_index=True)
 
-    # 2. CONSULTA INTERESANTE: JORNADA DE ORO
+    # 3. CONSULTA INTERESANTE: JORNADA DE ORO
     st.markdown("---")
-    st.subheader("2. Jornada de Oro (Récord de la Liga)")
-    
-    df_record = pd.read_sql(f"""
-        SELECT 
-            jugador, 
-            jornada, 
-            puntos 
-        FROM Puntos 
-        WHERE liga_id = {liga_id} 
-        ORDER BY puntos DESC 
-        LIMIT 5;
-    """, engine)
+    st.subheader("3. Jornada de Oro (Récord de la Liga)")
+    
+    df_record = obtener_top_puntuaciones(liga_id, version, 5)
     
     if not df_record.empty:
         mejor_jugador = df_record.iloc[0]['jugador']
@@ -316,52 +511,176 @@ def interfaz_rendimiento_jugador(liga_id, jugadores):
         st.info("Top 5 Puntuaciones Individuales:")
         st.dataframe(df_record, use_container_width=True, hide_index=True)
 
+    # 4. RÉCORDS POR JORNADA Y POR JUGADOR (tablas de récords mantenidas al escribir)
+    st.markdown("---")
+    st.subheader("4. Récords por Jornada y por Jugador")
+    col_mvp, col_mejores = st.columns(2)
+    with col_mvp:
+        st.markdown("##### 🏅 MVP de cada Jornada")
+        df_mvp = obtener_mvp_jornadas(liga_id, version)
+        st.dataframe(
+            df_mvp.rename(columns={'jornada': 'Jornada', 'jugador': 'Jugador', 'puntos': 'Puntos'}),
+            use_container_width=True, hide_index=True
+        )
+    with col_mejores:
+        st.markdown("##### 🎯 Mejor Jornada de cada Jugador")
+        df_mejores = obtener_mejores_jugadores(liga_id, version)
+        st.dataframe(
+            df_mejores.rename(columns={'jugador': 'Jugador', 'puntos': 'Puntos', 'jornada': 'Jornada'}),
+            use_container_width=True, hide_index=True
+        )
+
+
+def interfaz_forma(liga_id):
+    st.header("📈 Forma de los Jugadores")
+    st.markdown("Media de las últimas jornadas, rachas respecto a un umbral de puntos y regularidad de cada jugador.")
+    version = obtener_version_lectura(liga_id)
+    matriz = obtener_matriz_liga(liga_id, version)
+
+    if matriz.vacia:
+        st.warning("No hay datos de puntos en esta liga.")
+        return
+
+    colA, colB = st.columns(2)
+    with colA:
+        num_jornadas = len(matriz.jornadas)
+        ventana = st.number_input("Ventana (últimas N jornadas):", min_value=1, max_value=num_jornadas,
+                                  value=min(5, num_jornadas), step=1, key="ventana_forma")
+    with colB:
+        umbral = st.number_input("Umbral de Racha (X puntos):", min_value=0, step=1, value=50, key="umbral_forma")
+
+    # 1. TABLA DE FORMA (todos los jugadores a la vez)
+    st.subheader(f"1. Forma (media de las últimas {int(ventana)} jornadas)")
+    df_forma = obtener_forma(liga_id, version, int(ventana), int(umbral))
+    st.dataframe(df_forma, use_container_width=True, hide_index=True)
+    st.caption("Rachas: jornadas consecutivas con ≥ X o < X puntos. Una jornada sin registro cuenta como 0 puntos. "
+               "Coef. Variación: desviación / media (más bajo = más regular).")
+
+    # 2. EVOLUCIÓN DE LA MEDIA MÓVIL
+    st.markdown("---")
+    st.subheader("2. Evolución de la Media Móvil")
+    seleccion = st.multiselect("Jugadores:", matriz.jugadores.tolist(),
+                               default=df_forma['jugador'].head(5).tolist(), key="jugadores_forma")
+    if seleccion:
+        st.line_chart(analitica.evolucion_forma(matriz, int(ventana), seleccion))
+
+
+def interfaz_cara_a_cara(liga_id):
+    st.header("⚔️ Cara a Cara")
+    st.markdown("Enfrentamientos jornada a jornada: gana quien más puntos hizo en cada jornada que ambos jugaron.")
+    version = obtener_version_lectura(liga_id)
+    matriz = obtener_matriz_liga(liga_id, version)
+
+    if matriz.vacia or len(matriz.jugadores) < 2:
+        st.warning("Hacen falta puntos de al menos dos jugadores en esta liga.")
+        return
+
+    # 1. BALANCE DE UN JUGADOR CONTRA CADA RIVAL
+    st.subheader("1. Balance contra cada Rival")
+    jugador = st.selectbox("Jugador:", matriz.jugadores.tolist(), key="jugador_cara_a_cara")
+    df_jugador = obtener_cara_a_cara(liga_id, version, jugador)
+
+    colA, colB, colC, colD = st.columns(4)
+    colA.metric("Victorias", int(df_jugador['Victorias'].sum()))
+    colB.metric("Empates", int(df_jugador['Empates'].sum()))
+    colC.metric("Derrotas", int(df_jugador['Derrotas'].sum()))
+    colD.metric("Diferencia de Puntos", int(df_jugador['Diferencia de Puntos'].sum()))
+    st.dataframe(df_jugador, use_container_width=True, hide_index=True)
+
+    # 2. MATRIZ DE VICTORIAS DE TODA LA LIGA
+    st.markdown("---")
+    st.subheader("2. Matriz de Victorias")
+    if len(matriz.jugadores) > analitica.MAX_JUGADORES_MATRIZ:
+        st.info(f"La liga tiene {len(matriz.jugadores)} jugadores: la matriz completa solo se muestra "
+                f"hasta {analitica.MAX_JUGADORES_MATRIZ}. Usa el balance por jugador.")
+        return
+    st.dataframe(obtener_matriz_cara_a_cara(liga_id, version), use_container_width=True)
+    st.caption("Cada celda: jornadas en las que el jugador de la fila hizo más puntos que el de la columna.")
+
+
+def interfaz_proyeccion(liga_id):
+    st.header("🔮 Proyección de la Clasificación Final")
+    st.markdown("Simula las jornadas que faltan sorteando, para cada jugador, una de sus puntuaciones de esta temporada.")
+    version = obtener_version_lectura(liga_id)
+    matriz = obtener_matriz_liga(liga_id, version)
+
+    if matriz.vacia:
+        st.warning("No hay datos de puntos en esta liga.")
+        return
+
+    max_jornada = int(matriz.jornadas.max())
+    colA, colB = st.columns(2)
+    with colA:
+        jornadas_temporada = st.number_input("Jornadas de la Temporada:", min_value=max_jornada,
+                                             value=max(38, max_jornada), step=1, key="jornadas_temporada")
+    with colB:
+        simulaciones = st.selectbox("Simulaciones:", [1_000, 10_000, 100_000], index=1, key="simulaciones_proyeccion")
+
+    restantes = int(jornadas_temporada) - max_jornada
+    if restantes == 0:
+        st.info("No quedan jornadas por jugar: la clasificación actual es la final.")
+        return
+
+    with st.spinner(f"Simulando {simulaciones:,} finales de temporada ({restantes} jornadas restantes)..."):
+        df_proyeccion = obtener_proyeccion(liga_id, version, int(jornadas_temporada), simulaciones)
+
+    st.subheader(f"1. Probabilidades tras {restantes} jornadas simuladas")
+    st.dataframe(df_proyeccion, use_container_width=True, hide_index=True)
+
+    st.subheader("2. Favoritos al Título")
+    favoritos = df_proyeccion[df_proyeccion['% Campeón'] > 0].head(10)
+    st.bar_chart(favoritos.set_index('jugador')['% Campeón'])
+
 
 def interfaz_pivote_completo(liga_id, nombre_liga):
     st.header("📋 Tabla Detallada de Puntos")
     st.markdown(f"Visualización de todos los jugadores y sus puntos por jornada en la liga: {nombre_liga}.")
     
-    # 1. Traer todos los puntos de la liga
-    df_long = pd.read_sql(f"""
-        SELECT 
-            jugador, 
-            jornada, 
-            puntos 
-        FROM Puntos 
-        WHERE liga_id = {liga_id}
-        ORDER BY jornada ASC
-    """, engine)
-    
-    if df_long.empty:
+    # 1. Matriz de puntos de la liga (jugadores × jornadas, ya sin huecos)
+    matriz = obtener_matriz_liga(liga_id, obtener_version_lectura(liga_id))
+    
+    if matriz.vacia:
         st.warning("No hay datos de puntos en esta liga.")
         return
 
-    # 2. Pivotar el DataFrame (de formato largo a formato ancho)
-    # Índice: Jugador
-    # Columnas: Jornada
-    # Valores: Puntos
-    df_pivot = df_long.pivot(index='jugador', columns='jornada', values='puntos').fillna(0).astype(int)
+    # 2. Búsqueda, orden y ventana de jornadas (se aplican antes de construir la tabla)
+    jornadas = matriz.jornadas.tolist()
+    colA, colB, colC = st.columns([2, 1, 1])
+    with colA:
+        busqueda = st.text_input("Buscar jugador:", key="busqueda_pivote")
+    with colB:
+        orden = st.selectbox("Ordenar por:", ["TOTAL", "Jugador"] + [f"J{j}" for j in jornadas], key="orden_pivote")
+    with colC:
+        sentido = st.radio("Sentido:", ["Descendente", "Ascendente"], horizontal=True, key="sentido_pivote")
 
-    # 3. Calcular la columna de Totales
-    df_pivot['TOTAL'] = df_pivot.sum(axis=1)
-    
-    # 4. Convertir el índice (Jugadores) en una columna regular. 
-    #    Esto fuerza a Streamlit a renderizar los nombres como datos y no como índice, 
-    #    solucionando el problema de color.
-    df_final = df_pivot.reset_index()
+    colD, colE, colF = st.columns([2, 1, 1])
+    with colD:
+        if len(jornadas) > 1:
+            j_inicio, j_fin = st.select_slider("Jornadas visibles:", options=jornadas,
+                                               value=(jornadas[0], jornadas[-1]), key="jornadas_pivote")
+        else:
+            j_inicio = j_fin = jornadas[0]
+    with colE:
+        tam_pagina = st.selectbox("Filas por página:", [25, 50, 100, 250], index=1, key="tam_pagina_pivote")
+    with colF:
+        # Cada página solo construye y envía sus filas (el total se calcula sobre toda la liga)
+        filas = matriz_liga.filtrar_jugadores(matriz, busqueda)
+        num_filas = len(filas)
+        num_paginas = max(1, math.ceil(num_filas / tam_pagina))
+        pagina = st.number_input(f"Página (de {num_paginas}):", min_value=1, max_value=num_paginas, value=1,
+                                 step=1, key="pagina_pivote")
+
+    df_pagina, num_filas = matriz_liga.pagina_pivote(
+        matriz, int(pagina), tam_pagina, orden, sentido == "Descendente", busqueda, j_inicio, j_fin, filas
+    )
+    if num_filas == 0:
+        st.info("Ningún jugador coincide con la búsqueda.")
+        return
 
-    # 5. Ordenar por la columna TOTAL (clasificación)
-    df_final = df_final.sort_values(by='TOTAL', ascending=False)
-    
-    # 6. Renombrar las columnas de jornada
-    # Nota: Aplicamos el renombramiento a df_final, que ahora incluye 'jugador'
-    df_final.columns = [f"J{col}" if isinstance(col, (int, float)) and col != 'TOTAL' else col for col in df_final.columns]
-    
-    # 7. Renombrar la columna 'jugador' para mejor visualización
-    df_final = df_final.rename(columns={'jugador': 'Jugador'})
-    
-    # Mostrar el DataFrame final (sin el índice por defecto)
-    st.dataframe(df_final, use_container_width=True, hide_index=True)
+    # 3. Página de la tabla ancha (TOTAL: todas las jornadas, no solo las visibles)
+    inicio = (int(pagina) - 1) * tam_pagina
+    st.caption(f"Jugadores {inicio + 1}–{inicio + len(df_pagina)} de {num_filas}.")
+    st.dataframe(df_pagina, use_container_width=True, hide_index=True)
 
 
 def interfaz_consultas(liga_id):
@@ -370,17 +689,8 @@ def interfaz_consultas(liga_id):
     
     # 1. CLASIFICACIÓN GENERAL (TOTAL)
     st.subheader("1. Clasificación General")
-    df_puntos_total = pd.read_sql(f"""
-        SELECT 
-            jugador, 
-            SUM(puntos) as "Puntos Totales", 
-            COUNT(DISTINCT jornada) as "Jornadas Jugadas",
-            ROUND(CAST(SUM(puntos) AS REAL) / COUNT(DISTINCT jornada), 2) as "Media/Jornada"
-        FROM Puntos 
-        WHERE liga_id = {liga_id}
-        GROUP BY jugador 
-        ORDER BY "Puntos Totales" DESC
-    """, engine)
+    version = obtener_version_lectura(liga_id)
+    df_puntos_total = obtener_clasificacion(liga_id, version)
     st.dataframe(df_puntos_total, use_container_width=True, hide_index=True) 
     st.bar_chart(df_puntos_total.set_index('jugador')['Puntos Totales'])
     
@@ -388,7 +698,8 @@ def interfaz_consultas(liga_id):
     st.markdown("---")
     st.subheader("2. Clasificación por Rango de Jornadas")
     
-    max_jornada = obtener_max_jornada(liga_id)
+    matriz = obtener_matriz_liga(liga_id, version)
+    max_jornada = int(matriz.jornadas.max()) if not matriz.vacia else 0
     
     if max_jornada > 0:
         
@@ -399,17 +710,7 @@ def interfaz_consultas(liga_id):
             j_fin = st.number_input("Jornada Final (incluida):", min_value=1, max_value=max_jornada, value=max_jornada, key="j_fin_rango")
 
         if j_inicio <= j_fin:
-            # Consulta SQL dinámica
-            df_rango = pd.read_sql(f"""
-                SELECT 
-                    jugador, 
-                    SUM(puntos) as "Puntos en el Rango",
-                    COUNT(DISTINCT jornada) as "Jornadas Contadas"
-                FROM Puntos 
-                WHERE liga_id = {liga_id} AND jornada BETWEEN {int(j_inicio)} AND {int(j_fin)}
-                GROUP BY jugador 
-                ORDER BY "Puntos en el Rango" DESC
-            """, engine)
+            df_rango = matriz_liga.clasificacion_rango(matriz, int(j_inicio), int(j_fin))
             
             st.dataframe(df_rango, use_container_width=True, hide_index=True)
             st.bar_chart(df_rango.set_index('jugador')['Puntos en el Rango'])
@@ -422,15 +723,7 @@ def interfaz_consultas(liga_id):
     st.markdown("---")
     st.subheader("3. Evolución de la Media de Puntos de la Liga")
     
-    df_media = pd.read_sql(f"""
-        SELECT 
-            jornada, 
-            ROUND(AVG(puntos), 2) as "Media de la Jornada"
-        FROM Puntos 
-        WHERE liga_id = {liga_id}
-        GROUP BY jornada 
-        ORDER BY jornada ASC
-    """, engine)
+    df_media = matriz_liga.media_por_jornada(matriz)
     
     if not df_media.empty:
         st.dataframe(df_media, use_container_width=True, hide_index=True)
@@ -438,6 +731,35 @@ def interfaz_consultas(liga_id):
     else:
         st.info("No hay suficientes datos para calcular la media por jornada.")
 
+    # 4. EVOLUCIÓN DE LA CLASIFICACIÓN (puesto tras cada jornada, calculado una vez por versión)
+    st.markdown("---")
+    st.subheader("4. Evolución de la Clasificación")
+
+    if matriz.vacia:
+        st.info("No hay datos de jornadas para mostrar la evolución.")
+        return
+
+    lideres = df_puntos_total['jugador'].head(5).tolist()
+    seleccion = st.multiselect("Jugadores:", matriz.jugadores.tolist(), default=lideres, key="jugadores_evolucion")
+    if seleccion:
+        df_evolucion = analitica.evolucion_posiciones(matriz, seleccion)
+        grafico = alt.Chart(df_evolucion).mark_line(point=True).encode(
+            x=alt.X('jornada:O', title='Jornada'),
+            y=alt.Y('puesto:Q', title='Puesto', scale=alt.Scale(reverse=True, zero=False)), # 1º arriba
+            color=alt.Color('jugador:N', title='Jugador'),
+            tooltip=['jugador', 'jornada', 'puesto'],
+        )
+        st.altair_chart(grafico, use_container_width=True)
+
+    # 5. MAYORES ESCALADAS
+    st.markdown("---")
+    st.subheader("5. Mayores Escaladas")
+    j_desde = st.number_input("Desde la Jornada:", min_value=int(matriz.jornadas.min()), max_value=max_jornada,
+                              value=int(matriz.jornadas.min()), key="j_desde_escaladas")
+    df_escaladas = analitica.mayores_escaladas(matriz, int(j_desde))
+    st.dataframe(df_escaladas, use_container_width=True, hide_index=True)
+    st.caption("Puestos empatados a puntos se comparten (1, 2, 2, 4).")
+
 
 # --- PÁGINA PRINCIPAL ---
 def interfaz_home(ligas_map):
@@ -452,32 +774,25 @@ def interfaz_home(ligas_map):
 
     st.info("Selecciona una liga para ver sus opciones en el menú de navegación.")
     
-    # Construir la lista de ligas con el conteo de participantes
-    
-    datos_ligas = []
-    for nombre, id_liga in ligas_map.items():
-        # Llamamos a la función optimizada para obtener el conteo
-        num_participantes = contar_participantes_por_liga(id_liga)
-        
-        # Lógica Condicional: Mostrar el ID solo si el rol es Admin
-        id_display = id_liga if user_role == 'Admin' else 'Oculto'
-        
-        datos_ligas.append({
-            'Nombre': nombre,
-            'ID': id_display, # Aquí usamos el valor condicional
-            'Participantes': num_participantes
-        })
-    
-    # Crea el DataFrame final
-    df_ligas = pd.DataFrame(datos_ligas)
-
-    # Mostrar el resumen en un formato de tabla limpio
+    # Resumen de todas las ligas (una consulta cacheada, sin bucle por liga)
+    df_ligas = obtener_resumen_ligas(obtener_version_global())
+    # Solo las ligas visibles para el usuario (ligas_map ya viene filtrado por permisos)
+    df_ligas = df_ligas[df_ligas['id'].isin(list(ligas_map.values()))].reset_index(drop=True)
+    lider = df_ligas['lider'].fillna('-')
+    con_lider = df_ligas['lider'].notna()
+    lider[con_lider] = lider[con_lider] + " (" + df_ligas.loc[con_lider, 'puntos_lider'].astype('int64').astype(str) + " pts)"
 
     # Renombrar columnas para la presentación final
-    df_presentacion = df_ligas.rename(columns={
-        'Nombre': 'Nombre de la Liga',
-        'Participantes': '👥 Participantes'
+    df_presentacion = pd.DataFrame({
+        'Nombre de la Liga': df_ligas['nombre'],
+        # Lógica Condicional: Mostrar el ID solo si el rol es Admin
+        'ID': df_ligas['id'],
+        '👥 Participantes': df_ligas['participantes'],
+        '📅 Última Jornada': df_ligas['ultima_jornada'],
+        '🔢 Registros': df_ligas['registros'],
+        '🏆 Líder': lider,
     })
+    columnas = ['Nombre de la Liga', '👥 Participantes', '📅 Última Jornada', '🔢 Registros', '🏆 Líder']
     
     # Si no es Admin, ocultamos completamente la columna ID del DataFrame
     if user_role != 'Admin':
@@ -488,7 +803,7 @@ def interfaz_home(ligas_map):
         use_container_width=True, 
         hide_index=True,
         # Ordenar columnas (quitamos 'ID' si el usuario no es Admin, Streamlit lo maneja)
-        column_order=['Nombre de la Liga', '👥 Participantes', 'ID'] if user_role == 'Admin' else ['Nombre de la Liga', '👥 Participantes']
+        column_order=columnas + ['ID'] if user_role == 'Admin' else columnas
     )
     
     # El selector de liga se mantiene en el sidebar
@@ -496,22 +811,8 @@ def interfaz_home(ligas_map):
 # --- NUEVAS FUNCIONES DE GESTIÓN DE PUNTOS ---
 def guardar_punto_individual(liga_id, jugador, jornada, puntos):
     """Actualiza los puntos de un jugador/jornada. Si el registro no existe, lo crea."""
-    with engine.connect() as connection:
-        # 1. Intentar actualizar el registro existente
-        # Esto funciona para correcciones de puntos ya existentes
-        update_result = connection.execute(text(
-            "UPDATE Puntos SET puntos = :puntos WHERE liga_id = :id AND jugador = :jugador AND jornada = :jornada"
-        ), {"puntos": puntos, "id": liga_id, "jugador": jugador, "jornada": jornada})
-        
-        # 2. Si no se actualizó ninguna fila (registro no existía), insertamos uno nuevo
-        # Esto funciona para jugadores olvidados en la entrada original
-        if update_result.rowcount == 0:
-            connection.execute(text(
-                "INSERT INTO Puntos (liga_id, jugador, jornada, puntos) VALUES (:id, :jugador, :jornada, :puntos)"
-            ), {"id": liga_id, "jugador": jugador, "jornada": jornada, "puntos": puntos})
-            
-        connection.commit()
-    st.cache_data.clear()
+    escritor.ejecutar(escribir_punto_individual, liga_id, jugador, jornada, puntos)
+    notificar_escritura(liga_id)
 
 
 def interfaz_entrada_individual(liga_id, jugadores):
@@ -519,7 +820,7 @@ def interfaz_entrada_individual(liga_id, jugadores):
     st.subheader("✏️ Modificar Puntos de un Jugador Específico")
     st.markdown("Utiliza esta opción para corregir puntos o añadir jugadores que se te olvidaron, sin afectar al resto.")
 
-    max_jornada = obtener_max_jornada(liga_id)
+    max_jornada = obtener_max_jornada(liga_id, obtener_version_liga(liga_id))
     # Sugerir la siguiente jornada
     jornada_default = max(1, max_jornada + 1)
     
@@ -534,9 +835,11 @@ def interfaz_entrada_individual(liga_id, jugadores):
         # Intentar obtener puntos actuales para precargar el campo (si existen)
         if jornada_sel > 0 and jugador_sel:
             with engine.connect() as connection:
-                current_points = connection.execute(text(
-                    "SELECT puntos FROM Puntos WHERE liga_id = :id AND jugador = :jugador AND jornada = :jornada"
-                ), {"id": liga_id, "jugador": jugador_sel, "jornada": jornada_sel}).scalar()
+                current_points = connection.execute(text("""
+                    SELECT p.puntos FROM Puntos p
+                    JOIN Jugadores j ON j.id = p.jugador_id
+                    WHERE j.liga_id = :id AND j.nombre = :jugador AND p.jornada = :jornada
+                """), {"id": liga_id, "jugador": jugador_sel, "jornada": jornada_sel}).scalar()
             # Si no hay puntos, usamos 0
             current_points = current_points if current_points is not None else 0
 
@@ -544,8 +847,11 @@ def interfaz_entrada_individual(liga_id, jugadores):
 
     if st.button("Guardar/Actualizar Punto Individual", key="btn_save_indiv"):
         if jugador_sel and jornada_sel >= 1 and puntos_sel >= 0:
-            guardar_punto_individual(liga_id, jugador_sel, jornada_sel, puntos_sel)
-            st.success(f"✅ Puntos de {jugador_sel} actualizados a {int(puntos_sel)} en Jornada {int(jornada_sel)}.")
+            try:
+                guardar_punto_individual(liga_id, jugador_sel, int(jornada_sel), int(puntos_sel))
+                st.success(f"✅ Puntos de {jugador_sel} actualizados a {int(puntos_sel)} en Jornada {int(jornada_sel)}.")
+            except Exception as e:
+                st.error(f"❌ Error al guardar en la BD: {e}")
             
         else:
             st.error("Por favor, verifica los datos de la jornada y puntos.")
@@ -556,7 +862,7 @@ def interfaz_eliminar_jornada(liga_id):
     st.subheader("🗑️ Eliminar Puntos de una Jornada Completa")
     st.markdown("Esta acción **eliminará permanentemente** todos los puntos de la jornada seleccionada para todos los participantes.")
     
-    max_jornada = obtener_max_jornada(liga_id)
+    max_jornada = obtener_max_jornada(liga_id, obtener_version_liga(liga_id))
 
     if max_jornada == 0:
         st.info("Aún no hay puntos registrados en esta liga.")
@@ -565,8 +871,8 @@ def interfaz_eliminar_jornada(liga_id):
     # Obtener todas las jornadas registradas para el selectbox
     with engine.connect() as connection:
         jornadas_registradas = connection.execute(text(
-            f"SELECT DISTINCT jornada FROM Puntos WHERE liga_id = {liga_id} ORDER BY jornada DESC"
-        )).scalars().all()
+            "SELECT DISTINCT jornada FROM Puntos WHERE liga_id = :id ORDER BY jornada DESC"
+        ), {"id": liga_id}).scalars().all()
     
     jornada_a_eliminar = st.selectbox(
         "Selecciona la jornada a eliminar:", 
@@ -575,12 +881,12 @@ def interfaz_eliminar_jornada(liga_id):
     )
 
     if st.button(f"🔴 CONFIRMAR ELIMINACIÓN DE JORNADA {jornada_a_eliminar}"):
-        with engine.connect() as connection:
-            connection.execute(text(
-                "DELETE FROM Puntos WHERE liga_id = :id AND jornada = :jornada"
-            ), {"id": liga_id, "jornada": jornada_a_eliminar})
-            connection.commit()
-        st.cache_data.clear()
+        try:
+            escritor.ejecutar(eliminar_jornada_bd, liga_id, jornada_a_eliminar)
+        except Exception as e:
+            st.error(f"Error al eliminar la jornada: {e}")
+            return
+        notificar_escritura(liga_id)
         st.success(f"✅ ¡Jornada {jornada_a_eliminar} eliminada completamente!")
         st.rerun() # Recarga la página para actualizar las listas de jornadas
 
@@ -603,9 +909,28 @@ def interfaz_gestion_puntos(liga_id, jugadores):
         interfaz_eliminar_jornada(liga_id)
 
 
+def panel_diagnosticos():
+    """Panel del sidebar con los tiempos de páginas, consultas y caché (solo Admin)."""
+    with st.sidebar.expander("🩺 Diagnósticos"):
+        st.caption("Datos de este proceso (todas las sesiones). Tiempos en ms.")
+        st.markdown("**Páginas**")
+        st.dataframe(pd.DataFrame(diagnosticos.resumen_paginas()), hide_index=True)
+        st.markdown("**Consultas más lentas (p95)**")
+        st.dataframe(pd.DataFrame(diagnosticos.resumen_consultas()), hide_index=True)
+        st.markdown("**Caché**")
+        st.dataframe(pd.DataFrame(diagnosticos.resumen_cache()), hide_index=True)
+        st.markdown("**Precálculo en segundo plano**")
+        st.dataframe(pd.DataFrame(precalculo.estado()), hide_index=True)
+        st.markdown("**Escritor único**")
+        st.dataframe(pd.DataFrame([escritor.estado()]), hide_index=True)
+        if st.button("Reiniciar diagnósticos"):
+            diagnosticos.reiniciar()
+            st.rerun()
+
 # --- ESTRUCTURA PRINCIPAL DE LA APP ---
 def main():
     st.set_page_config(layout="wide", page_title="Gestor Fantasy", initial_sidebar_state="expanded")
+    inicializar_bd()
     
     # Inicializar el estado de la sesión si es la primera carga
     if 'authentication_status' not in st.session_state:
@@ -626,11 +951,13 @@ def main():
     # -----------------------------------------------------
     # AUTENTICACIÓN Y ROLES
     # -----------------------------------------------------
+    USER_CONFIG = cargar_config_usuarios()
     authenticator = stauth.Authenticate(
         USER_CONFIG['credentials'],
         USER_CONFIG['cookie']['name'],
         USER_CONFIG['cookie']['key'],
-        USER_CONFIG['cookie']['expiry_days']
+        USER_CONFIG['cookie']['expiry_days'],
+        auto_hash=False # Las contraseñas del almacén ya están hasheadas
     )
 
     # -----------------------------------------------------
@@ -686,12 +1013,12 @@ def main():
             else:
                 # Mostrar solo el nombre si no es Admin
                 st.sidebar.markdown(f"**{nombre_liga_activa}**")
-            jugadores = obtener_jugadores(liga_id_activa)
+            jugadores = obtener_jugadores(liga_id_activa, obtener_version_liga(liga_id_activa))
         else:
             st.sidebar.warning("No hay ligas. Crea una en 'Gestión de Ligas'.")
 
         # 4. Menú de Navegación (Depende del rol)
-        menu_base = ["Home", "Clasificación", "Rendimiento Individual", "Tabla Completa"]
+        menu_base = ["Home", "Clasificación", "Rendimiento Individual", "Forma", "Cara a Cara", "Proyección", "Tabla Completa"]
         
         # Añadir opciones sensibles solo si es Admin
         if user_role == 'Admin':
@@ -703,51 +1030,66 @@ def main():
         choice = st.sidebar.selectbox("Menú de Navegación:", menu)
 
         # 5. Renderizado de Páginas (Depende del rol y la selección)
+        # (cronometrado: tiempo de la página y consultas atribuidas a ella en Diagnósticos)
+        with diagnosticos.medir_pagina(choice):
         
-        if choice == "Home":
-            st.markdown(f"## 👋 Bienvenido, {name}")
-            st.markdown(f"**Tu Rol:** `{user_role}`")
+            if choice == "Home":
+                st.markdown(f"## 👋 Bienvenido, {name}")
+                st.markdown(f"**Tu Rol:** `{user_role}`")
             
-            if ligas_map:
-                interfaz_home(ligas_map)
-            else:
-                 st.info("¡Bienvenido! Como no hay ligas creadas, el administrador debe ir a 'Gestión de Ligas' para empezar.")
+                if ligas_map:
+                    interfaz_home(ligas_map)
+                else:
+                     st.info("¡Bienvenido! Como no hay ligas creadas, el administrador debe ir a 'Gestión de Ligas' para empezar.")
             
-        elif choice == "Gestión de Ligas" and user_role == 'Admin':
-            gestionar_ligas(ligas_map)
+            elif choice == "Gestión de Ligas" and user_role == 'Admin':
+                gestionar_ligas(ligas_map)
             
-        elif liga_id_activa is None and choice != "Gestión de Ligas":
-            st.warning("Selecciona una liga en el menú lateral para acceder a estas opciones.")
+            elif liga_id_activa is None and choice != "Gestión de Ligas":
+                st.warning("Selecciona una liga en el menú lateral para acceder a estas opciones.")
                  
-        # Opciones protegidas para ADMIN
-        elif user_role != 'Admin' and choice in ["Gestión de Puntos", "Gestión de Participantes", "Gestión de Ligas"]:
-            st.error("🚨 Acceso Denegado. Solo los administradores pueden acceder a la gestión de datos.")
+            # Opciones protegidas para ADMIN
+            elif user_role != 'Admin' and choice in ["Gestión de Puntos", "Gestión de Participantes", "Gestión de Ligas"]:
+                st.error("🚨 Acceso Denegado. Solo los administradores pueden acceder a la gestión de datos.")
             
-        # Opciones disponibles para todos (Admin y User)
-        elif choice == "Clasificación":
-            interfaz_consultas(liga_id_activa)
+            # Opciones disponibles para todos (Admin y User)
+            elif choice == "Clasificación":
+                interfaz_consultas(liga_id_activa)
             
-        elif choice == "Rendimiento Individual":
-            if jugadores:
-                interfaz_rendimiento_jugador(liga_id_activa, jugadores)
-            else:
-                st.warning("Añade jugadores primero.")
+            elif choice == "Rendimiento Individual":
+                if jugadores:
+                    interfaz_rendimiento_jugador(liga_id_activa, jugadores)
+                else:
+                    st.warning("Añade jugadores primero.")
                 
-        elif choice == "Tabla Completa":
-            if liga_id_activa:
-                interfaz_pivote_completo(liga_id_activa, nombre_liga_activa)
-            else:
-                st.warning("Selecciona una liga.")
+            elif choice == "Forma":
+                interfaz_forma(liga_id_activa)
+
+            elif choice == "Cara a Cara":
+                interfaz_cara_a_cara(liga_id_activa)
+
+            elif choice == "Proyección":
+                interfaz_proyeccion(liga_id_activa)
+
+            elif choice == "Tabla Completa":
+                if liga_id_activa:
+                    interfaz_pivote_completo(liga_id_activa, nombre_liga_activa)
+                else:
+                    st.warning("Selecciona una liga.")
                 
-        # Opciones de Admin
-        elif choice == "Gestión de Puntos":
-            if jugadores:
-                interfaz_gestion_puntos(liga_id_activa, jugadores) 
-            else:
-                st.warning("Añade jugadores primero en la sección 'Gestión de Participantes'.")
+            # Opciones de Admin
+            elif choice == "Gestión de Puntos":
+                if jugadores:
+                    interfaz_gestion_puntos(liga_id_activa, jugadores) 
+                else:
+                    st.warning("Añade jugadores primero en la sección 'Gestión de Participantes'.")
                 
-        elif choice == "Gestión de Participantes":
-            gestionar_jugadores(liga_id_activa, nombre_liga_activa)
+            elif choice == "Gestión de Participantes":
+                gestionar_jugadores(liga_id_activa, nombre_liga_activa)
+
+        # 6. Panel de Diagnósticos (solo Admin)
+        if user_role == 'Admin':
+            panel_diagnosticos()
     
     else:
         # **********************************************
@@ -767,25 +1109,23 @@ def main():
                 login_password = st.text_input('Contraseña', type='password', key='login_pass')
                 
                 if st.form_submit_button('Entrar'):
-                    # Buscar credenciales en la configuración
-                    if login_username in USER_CONFIG['credentials']['usernames']:
+                    # Validar la contraseña en el pool de verificación (acotado y compartido por las sesiones)
+                    resultado, user_info = autenticacion.verificar_credenciales(login_username, login_password)
+
+                    if resultado == autenticacion.CORRECTO:
+                        st.session_state['authentication_status'] = True
+                        st.session_state['username'] = login_username
+                        st.session_state['name'] = user_info['name']
+                        st.session_state['user_role'] = user_info['role']
                         
-                        user_info = USER_CONFIG['credentials']['usernames'][login_username]
-                        hashed_password = user_info['password']
+                        st.success(f"¡Bienvenido, {user_info['name']}!")
+                        st.rerun() # Recarga para mostrar el contenido
                         
-                        # Validar la contraseña usando el Hasher (requiere que el Hasher esté correctamente hasheado)
-                        if stauth.Hasher().check_pw(login_password, hashed_password):
-                            st.session_state['authentication_status'] = True
-                            st.session_state['username'] = login_username
-                            st.session_state['name'] = user_info['name']
-                            st.session_state['user_role'] = user_info['role']
-                            
-                            st.success(f"¡Bienvenido, {user_info['name']}!")
-                            st.rerun() # Recarga para mostrar el contenido
-                            
-                        else:
-                            st.error('Usuario o Contraseña incorrecta.')
-                            
+                    elif resultado == autenticacion.BLOQUEADO:
+                        espera = math.ceil(autenticacion.segundos_bloqueo(login_username))
+                        st.error(f"Demasiados intentos fallidos. Vuelve a intentarlo en {espera} segundos.")
+                    elif resultado == autenticacion.OCUPADO:
+                        st.warning("Hay muchos inicios de sesión en curso. Inténtalo de nuevo en unos segundos.")
                     else:
                         st.error('Usuario o Contraseña incorrecta.')
 
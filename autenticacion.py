@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TimeoutVerificacion
+import bcrypt
+from config import cargar_config_usuarios
+
+# --- VERIFICACIÓN DE CONTRASEÑAS EN UN POOL ACOTADO ---
+# bcrypt es lento a propósito (~0,25 s por comprobación). Las comprobaciones se
+# hacen en un pool de hilos acotado y compartido por todas las sesiones: una ráfaga
+# de logins ocupa como mucho MAX_VERIFICACIONES núcleos y deja CPU libre para que el
+# resto de sesiones pinten sus páginas. Si hay demasiadas en cola se rechaza el intento.
+# La sesión que hace login sí espera el resultado (hasta TIMEOUT_VERIFICACION): su
+# script no puede seguir sin saber si la contraseña es correcta.
+MAX_VERIFICACIONES = int(os.environ.get("FANTASY_LOGIN_HILOS", 2))
+MAX_EN_COLA = MAX_VERIFICACIONES * 8
+TIMEOUT_VERIFICACION = 10 # segundos
+
+# Limitador por usuario: con MAX_INTENTOS fallos dentro de VENTANA_INTENTOS segundos
+# el usuario queda bloqueado hasta que el fallo más antiguo sale de la ventana.
+MAX_INTENTOS = 5
+VENTANA_INTENTOS = 300
+
+# Resultados de verificar_credenciales
+CORRECTO = "correcto"
+INCORRECTO = "incorrecto"
+BLOQUEADO = "bloqueado"
+OCUPADO = "ocupado"
+
+# Hash fijo para los usuarios que no existen: cuestan lo mismo que una contraseña
+# incorrecta y no se puede averiguar qué usuarios existen midiendo el tiempo.
+HASH_FICTICIO = "$2b$12$QN.sVMopQX033zRQ5MHtZelQqtKhCF4d.l.gHtjwYIZeCkggVeKjm"
+
+_cerrojo = threading.Lock()
+_ejecutor = None
+_plazas = threading.BoundedSemaphore(MAX_EN_COLA)
+_fallos = {} # usuario -> deque con los instantes (monotonic) de sus fallos recientes
+
+def _obtener_ejecutor():
+    # El pool se crea con el primer login, no al importar el módulo
+    global _ejecutor
+    with _cerrojo:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=MAX_VERIFICACIONES, thread_name_prefix="verificar_login")
+        return _ejecutor
+
+def _fallos_recientes(usuario, ahora):
+    # Llamar con _cerrojo adquirido. Descarta los fallos que ya salieron de la ventana.
+    fallos = _fallos.get(usuario)
+    while fallos and ahora - fallos[0] > VENTANA_INTENTOS:
+        fallos.popleft()
+    if fallos is not None and not fallos:
+        del _fallos[usuario]
+        return None
+    return fallos
+
+def segundos_bloqueo(usuario):
+    """Segundos que le quedan de bloqueo al usuario (0 si puede intentarlo)."""
+    ahora = time.monotonic()
+    with _cerrojo:
+        fallos = _fallos_recientes(usuario, ahora)
+        if fallos is None or len(fallos) < MAX_INTENTOS:
+            return 0
+        return max(0.0, VENTANA_INTENTOS - (ahora - fallos[0]))
+
+def _registrar_resultado(usuario, correcto):
+    ahora = time.monotonic()
+    with _cerrojo:
+        if correcto:
+            _fallos.pop(usuario, None)
+            return
+        _fallos.setdefault(usuario, deque(maxlen=MAX_INTENTOS)).append(ahora)
+        # Que una lluvia de usuarios inventados no haga crecer el registro sin límite
+        if len(_fallos) > 10_000:
+            for otro in list(_fallos):
+                _fallos_recientes(otro, ahora)
+
+def _comprobar(password, hash_guardado):
+    try:
+        return bcrypt.checkpw(password.encode(), hash_guardado.encode())
+    except ValueError:
+        # Hash mal formado en el almacén: se trata como contraseña incorrecta
+        return False
+    finally:
+        _plazas.release()
+
+def verificar_credenciales(usuario, password):
+    """Comprueba usuario y contraseña en el pool de verificación. La página que llama
+    espera bloqueada al resultado (hasta TIMEOUT_VERIFICACION segundos): el pool limita
+    cuántas comprobaciones corren a la vez, no evita esa espera.
+    Devuelve (resultado, datos_usuario): resultado es CORRECTO, INCORRECTO, BLOQUEADO
+    (demasiados fallos recientes) u OCUPADO (pool saturado o sin respuesta a tiempo; si
+    la comprobación llegó a encolarse cuenta como un fallo del usuario para el
+    limitador); datos_usuario solo si es CORRECTO."""
+    if segundos_bloqueo(usuario) > 0:
+        return BLOQUEADO, None
+    if not _plazas.acquire(blocking=False):
+        return OCUPADO, None
+
+    datos_usuario = cargar_config_usuarios()['credentials']['usernames'].get(usuario)
+    hash_guardado = datos_usuario['password'] if datos_usuario else HASH_FICTICIO
+    try:
+        futuro = _obtener_ejecutor().submit(_comprobar, password, hash_guardado)
+    except Exception:
+        _plazas.release()
+        raise
+
+    try:
+        correcto = futuro.result(timeout=TIMEOUT_VERIFICACION) and datos_usuario is not None
+    except TimeoutVerificacion:
+        # Cuenta como intento: una ráfaga de logins que agote el tiempo no debe
+        # esquivar el limitador (su resultado, cuando llegue, se descarta)
+        _registrar_resultado(usuario, False)
+        return OCUPADO, None
+
+    _registrar_resultado(usuario, correcto)
+    return (CORRECTO, datos_usuario) if correcto else (INCORRECTO, None)
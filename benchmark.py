@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# --- BENCHMARK DE LAS FUNCIONES DE DATOS ---
+# Mide, fuera de Streamlit y sobre ligas sintéticas de varios tamaños, las funciones
+# que alimentan cada página de app.py y los caminos de importación. El resultado se
+# guarda en JSON y dos ejecuciones se pueden comparar para detectar regresiones.
+#
+# Uso:
+#   python benchmark.py ejecutar --jugadores 10 1000 100000 --salida base.json
+#   python benchmark.py comparar base.json nuevo.json
+ESCALAS = [10, 1_000, 100_000]
+UMBRAL_REGRESION = 1.25 # nuevo/base por encima de esto se marca como regresión
+
+def medir(funcion, repeticiones):
+    """Ejecuta funcion() 'repeticiones' veces. Devuelve (tiempos en s, último resultado)."""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos, resultado
+
+def _filas(resultado):
+    # Tamaño del resultado (filas de un DataFrame, elementos de una lista...) para el informe
+    if hasattr(resultado, "shape"):
+        return int(resultado.shape[0])
+    if hasattr(resultado, "puntos"):
+        return int(resultado.puntos.size)
+    try:
+        return len(resultado)
+    except TypeError:
+        return None
+
+def casos_lectura(engine, liga_id, num_jornadas):
+    """Lista de (página, caso, función) con las lecturas de cada página de la app.
+    Se llaman las mismas funciones de datos.py, matriz_liga.py, analitica.py y proyeccion.py
+    que usa app.py, sin la caché de Streamlit: se mide el trabajo real. Cada caso conserva
+    el nombre de la función de app.py que lo lanza (los JSON antiguos siguen comparables)."""
+    import analitica
+    import datos
+    import matriz_liga
+    import proyeccion
+
+    m = matriz_liga.cargar_matriz_liga(engine, liga_id)
+    primer_jugador = m.jugadores[0]
+    return [
+        ("Home", "obtener_ligas", lambda: datos.leer_ligas(engine)),
+        ("Home", "obtener_resumen_ligas", lambda: datos.leer_resumen_ligas(engine)),
+        ("Menú", "obtener_jugadores", lambda: datos.leer_jugadores(engine, liga_id)),
+        ("Menú", "obtener_max_jornada", lambda: datos.leer_max_jornada(engine, liga_id)),
+        ("Clasificación", "obtener_clasificacion", lambda: datos.leer_clasificacion(engine, liga_id)),
+        ("Clasificación / Tabla Completa / Rendimiento", "obtener_matriz_liga",
+         lambda: matriz_liga.cargar_matriz_liga(engine, liga_id)),
+        ("Clasificación", "clasificacion_rango", lambda: matriz_liga.clasificacion_rango(m, 1, num_jornadas // 2)),
+        ("Clasificación", "media_por_jornada", lambda: matriz_liga.media_por_jornada(m)),
+        ("Clasificación", "calcular_posiciones", lambda: matriz_liga.calcular_posiciones(m)),
+        ("Tabla Completa", "tabla_pivote", lambda: matriz_liga.tabla_pivote(m)),
+        ("Tabla Completa", "pagina_pivote", lambda: matriz_liga.pagina_pivote(m, 2, 50, "TOTAL", True, "1")),
+        ("Forma", "tabla_forma", lambda: analitica.tabla_forma(m, 5, 60)),
+        ("Cara a Cara", "tabla_cara_a_cara", lambda: analitica.tabla_cara_a_cara(m, m.jugadores[0])),
+        ("Cara a Cara", "cara_a_cara (filas)",
+         lambda: analitica.cara_a_cara(m, range(min(len(m.jugadores), analitica.MAX_JUGADORES_MATRIZ)))),
+        ("Proyección", "simular_proyeccion", lambda: proyeccion.simular(m, num_jornadas + 10, 1_000)),
+        ("Rendimiento Individual", "obtener_top_puntuaciones", lambda: datos.leer_top_puntuaciones(engine, liga_id)),
+        ("Rendimiento Individual", "obtener_mvp_jornadas", lambda: datos.leer_mvp_jornadas(engine, liga_id)),
+        ("Rendimiento Individual", "obtener_mejores_jugadores", lambda: datos.leer_mejores_jugadores(engine, liga_id)),
+        ("Rendimiento Individual", "jornadas_por_criterio",
+         lambda: matriz_liga.jornadas_por_criterio(m, primer_jugador, ">", 60)),
+    ]
+
+def ejecutar_benchmark(escalas, num_jornadas=38, repeticiones=5, distribucion="normal", semilla=0):
+    """Genera una liga por escala en la BD configurada y mide importaciones y lecturas.
+    Devuelve la lista de resultados (un dict por escala y caso)."""
+    # Se importan aquí: deben leer FANTASY_DB_URL después de que __main__ la haya fijado
+    import datos
+    import import_data
+    import parquet_ligas
+    import datos_sinteticos
+    from db_setup import aplicar_migraciones
+
+    aplicar_migraciones(datos.engine)
+    resultados = []
+
+    def anotar(escala, pagina, caso, tiempos, resultado):
+        resultados.append({
+            "escala": escala, "pagina": pagina, "caso": caso, "repeticiones": len(tiempos),
+            "min_s": min(tiempos), "mediana_s": statistics.median(tiempos), "media_s": statistics.fmean(tiempos),
+            "filas": _filas(resultado),
+        })
+        print(f"   {caso:<28} mediana {statistics.median(tiempos) * 1000:10.2f} ms")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for escala in escalas:
+            print(f"▶ {escala} jugadores × {num_jornadas} jornadas")
+            df = datos_sinteticos.generar_puntos(escala, num_jornadas, distribucion, semilla=semilla)
+            nombre = f"Benchmark {escala}"
+            liga_id = datos_sinteticos.crear_liga_sintetica(datos.engine, nombre, df.iloc[:0])
+
+            # Importación: CSV completo, re-importación delta sin cambios y copia Parquet
+            ruta_csv = os.path.join(carpeta, f"{escala}.csv")
+            df.to_csv(ruta_csv, index=False)
+            tiempos, _ = medir(lambda: import_data.importar_csv(ruta_csv, liga_id), 1)
+            anotar(escala, "Importación", "importar_csv", tiempos, df)
+            tiempos, _ = medir(lambda: import_data.importar_csv_delta(ruta_csv, liga_id), 1)
+            anotar(escala, "Importación", "importar_csv_delta", tiempos, df)
+            ruta_parquet = os.path.join(carpeta, f"{escala}.parquet")
+            tiempos, _ = medir(lambda: parquet_ligas.exportar_ligas(datos.engine, ruta_parquet, liga_id), 1)
+            anotar(escala, "Gestión de Ligas", "exportar_parquet", tiempos, df)
+            tiempos, _ = medir(lambda: parquet_ligas.importar_ligas(datos.engine, ruta_parquet), 1)
+            anotar(escala, "Gestión de Ligas", "importar_parquet", tiempos, df)
+
+            for pagina, caso, funcion in casos_lectura(datos.engine, liga_id, num_jornadas):
+                tiempos, resultado = medir(funcion, repeticiones)
+                anotar(escala, pagina, caso, tiempos, resultado)
+    return resultados
+
+def comparar(base, nuevo):
+    """Compara las medianas de dos ejecuciones. Devuelve [(escala, caso, base_s, nuevo_s, ratio)]
+    ordenado de peor a mejor ratio (nuevo / base)."""
+    indice_base = {(r["escala"], r["caso"]): r for r in base["resultados"]}
+    filas = []
+    for r in nuevo["resultados"]:
+        anterior = indice_base.get((r["escala"], r["caso"]))
+        if anterior is None:
+            continue
+        ratio = r["mediana_s"] / max(anterior["mediana_s"], 1e-9)
+        filas.append((r["escala"], r["caso"], anterior["mediana_s"], r["mediana_s"], ratio))
+    return sorted(filas, key=lambda fila: fila[4], reverse=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de las funciones de datos de la app.")
+    subcomandos = parser.add_subparsers(dest="accion", required=True)
+    p_ejecutar = subcomandos.add_parser("ejecutar", help="Mide las funciones sobre ligas sintéticas.")
+    p_ejecutar.add_argument("--jugadores", type=int, nargs="+", default=ESCALAS, help="Escalas (jugadores por liga).")
+    p_ejecutar.add_argument("--jornadas", type=int, default=38)
+    p_ejecutar.add_argument("--repeticiones", type=int, default=5, help="Repeticiones de cada lectura.")
+    p_ejecutar.add_argument("--distribucion", choices=("normal", "poisson", "uniforme"), default="normal")
+    p_ejecutar.add_argument("--semilla", type=int, default=0)
+    p_ejecutar.add_argument("--bd", help="URL de la BD a usar (por defecto, una BD SQLite temporal).")
+    p_ejecutar.add_argument("--salida", default="benchmark.json", help="Fichero JSON de resultados.")
+    p_comparar = subcomandos.add_parser("comparar", help="Compara dos ficheros de resultados.")
+    p_comparar.add_argument("base", help="JSON de referencia.")
+    p_comparar.add_argument("nuevo", help="JSON a comparar.")
+    p_comparar.add_argument("--umbral", type=float, default=UMBRAL_REGRESION,
+                            help="Ratio nuevo/base a partir del cual hay regresión.")
+    args = parser.parse_args()
+
+    if args.accion == "ejecutar":
+        with tempfile.TemporaryDirectory() as carpeta_bd:
+            # Nunca sobre fantasy.db salvo que se pida con --bd
+            os.environ["FANTASY_DB_URL"] = args.bd or f"sqlite:///{os.path.join(carpeta_bd, 'benchmark.db')}"
+            inicio = time.perf_counter()
+            resultados = ejecutar_benchmark(args.jugadores, args.jornadas, args.repeticiones,
+                                            args.distribucion, args.semilla)
+            informe = {
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "parametros": {"jugadores": args.jugadores, "jornadas": args.jornadas,
+                               "repeticiones": args.repeticiones, "distribucion": args.distribucion,
+                               "semilla": args.semilla},
+                "resultados": resultados,
+            }
+            with open(args.salida, "w", encoding="utf-8") as f:
+                json.dump(informe, f, indent=2, ensure_ascii=False)
+            print(f"✅ Benchmark completado en {time.perf_counter() - inicio:.1f} s. Resultados en '{args.salida}'.")
+    else:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.nuevo, encoding="utf-8") as f:
+            nuevo = json.load(f)
+        filas = comparar(base, nuevo)
+        regresiones = 0
+        print(f"{'escala':>8}  {'caso':<28}{'base (ms)':>12}{'nuevo (ms)':>12}{'ratio':>8}")
+        for escala, caso, base_s, nuevo_s, ratio in filas:
+            marca = ""
+            if ratio > args.umbral:
+                marca = "  🔴 REGRESIÓN"
+                regresiones += 1
+            elif ratio < 1 / args.umbral:
+                marca = "  🟢 mejora"
+            print(f"{escala:>8}  {caso:<28}{base_s * 1000:>12.2f}{nuevo_s * 1000:>12.2f}{ratio:>8.2f}{marca}")
+        # Código de salida distinto de 0 si hay regresiones (para usarlo antes de desplegar)
+        sys.exit(1 if regresiones else 0)
@@ -1,43 +1,31 @@
 # config.py
-import streamlit_authenticator as stauth
+import os
+from functools import lru_cache
+import yaml
 
-# 1. Definimos las contraseñas claras en una lista
-PASSWORDS_CLARAS = ['administradorFantasy25', '1234', '2121']
+# 1. Las credenciales viven en un almacén YAML con los hashes bcrypt ya calculados:
+#    al arrancar no se hashea nada (antes eran N rondas de bcrypt por cada import).
+#    Ruta configurable con la variable de entorno FANTASY_CREDENCIALES.
+RUTA_CREDENCIALES = os.environ.get(
+    "FANTASY_CREDENCIALES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "credenciales.yaml")
+)
 
-# 2. Creamos una lista hasheada manualmente.
-#    Usamos una comprensión de lista para llamar a .hash() para CADA contraseña.
-#    Esto evita el bug de la librería con las listas.
-HASED_PASSWORDS = [stauth.Hasher().hash(password) for password in PASSWORDS_CLARAS]
+# 2. Se lee la primera vez que se necesita y se reutiliza durante todo el proceso.
+@lru_cache(maxsize=1)
+def cargar_config_usuarios():
+    """Devuelve la configuración de usuarios ('credentials' y 'cookie') del almacén."""
+    with open(RUTA_CREDENCIALES, encoding="utf-8") as archivo:
+        return yaml.safe_load(archivo)
 
-USER_CONFIG = {
-    'credentials': {
-        'usernames': {
-            'admin_user': {
-                'email': 'admin@fantasy.com',
-                'name': 'Administrador',
-                'password': HASED_PASSWORDS[0],
-                'role': 'Admin',
-                'allowed_leagues': []
-            },
-            'user00': {
-                'email': 'usuarioAKC@fantasy.com',
-                'name': 'Usuario Liga AKC',
-                'password': HASED_PASSWORDS[1],
-                'role': 'User',
-                'allowed_leagues': ['Liga AKC 2025-26']
-            },
-            'user01': {
-                'email': 'usuarioPrueba@fantasy.com',
-                'name': 'Usuario Prueba',
-                'password': HASED_PASSWORDS[2],
-                'role': 'User',
-                'allowed_leagues': []
-            }
-        }
-    },
-    'cookie': {
-        'expiry_days': 30,
-        'key': 'aplicacion_para_analisis_fantasy_lebp', # ¡Cambia esto!
-        'name': 'fantasy_auth_cookie'
-    }
-}
\ No newline at end of file
+def __getattr__(nombre):
+    # 'from config import USER_CONFIG' sigue funcionando (se carga en ese momento)
+    if nombre == "USER_CONFIG":
+        return cargar_config_usuarios()
+    raise AttributeError(f"module 'config' has no attribute '{nombre}'")
+
+if __name__ == '__main__':
+    # Genera el hash bcrypt de una contraseña para pegarlo en credenciales.yaml
+    import getpass
+    import streamlit_authenticator as stauth
+    print(stauth.Hasher.hash(getpass.getpass("Contraseña: ")))
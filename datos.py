@@ -0,0 +1,311 @@
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.pool import QueuePool
+
+# --- ACCESO A DATOS COMPARTIDO (app.py, db_setup.py, import_data.py, scripts) ---
+
+# --- CONEXIÓN A LA BASE DE DATOS ---
+# URL y tamaño del pool configurables por variables de entorno (por defecto, el
+# fichero local fantasy.db). Todas las piezas usan el mismo 'engine' de este módulo.
+URL_BD = os.environ.get("FANTASY_DB_URL", "sqlite:///fantasy.db")
+POOL_SIZE = int(os.environ.get("FANTASY_DB_POOL_SIZE", 5))
+MAX_OVERFLOW = int(os.environ.get("FANTASY_DB_MAX_OVERFLOW", 10))
+
+# PRAGMAs aplicados a cada nueva conexión SQLite:
+# - WAL: los lectores (sesiones de Streamlit) no se bloquean mientras alguien escribe.
+# - synchronous=NORMAL: en WAL es seguro ante caídas de la app y evita un fsync por commit.
+# - busy_timeout: esperar al escritor en lugar de fallar con "database is locked".
+# - cache_size (negativo = KiB) y mmap_size: más páginas en memoria para las lecturas.
+# - foreign_keys: SQLite no comprueba las FOREIGN KEY si no se activa por conexión.
+PRAGMAS_SQLITE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "foreign_keys": "ON",
+}
+
+def crear_engine(url=None, pool_size=None, max_overflow=None):
+    """Crea un engine de SQLAlchemy con el pool configurado y, si es SQLite,
+    con los PRAGMAs de PRAGMAS_SQLITE aplicados en cada conexión nueva."""
+    url = make_url(url or URL_BD)
+    opciones = {}
+    # pool_size/max_overflow solo existen en QueuePool: SQLite en memoria ('sqlite://')
+    # usa SingletonThreadPool y create_engine rechazaría esos argumentos
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        opciones["pool_size"] = POOL_SIZE if pool_size is None else pool_size
+        opciones["max_overflow"] = MAX_OVERFLOW if max_overflow is None else max_overflow
+    nuevo_engine = create_engine(url, **opciones)
+
+    if nuevo_engine.dialect.name == "sqlite":
+        @event.listens_for(nuevo_engine, "connect")
+        def configurar_sqlite(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma, valor in PRAGMAS_SQLITE.items():
+                cursor.execute(f"PRAGMA {pragma} = {valor}")
+            cursor.close()
+
+    return nuevo_engine
+
+engine = crear_engine()
+
+# --- VERSIONES DE LIGA ---
+# Cada liga tiene un contador de generación en la tabla VersionesLiga que se
+# incrementa en cada escritura. La app lo usa como parte de la clave de caché,
+# de modo que al modificar una liga solo se invalidan los datos de esa liga.
+
+def obtener_version_liga(connection, liga_id):
+    """Devuelve la versión actual de los datos de una liga (0 si nunca se ha escrito)."""
+    version = connection.execute(text(
+        "SELECT version FROM VersionesLiga WHERE liga_id = :id"
+    ), {"id": liga_id}).scalar()
+    return int(version) if version else 0
+
+def incrementar_version_liga(connection, liga_id):
+    """Incrementa la versión de la liga. Debe llamarse dentro de la misma transacción que la escritura."""
+    connection.execute(text("""
+        INSERT INTO VersionesLiga (liga_id, version) VALUES (:id, 1)
+        ON CONFLICT(liga_id) DO UPDATE SET version = version + 1
+    """), {"id": liga_id})
+
+def obtener_version_global(connection):
+    """Clave de caché de las vistas que abarcan todas las ligas: (ligas con versión, suma
+    de versiones). Las versiones solo crecen, así que cualquier escritura la cambia."""
+    num, suma = connection.execute(text(
+        "SELECT COUNT(*), COALESCE(SUM(version), 0) FROM VersionesLiga"
+    )).one()
+    return int(num), int(suma)
+
+# --- RESUMEN DE TODAS LAS LIGAS ---
+# Una sola consulta para la Home: participantes, última jornada, registros y líder
+# de cada liga (cada agregado es un GROUP BY por liga_id sobre su índice).
+SQL_RESUMEN_LIGAS = """
+    WITH participantes AS (
+        SELECT liga_id, COUNT(*) AS participantes FROM Jugadores GROUP BY liga_id
+    ),
+    registros AS (
+        SELECT liga_id, MAX(jornada) AS ultima_jornada, COUNT(*) AS registros FROM Puntos GROUP BY liga_id
+    ),
+    lideres AS (
+        SELECT c.liga_id, j.nombre AS lider, c.total AS puntos_lider,
+               ROW_NUMBER() OVER (PARTITION BY c.liga_id ORDER BY c.total DESC, j.nombre) AS puesto
+        FROM Clasificacion c JOIN Jugadores j ON j.id = c.jugador_id
+    )
+    SELECT l.id, l.nombre,
+           COALESCE(pa.participantes, 0) AS participantes,
+           COALESCE(r.ultima_jornada, 0) AS ultima_jornada,
+           COALESCE(r.registros, 0) AS registros,
+           li.lider, li.puntos_lider
+    FROM Ligas l
+    LEFT JOIN participantes pa ON pa.liga_id = l.id
+    LEFT JOIN registros r ON r.liga_id = l.id
+    LEFT JOIN lideres li ON li.liga_id = l.id AND li.puesto = 1
+    ORDER BY l.nombre
+"""
+
+
+# --- RÉCORDS ---
+# Top K de la liga: recorre idx_puntos_liga_puntos y se detiene en la fila K.
+# Máximo anotador por jornada y mejor jornada por jugador: tablas MejoresJornada y
+# MejoresJugador, mantenidas por triggers (ver db_setup.py).
+SQL_TOP_PUNTUACIONES = """
+    SELECT j.nombre AS jugador, p.jornada, p.puntos
+    FROM Puntos p JOIN Jugadores j ON j.id = p.jugador_id
+    WHERE p.liga_id = :id
+    ORDER BY p.puntos DESC, j.nombre, p.jornada
+    LIMIT :k
+"""
+SQL_MVP_JORNADAS = """
+    SELECT m.jornada, j.nombre AS jugador, m.puntos
+    FROM MejoresJornada m JOIN Jugadores j ON j.id = m.jugador_id
+    WHERE m.liga_id = :id
+    ORDER BY m.jornada
+"""
+SQL_MEJORES_JUGADORES = """
+    SELECT j.nombre AS jugador, m.puntos, m.jornada
+    FROM MejoresJugador m JOIN Jugadores j ON j.id = m.jugador_id
+    WHERE m.liga_id = :id
+    ORDER BY m.puntos DESC, j.nombre
+"""
+
+# --- CLASIFICACIÓN ---
+# Tabla materializada Clasificacion (mantenida por triggers): ver db_setup.py.
+SQL_CLASIFICACION = """
+    SELECT
+        j.nombre as jugador,
+        c.total as "Puntos Totales",
+        c.jornadas as "Jornadas Jugadas",
+        c.media as "Media/Jornada"
+    FROM Clasificacion c
+    JOIN Jugadores j ON j.id = c.jugador_id
+    WHERE c.liga_id = :id
+    ORDER BY c.total DESC, j.nombre
+"""
+
+
+# --- CONSULTAS DE LAS PÁGINAS ---
+# Lecturas compartidas por app.py (que las cachea por versión), api.py y benchmark.py.
+# Las que devuelven un DataFrame aceptan un engine o una conexión (api.py lee dentro
+# de la transacción en la que obtuvo la versión). Si la consulta falla devuelven un
+# resultado vacío (un DataFrame vacío con las columnas esperadas, {}, [] o 0).
+
+def leer_ligas(engine):
+    """{nombre: id} de todas las ligas, por orden alfabético."""
+    try:
+        with engine.connect() as connection:
+            return dict(connection.execute(text("SELECT nombre, id FROM Ligas ORDER BY nombre")).all())
+    except:
+        return {}
+
+def leer_resumen_ligas(engine):
+    """Participantes, última jornada, registros y líder de cada liga (una fila por liga)."""
+    try:
+        return pd.read_sql(text(SQL_RESUMEN_LIGAS), engine)
+    except Exception:
+        return pd.DataFrame(columns=["id", "nombre", "participantes", "ultima_jornada", "registros", "lider", "puntos_lider"])
+
+def leer_jugadores(engine, liga_id):
+    """Nombres de los jugadores de la liga, por orden alfabético."""
+    try:
+        # Incluye a los jugadores dados de alta que aún no tienen puntos
+        df = pd.read_sql(text("SELECT nombre AS jugador FROM Jugadores WHERE liga_id = :id ORDER BY nombre"),
+                         engine, params={"id": liga_id})
+        return df['jugador'].tolist()
+    except:
+        return []
+
+def leer_max_jornada(engine, liga_id):
+    """Número de la última jornada registrada en la liga (0 si no hay ninguna)."""
+    try:
+        with engine.connect() as connection:
+            max_j = connection.execute(text("SELECT MAX(jornada) FROM Puntos WHERE liga_id = :id"), {"id": liga_id}).scalar()
+            return int(max_j) if max_j else 0
+    except:
+        return 0
+
+def leer_clasificacion(engine, liga_id):
+    """Clasificación general de la liga: jugador, puntos totales, jornadas jugadas y media."""
+    try:
+        return pd.read_sql(text(SQL_CLASIFICACION), engine, params={"id": liga_id})
+    except:
+        return pd.DataFrame(columns=["jugador", "Puntos Totales", "Jornadas Jugadas", "Media/Jornada"])
+
+def leer_top_puntuaciones(engine, liga_id, k=5):
+    """Las k mejores puntuaciones individuales (jugador, jornada, puntos) de la liga."""
+    try:
+        return pd.read_sql(text(SQL_TOP_PUNTUACIONES), engine, params={"id": liga_id, "k": k})
+    except:
+        return pd.DataFrame(columns=["jugador", "jornada", "puntos"])
+
+def leer_mvp_jornadas(engine, liga_id):
+    """Máximo anotador de cada jornada de la liga."""
+    try:
+        return pd.read_sql(text(SQL_MVP_JORNADAS), engine, params={"id": liga_id})
+    except:
+        return pd.DataFrame(columns=["jornada", "jugador", "puntos"])
+
+def leer_mejores_jugadores(engine, liga_id):
+    """Mejor jornada de cada jugador de la liga, de mayor a menor puntuación."""
+    try:
+        return pd.read_sql(text(SQL_MEJORES_JUGADORES), engine, params={"id": liga_id})
+    except:
+        return pd.DataFrame(columns=["jugador", "puntos", "jornada"])
+
+
+# --- JUGADORES ---
+
+def obtener_ids_jugadores(connection, liga_id, nombres, crear=True):
+    """Devuelve {nombre: jugador_id} para los nombres dados de la liga.
+    Con crear=True, los jugadores que no existan se dan de alta (una sola sentencia en lote)."""
+    nombres = set(nombres)
+    if not nombres:
+        return {}
+    if crear:
+        connection.execute(text(
+            "INSERT OR IGNORE INTO Jugadores (liga_id, nombre) VALUES (:liga_id, :nombre)"
+        ), [{"liga_id": liga_id, "nombre": nombre} for nombre in sorted(nombres)])
+    filas = connection.execute(text(
+        "SELECT nombre, id FROM Jugadores WHERE liga_id = :id"
+    ), {"id": liga_id}).all()
+    return {nombre: jugador_id for nombre, jugador_id in filas if nombre in nombres}
+
+
+# --- ESCRITURA DE PUNTOS EN LOTE ---
+
+# Se lanza directamente sobre el driver (parámetros posicionales '?'): en lotes de
+# cientos de miles de filas, construir un dict por fila en SQLAlchemy cuesta más
+# que la propia escritura en SQLite.
+SQL_UPSERT_PUNTOS = """
+    INSERT INTO Puntos (liga_id, jugador_id, jornada, puntos)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(jugador_id, jornada) DO UPDATE SET puntos = excluded.puntos
+"""
+
+def escribir_puntos(connection, liga_id, filas, ids=None):
+    """Upsert de filas (jugador, jornada, puntos) de una liga con un único executemany.
+    No abre ni confirma transacción: la gestiona quien llama (p. ej. el importador,
+    que escribe muchos bloques dentro de la misma transacción).
+
+    ids: caché opcional {nombre: jugador_id} que se completa con los nombres nuevos,
+    para no volver a resolver los jugadores ya vistos en bloques anteriores.
+    Devuelve el número de filas escritas."""
+    filas = list(filas)
+    if not filas:
+        return 0
+    ids = {} if ids is None else ids
+    jugadores, jornadas, puntos = zip(*filas)
+    nuevos = set(jugadores) - ids.keys()
+    if nuevos:
+        ids.update(obtener_ids_jugadores(connection, liga_id, nuevos))
+    return escribir_puntos_por_id(connection, liga_id, [ids[j] for j in jugadores], jornadas, puntos)
+
+def escribir_puntos_por_id(connection, liga_id, jugador_ids, jornadas, puntos):
+    """Upsert por columnas: tres secuencias/arrays de igual longitud con jugador_id,
+    jornada y puntos (p. ej. columnas de Arrow/NumPy). Sin transacción propia.
+    Devuelve el número de filas escritas."""
+    jugador_ids = np.asarray(jugador_ids, dtype=np.int64)
+    jornadas = np.asarray(jornadas, dtype=np.int64)
+    puntos = np.asarray(puntos, dtype=np.int64)
+    if not len(jugador_ids):
+        return 0
+    # Ordenadas por (jugador_id, jornada): las inserciones recorren el índice único en orden
+    orden = np.lexsort((jornadas, jugador_ids))
+    parametros = list(map(tuple, np.column_stack((
+        np.full(len(orden), liga_id, dtype=np.int64), jugador_ids[orden], jornadas[orden], puntos[orden]
+    )).tolist()))
+    connection.exec_driver_sql(SQL_UPSERT_PUNTOS, parametros)
+    return len(parametros)
+
+def borrar_puntos(connection, claves):
+    """Borra puntos por (jugador_id, jornada) con un único executemany (sin transacción propia).
+    Devuelve el número de filas pedidas."""
+    claves = [(int(jugador_id), int(jornada)) for jugador_id, jornada in claves]
+    if claves:
+        connection.exec_driver_sql("DELETE FROM Puntos WHERE jugador_id = ? AND jornada = ?", claves)
+    return len(claves)
+
+def escribir_puntos_lote(connection, registros):
+    """Inserta o actualiza muchos puntos a la vez (un executemany por liga) y un solo
+    incremento de versión por liga, sin transacción propia.
+
+    registros: iterable de tuplas (liga_id, jugador, jornada, puntos), con el
+    jugador por su nombre (si no existe en la liga, se crea).
+    Devuelve el número de registros escritos."""
+    por_liga = {}
+    for liga_id, jugador, jornada, puntos in registros:
+        por_liga.setdefault(int(liga_id), []).append((jugador, int(jornada), int(puntos)))
+
+    total = 0
+    for liga_id, filas_liga in sorted(por_liga.items()):
+        total += escribir_puntos(connection, liga_id, filas_liga)
+        incrementar_version_liga(connection, liga_id)
+    return total
+
+def guardar_puntos_lote(engine, registros):
+    """escribir_puntos_lote en una única transacción (todo o nada).
+    Si algo falla se hace rollback de todo el lote y se propaga la excepción."""
+    with engine.begin() as connection:
+        return escribir_puntos_lote(connection, registros)
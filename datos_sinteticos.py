@@ -0,0 +1,81 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+import datos
+from db_setup import setup_db, iniciar_carga_masiva, finalizar_carga_masiva
+
+# --- GENERADOR DE LIGAS SINTÉTICAS ---
+# Ligas de cualquier tamaño con puntuaciones aleatorias (reproducibles con la semilla),
+# para medir la app y los importadores más allá de la liga de ejemplo de fantasy.db.
+DISTRIBUCIONES = ("normal", "poisson", "uniforme")
+
+def generar_puntos(num_jugadores, num_jornadas=38, distribucion="normal", media=60, desviacion=20,
+                   prob_ausencia=0.0, semilla=0):
+    """Devuelve un DataFrame largo (jugador, jornada, puntos) con puntos enteros >= 0.
+    prob_ausencia: probabilidad de que falte el registro de un jugador en una jornada."""
+    rng = np.random.default_rng(semilla)
+    forma = (num_jugadores, num_jornadas)
+    if distribucion == "normal":
+        matriz = rng.normal(media, desviacion, forma).round()
+    elif distribucion == "poisson":
+        matriz = rng.poisson(media, forma)
+    elif distribucion == "uniforme":
+        matriz = rng.integers(0, 2 * media + 1, forma)
+    else:
+        raise ValueError(f"Distribución desconocida: {distribucion} (usa una de {', '.join(DISTRIBUCIONES)})")
+    matriz = np.clip(matriz, 0, None).astype(np.int64)
+
+    filas, columnas = np.nonzero(rng.random(forma) >= prob_ausencia)
+    # Ancho fijo del número: el orden alfabético coincide con el numérico
+    nombres = np.array([f"Jugador {i:06d}" for i in range(num_jugadores)], dtype=object)
+    return pd.DataFrame({
+        "jugador": nombres[filas],
+        "jornada": columnas + 1,
+        "puntos": matriz[filas, columnas],
+    })
+
+def crear_liga_sintetica(engine, nombre, df_puntos, temporada="Sintética"):
+    """Crea (o sustituye) la liga 'nombre' con los puntos de df_puntos en una transacción.
+    Devuelve el ID de la liga."""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT OR IGNORE INTO Ligas (nombre, temporada) VALUES (:nombre, :temporada)"
+        ), {"nombre": nombre, "temporada": temporada})
+        liga_id = connection.execute(text("SELECT id FROM Ligas WHERE nombre = :nombre"), {"nombre": nombre}).scalar()
+
+        iniciar_carga_masiva(connection, liga_id)
+        connection.execute(text("DELETE FROM Puntos WHERE liga_id = :id"), {"id": liga_id})
+        connection.execute(text("DELETE FROM Jugadores WHERE liga_id = :id"), {"id": liga_id})
+        ids = datos.obtener_ids_jugadores(connection, liga_id, df_puntos["jugador"].unique())
+        datos.escribir_puntos_por_id(
+            connection, liga_id,
+            df_puntos["jugador"].map(ids).to_numpy(), df_puntos["jornada"].to_numpy(), df_puntos["puntos"].to_numpy()
+        )
+        finalizar_carga_masiva(connection, liga_id)
+        datos.incrementar_version_liga(connection, liga_id)
+    return liga_id
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera ligas sintéticas en la BD configurada (FANTASY_DB_URL).")
+    parser.add_argument("--ligas", type=int, default=1, help="Número de ligas a generar.")
+    parser.add_argument("--jugadores", type=int, default=1000, help="Jugadores por liga.")
+    parser.add_argument("--jornadas", type=int, default=38, help="Jornadas por liga.")
+    parser.add_argument("--distribucion", choices=DISTRIBUCIONES, default="normal")
+    parser.add_argument("--media", type=float, default=60, help="Media de puntos por jornada.")
+    parser.add_argument("--desviacion", type=float, default=20, help="Desviación típica (distribución normal).")
+    parser.add_argument("--ausencias", type=float, default=0.0, help="Probabilidad de que falte un registro (0-1).")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--prefijo", default="Liga Sintética", help="Prefijo del nombre de las ligas.")
+    args = parser.parse_args()
+
+    setup_db()
+    for i in range(1, args.ligas + 1):
+        inicio = time.perf_counter()
+        df = generar_puntos(args.jugadores, args.jornadas, args.distribucion, args.media, args.desviacion,
+                            args.ausencias, args.semilla + i)
+        nombre = f"{args.prefijo} {i}"
+        liga_id = crear_liga_sintetica(datos.engine, nombre, df)
+        print(f"✅ '{nombre}' (ID {liga_id}): {args.jugadores} jugadores, {len(df)} puntos "
+              f"en {time.perf_counter() - inicio:.2f} s.")
@@ -1,36 +1,580 @@
-from sqlalchemy import create_engine, text
+import argparse
+import os
+from sqlalchemy import text
+from datos import engine, SQL_CLASIFICACION, SQL_RESUMEN_LIGAS, SQL_TOP_PUNTUACIONES, SQL_MVP_JORNADAS, SQL_MEJORES_JUGADORES # Conexión compartida (crea el archivo fantasy.db si no existe)
 
-# 1. Conexión a la BD (crea el archivo fantasy.db si no existe)
-engine = create_engine('sqlite:///fantasy.db')
+# --- CLASIFICACIÓN MATERIALIZADA ---
+# La tabla Clasificacion guarda por (liga, jugador) el total, las jornadas jugadas
+# y la media. Los triggers sobre Puntos aplican el delta de cada INSERT/UPDATE/DELETE,
+# así que cualquier escritura (app, importador, scripts) la mantiene al día.
+#
+# La columna del jugador es 'jugador_id' (esquema actual). Las migraciones antiguas,
+# anteriores a la tabla Jugadores, la crean sobre la columna de texto 'jugador'.
+TIPOS_COLUMNA_JUGADOR = {"jugador": "TEXT", "jugador_id": "INTEGER"}
+
+# Fragmentos reutilizados por los triggers: sumar NEW / restar OLD
+SQL_SUMAR_NEW = """
+    INSERT INTO Clasificacion (liga_id, {col}, total, jornadas, media)
+    VALUES (NEW.liga_id, NEW.{col}, NEW.puntos, 1, NEW.puntos)
+    ON CONFLICT(liga_id, {col}) DO UPDATE SET
+        total = total + excluded.total,
+        jornadas = jornadas + 1,
+        media = ROUND(CAST(total + excluded.total AS REAL) / (jornadas + 1), 2);
+"""
+SQL_RESTAR_OLD = """
+    UPDATE Clasificacion SET
+        total = total - OLD.puntos,
+        jornadas = jornadas - 1,
+        media = CASE WHEN jornadas > 1
+                     THEN ROUND(CAST(total - OLD.puntos AS REAL) / (jornadas - 1), 2)
+                     ELSE 0 END
+    WHERE liga_id = OLD.liga_id AND {col} = OLD.{col};
+    DELETE FROM Clasificacion
+    WHERE liga_id = OLD.liga_id AND {col} = OLD.{col} AND jornadas <= 0;
+"""
+
+# Cargas masivas: mientras una liga figura en CargasMasivas los triggers no la
+# tocan (ahorra el trabajo fila a fila) y al terminar se reconstruye su clasificación
+# de una vez. El aviso vive dentro de la transacción de la carga, así que si esta
+# falla el rollback lo retira junto con los datos.
+GUARDA_CARGA_NEW = "WHEN NOT EXISTS (SELECT 1 FROM CargasMasivas WHERE liga_id = NEW.liga_id)"
+GUARDA_CARGA_OLD = "WHEN NOT EXISTS (SELECT 1 FROM CargasMasivas WHERE liga_id = OLD.liga_id)"
+GUARDA_CARGA_OLD_NEW = "WHEN NOT EXISTS (SELECT 1 FROM CargasMasivas WHERE liga_id IN (OLD.liga_id, NEW.liga_id))"
+
+def crear_clasificacion(connection, col="jugador_id", con_guarda=True):
+    """Crea la tabla Clasificacion, su índice de lectura y los triggers que la mantienen."""
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS Clasificacion (
+            liga_id INTEGER NOT NULL,
+            {col} {TIPOS_COLUMNA_JUGADOR[col]} NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            jornadas INTEGER NOT NULL DEFAULT 0,
+            media REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (liga_id, {col})
+        );
+    """))
+    # La clasificación de una liga se lee recorriendo este índice, ya ordenada por total.
+    # El desempate por nombre (j.nombre vive en Jugadores) sí se ordena en memoria, pero
+    # solo dentro de cada grupo de empatados: "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"
+    connection.execute(text(
+        f"CREATE INDEX IF NOT EXISTS idx_clasificacion_liga_orden ON Clasificacion (liga_id, total DESC, {col})"
+    ))
+    crear_triggers_clasificacion(connection, col, con_guarda)
+
+def crear_triggers_clasificacion(connection, col="jugador_id", con_guarda=True):
+    """Crea los triggers de Puntos que mantienen Clasificacion.
+    con_guarda=False: sin la condición de CargasMasivas (esquemas anteriores a la migración 6)."""
+    sumar, restar = SQL_SUMAR_NEW.format(col=col), SQL_RESTAR_OLD.format(col=col)
+    guarda_new, guarda_old, guarda_update = (
+        (GUARDA_CARGA_NEW, GUARDA_CARGA_OLD, GUARDA_CARGA_OLD_NEW) if con_guarda else ("", "", "")
+    )
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_puntos_insert AFTER INSERT ON Puntos {guarda_new}
+        BEGIN {sumar} END;
+    """))
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_puntos_delete AFTER DELETE ON Puntos {guarda_old}
+        BEGIN {restar} END;
+    """))
+    # Cambio de puntos o de jugador: se resta la fila antigua y se suma la nueva
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_puntos_update AFTER UPDATE OF liga_id, {col}, puntos ON Puntos {guarda_update}
+        BEGIN {restar} {sumar} END;
+    """))
+
+def reconstruir_clasificacion(connection, liga_id=None, col="jugador_id"):
+    """Recalcula la clasificación desde cero a partir de Puntos (toda la BD o una liga)."""
+    filtro = "" if liga_id is None else "WHERE liga_id = :id"
+    params = {} if liga_id is None else {"id": liga_id}
+    connection.execute(text(f"DELETE FROM Clasificacion {filtro}"), params)
+    connection.execute(text(f"""
+        INSERT INTO Clasificacion (liga_id, {col}, total, jornadas, media)
+        SELECT
+            liga_id,
+            {col},
+            SUM(puntos),
+            COUNT(DISTINCT jornada),
+            ROUND(CAST(SUM(puntos) AS REAL) / COUNT(DISTINCT jornada), 2)
+        FROM Puntos
+        {filtro}
+        GROUP BY liga_id, {col}
+    """), params)
+
+def iniciar_carga_masiva(connection, liga_id):
+    """Desactiva los triggers de Clasificacion y de récords para la liga dentro de la transacción actual."""
+    connection.execute(text("INSERT OR IGNORE INTO CargasMasivas (liga_id) VALUES (:id)"), {"id": liga_id})
+
+def finalizar_carga_masiva(connection, liga_id):
+    """Reconstruye la clasificación y los récords de la liga y reactiva sus triggers (misma transacción)."""
+    reconstruir_clasificacion(connection, liga_id)
+    reconstruir_records(connection, liga_id)
+    connection.execute(text("DELETE FROM CargasMasivas WHERE liga_id = :id"), {"id": liga_id})
+
+def verificar_clasificacion(connection):
+    """Compara la tabla Clasificacion con el GROUP BY sobre Puntos.
+    Devuelve la lista de (liga_id, jugador) que no coinciden (vacía si todo cuadra)."""
+    filas = connection.execute(text("""
+        WITH esperado AS (
+            SELECT
+                liga_id,
+                jugador_id,
+                SUM(puntos) AS total,
+                COUNT(DISTINCT jornada) AS jornadas,
+                ROUND(CAST(SUM(puntos) AS REAL) / COUNT(DISTINCT jornada), 2) AS media
+            FROM Puntos
+            GROUP BY liga_id, jugador_id
+        ),
+        diferencias AS (
+            SELECT e.liga_id, e.jugador_id FROM esperado e
+            LEFT JOIN Clasificacion c ON c.liga_id = e.liga_id AND c.jugador_id = e.jugador_id
+            WHERE c.total IS NOT e.total OR c.jornadas IS NOT e.jornadas OR c.media IS NOT e.media
+            UNION
+            SELECT c.liga_id, c.jugador_id FROM Clasificacion c
+            LEFT JOIN esperado e ON c.liga_id = e.liga_id AND c.jugador_id = e.jugador_id
+            WHERE e.jugador_id IS NULL
+        )
+        SELECT d.liga_id, COALESCE(j.nombre, 'ID ' || d.jugador_id) FROM diferencias d
+        LEFT JOIN Jugadores j ON j.id = d.jugador_id
+    """)).all()
+    return [(liga_id, jugador) for liga_id, jugador in filas]
+
+# --- RÉCORDS MANTENIDOS ---
+# MejoresJugador (mejor jornada de cada jugador) y MejoresJornada (máximo anotador
+# de cada jornada) se mantienen con triggers sobre Puntos, igual que Clasificacion:
+# las vistas de récords leen una fila por jugador / jornada en lugar de ordenar la liga.
+# Empates: gana la jornada más temprana (jugador) y el jugador_id más bajo (jornada).
+# El top K de toda la liga no necesita tabla propia: es un recorrido de
+# idx_puntos_liga_puntos que se detiene en la fila K.
+
+# Mejorar el récord con NEW si lo supera (o si no había)
+SQL_RECORDS_NEW = """
+    INSERT INTO MejoresJugador (jugador_id, liga_id, jornada, puntos)
+    VALUES (NEW.jugador_id, NEW.liga_id, NEW.jornada, NEW.puntos)
+    ON CONFLICT(jugador_id) DO UPDATE SET
+        liga_id = excluded.liga_id, jornada = excluded.jornada, puntos = excluded.puntos
+    WHERE excluded.puntos > puntos OR (excluded.puntos = puntos AND excluded.jornada < jornada);
+    INSERT INTO MejoresJornada (liga_id, jornada, jugador_id, puntos)
+    VALUES (NEW.liga_id, NEW.jornada, NEW.jugador_id, NEW.puntos)
+    ON CONFLICT(liga_id, jornada) DO UPDATE SET
+        jugador_id = excluded.jugador_id, puntos = excluded.puntos
+    WHERE excluded.puntos > puntos OR (excluded.puntos = puntos AND excluded.jugador_id < jugador_id);
+"""
+# Si OLD tenía el récord, se quita y se busca el siguiente en Puntos
+# (como mucho las jornadas de un jugador o los jugadores de una jornada, por índice)
+SQL_RECORDS_OLD = """
+    DELETE FROM MejoresJugador WHERE jugador_id = OLD.jugador_id AND jornada = OLD.jornada;
+    INSERT INTO MejoresJugador (jugador_id, liga_id, jornada, puntos)
+    SELECT jugador_id, liga_id, jornada, puntos FROM Puntos
+    WHERE jugador_id = OLD.jugador_id
+      AND NOT EXISTS (SELECT 1 FROM MejoresJugador WHERE jugador_id = OLD.jugador_id)
+    ORDER BY puntos DESC, jornada LIMIT 1;
+    DELETE FROM MejoresJornada
+    WHERE liga_id = OLD.liga_id AND jornada = OLD.jornada AND jugador_id = OLD.jugador_id;
+    INSERT INTO MejoresJornada (liga_id, jornada, jugador_id, puntos)
+    SELECT liga_id, jornada, jugador_id, puntos FROM Puntos
+    WHERE liga_id = OLD.liga_id AND jornada = OLD.jornada
+      AND NOT EXISTS (SELECT 1 FROM MejoresJornada WHERE liga_id = OLD.liga_id AND jornada = OLD.jornada)
+    ORDER BY puntos DESC, jugador_id LIMIT 1;
+"""
+
+def crear_records(connection):
+    """Crea las tablas de récords, su índice de lectura y los triggers que las mantienen."""
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS MejoresJugador (
+            jugador_id INTEGER PRIMARY KEY,
+            liga_id INTEGER NOT NULL,
+            jornada INTEGER NOT NULL,
+            puntos INTEGER NOT NULL
+        );
+    """))
+    # Mejores marcas personales de la liga, ya ordenadas
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_mejores_jugador_liga ON MejoresJugador (liga_id, puntos DESC)"
+    ))
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS MejoresJornada (
+            liga_id INTEGER NOT NULL,
+            jornada INTEGER NOT NULL,
+            jugador_id INTEGER NOT NULL,
+            puntos INTEGER NOT NULL,
+            PRIMARY KEY (liga_id, jornada)
+        );
+    """))
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_records_insert AFTER INSERT ON Puntos {GUARDA_CARGA_NEW}
+        BEGIN {SQL_RECORDS_NEW} END;
+    """))
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_records_delete AFTER DELETE ON Puntos {GUARDA_CARGA_OLD}
+        BEGIN {SQL_RECORDS_OLD} END;
+    """))
+    # La fila ya actualizada está en Puntos: la búsqueda de OLD la tiene en cuenta
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_records_update
+        AFTER UPDATE OF liga_id, jugador_id, jornada, puntos ON Puntos {GUARDA_CARGA_OLD_NEW}
+        BEGIN {SQL_RECORDS_OLD} {SQL_RECORDS_NEW} END;
+    """))
+
+def reconstruir_records(connection, liga_id=None):
+    """Recalcula los récords desde cero a partir de Puntos (toda la BD o una liga)."""
+    filtro = "" if liga_id is None else "WHERE liga_id = :id"
+    params = {} if liga_id is None else {"id": liga_id}
+    connection.execute(text(f"DELETE FROM MejoresJugador {filtro}"), params)
+    connection.execute(text(f"""
+        INSERT INTO MejoresJugador (jugador_id, liga_id, jornada, puntos)
+        SELECT jugador_id, liga_id, jornada, puntos FROM (
+            SELECT jugador_id, liga_id, jornada, puntos,
+                   ROW_NUMBER() OVER (PARTITION BY jugador_id ORDER BY puntos DESC, jornada) AS puesto
+            FROM Puntos {filtro}
+        ) WHERE puesto = 1
+    """), params)
+    connection.execute(text(f"DELETE FROM MejoresJornada {filtro}"), params)
+    connection.execute(text(f"""
+        INSERT INTO MejoresJornada (liga_id, jornada, jugador_id, puntos)
+        SELECT liga_id, jornada, jugador_id, puntos FROM (
+            SELECT liga_id, jornada, jugador_id, puntos,
+                   ROW_NUMBER() OVER (PARTITION BY liga_id, jornada ORDER BY puntos DESC, jugador_id) AS puesto
+            FROM Puntos {filtro}
+        ) WHERE puesto = 1
+    """), params)
+
+def verificar_records(connection):
+    """Compara las tablas de récords con lo que se deduce de Puntos.
+    Devuelve la lista de (tabla, liga_id, clave) que no coinciden (vacía si todo cuadra)."""
+    filas = connection.execute(text("""
+        WITH jugador_esperado AS (
+            SELECT jugador_id, liga_id, jornada, puntos FROM (
+                SELECT jugador_id, liga_id, jornada, puntos,
+                       ROW_NUMBER() OVER (PARTITION BY jugador_id ORDER BY puntos DESC, jornada) AS puesto
+                FROM Puntos
+            ) WHERE puesto = 1
+        ),
+        jornada_esperada AS (
+            SELECT liga_id, jornada, jugador_id, puntos FROM (
+                SELECT liga_id, jornada, jugador_id, puntos,
+                       ROW_NUMBER() OVER (PARTITION BY liga_id, jornada ORDER BY puntos DESC, jugador_id) AS puesto
+                FROM Puntos
+            ) WHERE puesto = 1
+        ),
+        diferencias_jugador AS (
+            SELECT * FROM (SELECT * FROM jugador_esperado
+                           EXCEPT SELECT jugador_id, liga_id, jornada, puntos FROM MejoresJugador)
+            UNION
+            SELECT * FROM (SELECT jugador_id, liga_id, jornada, puntos FROM MejoresJugador
+                           EXCEPT SELECT * FROM jugador_esperado)
+        ),
+        diferencias_jornada AS (
+            SELECT * FROM (SELECT * FROM jornada_esperada
+                           EXCEPT SELECT liga_id, jornada, jugador_id, puntos FROM MejoresJornada)
+            UNION
+            SELECT * FROM (SELECT liga_id, jornada, jugador_id, puntos FROM MejoresJornada
+                           EXCEPT SELECT * FROM jornada_esperada)
+        )
+        SELECT DISTINCT 'MejoresJugador', d.liga_id, COALESCE(j.nombre, 'ID ' || d.jugador_id)
+        FROM diferencias_jugador d LEFT JOIN Jugadores j ON j.id = d.jugador_id
+        UNION
+        SELECT DISTINCT 'MejoresJornada', liga_id, 'J' || jornada FROM diferencias_jornada
+    """)).all()
+    return [(tabla, liga_id, clave) for tabla, liga_id, clave in filas]
+
+# --- MIGRACIONES DEL ESQUEMA ---
+# Cada migración es una función que recibe la conexión y se aplica una sola vez.
+# La versión del esquema se guarda en PRAGMA user_version (0 = BD nueva o anterior
+# a este sistema). Todas usan IF NOT EXISTS para poder aplicarse sobre BDs antiguas
+# que ya tenían parte de las tablas.
+#
+# Ninguna migración descarta datos sin permiso: si tuviera que hacerlo lanza
+# MigracionConPerdidas (y su transacción se deshace) salvo que se autorice con
+# FANTASY_DESCARTAR_HUERFANOS=1 o con 'python db_setup.py --descartar-huerfanos'.
+DESCARTAR_HUERFANOS = os.environ.get("FANTASY_DESCARTAR_HUERFANOS") == "1"
+
+class MigracionConPerdidas(Exception):
+    """La migración descartaría datos y no se ha autorizado (DESCARTAR_HUERFANOS)."""
+
+def migracion_tablas_base(connection):
+    # Tabla para gestionar múltiples Ligas
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS Ligas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL UNIQUE,
+            temporada TEXT
+        );
+    """))
+    
+    # Tabla de Puntos (ahora incluye liga_id y puntos es INTEGER)
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS Puntos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            liga_id INTEGER NOT NULL,
+            jugador TEXT NOT NULL,
+            jornada INTEGER NOT NULL,
+            puntos INTEGER NOT NULL,
+            UNIQUE(liga_id, jugador, jornada),
+            FOREIGN KEY (liga_id) REFERENCES Ligas(id)
+        );
+    """))
+
+def migracion_versiones_liga(connection):
+    # Versión de los datos de cada liga (se incrementa en cada escritura
+    # y la app la usa para invalidar la caché solo de la liga modificada)
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS VersionesLiga (
+            liga_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (liga_id) REFERENCES Ligas(id)
+        );
+    """))
+
+def migracion_clasificacion(connection):
+    # Clasificación materializada (mantenida por triggers sobre Puntos).
+    # Si se crea en una BD que ya tenía puntos, se rellena una vez.
+    # (Esquema de entonces: el jugador es la columna de texto 'jugador')
+    crear_clasificacion(connection, col="jugador", con_guarda=False)
+    vacia = connection.execute(text("SELECT COUNT(*) FROM Clasificacion")).scalar() == 0
+    if vacia and connection.execute(text("SELECT COUNT(*) FROM Puntos")).scalar() > 0:
+        reconstruir_clasificacion(connection, col="jugador")
+
+def migracion_indices_puntos(connection):
+    # Índice cubriente por (liga, jornada): sirve la carga de la matriz de la liga,
+    # MAX(jornada), el listado DISTINCT de jornadas y la precarga de una jornada
+    # en la entrada múltiple sin tocar la tabla.
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_puntos_liga_jornada ON Puntos (liga_id, jornada, jugador, puntos)"
+    ))
+    # Récords de la liga (ORDER BY puntos DESC LIMIT k) sin ordenar toda la liga
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_puntos_liga_puntos ON Puntos (liga_id, puntos DESC)"
+    ))
+    # La clasificación ordena también por jugador: con el índice antiguo (sin jugador)
+    # el desempate se ordenaba en memoria. Se sustituye por idx_clasificacion_liga_orden.
+    # (Desde la migración 5 el desempate es por Jugadores.nombre y vuelve a ordenarse en
+    # memoria, solo entre empatados: ver crear_clasificacion.)
+    connection.execute(text("DROP INDEX IF EXISTS idx_clasificacion_liga_total"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_clasificacion_liga_orden ON Clasificacion (liga_id, total DESC, jugador)"
+    ))
+    connection.execute(text("ANALYZE"))
+
+def migracion_jugadores(connection):
+    # Tabla Jugadores normalizada: Puntos y Clasificacion pasan a referenciar al
+    # jugador por un ID entero (renombrar = actualizar una sola fila).
+    # Los puntos de ligas ya inexistentes no se pueden ver desde la app ni tienen a
+    # qué liga asignar su jugador: no se migran. Solo se descartan si se autoriza.
+    huerfanos = connection.execute(text("""
+        SELECT COUNT(*) FROM Puntos p WHERE NOT EXISTS (SELECT 1 FROM Ligas l WHERE l.id = p.liga_id)
+    """)).scalar()
+    if huerfanos and not DESCARTAR_HUERFANOS:
+        raise MigracionConPerdidas(
+            f"La tabla Puntos tiene {huerfanos} puntos de ligas que ya no existen y la migración "
+            "a la tabla Jugadores los descartaría. Revísalos o ejecuta "
+            "'python db_setup.py --descartar-huerfanos' para migrar sin ellos."
+        )
+
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS Jugadores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            liga_id INTEGER NOT NULL,
+            nombre TEXT NOT NULL,
+            UNIQUE(liga_id, nombre),
+            FOREIGN KEY (liga_id) REFERENCES Ligas(id)
+        );
+    """))
+    connection.execute(text("""
+        INSERT OR IGNORE INTO Jugadores (liga_id, nombre)
+        SELECT DISTINCT p.liga_id, p.jugador FROM Puntos p
+        JOIN Ligas l ON l.id = p.liga_id
+        ORDER BY p.liga_id, p.jugador
+    """))
+
+    # SQLite no permite cambiar columnas/restricciones: se reconstruye la tabla Puntos
+    # (al borrar la antigua se borran también sus índices y triggers)
+    connection.execute(text("""
+        CREATE TABLE Puntos_nueva (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            liga_id INTEGER NOT NULL,
+            jugador_id INTEGER NOT NULL,
+            jornada INTEGER NOT NULL,
+            puntos INTEGER NOT NULL,
+            UNIQUE(jugador_id, jornada),
+            FOREIGN KEY (liga_id) REFERENCES Ligas(id),
+            FOREIGN KEY (jugador_id) REFERENCES Jugadores(id)
+        );
+    """))
+    connection.execute(text("""
+        INSERT INTO Puntos_nueva (id, liga_id, jugador_id, jornada, puntos)
+        SELECT p.id, p.liga_id, j.id, p.jornada, p.puntos FROM Puntos p
+        JOIN Jugadores j ON j.liga_id = p.liga_id AND j.nombre = p.jugador
+    """))
+    connection.execute(text("DROP TABLE Puntos"))
+    connection.execute(text("ALTER TABLE Puntos_nueva RENAME TO Puntos"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_puntos_liga_jornada ON Puntos (liga_id, jornada, jugador_id, puntos)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_puntos_liga_puntos ON Puntos (liga_id, puntos DESC)"
+    ))
+
+    # Clasificación por jugador_id (recalculada) con sus triggers sobre la nueva Puntos
+    connection.execute(text("DROP TABLE IF EXISTS Clasificacion"))
+    crear_clasificacion(connection, con_guarda=False)
+    reconstruir_clasificacion(connection)
+    connection.execute(text("ANALYZE"))
+    if huerfanos:
+        return f"descartados {huerfanos} puntos de ligas que ya no existen"
+
+def migracion_cargas_masivas(connection):
+    # Tabla de ligas en carga masiva y triggers de Clasificacion que la respetan
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS CargasMasivas (
+            liga_id INTEGER PRIMARY KEY
+        );
+    """))
+    for trigger in ("trg_puntos_insert", "trg_puntos_delete", "trg_puntos_update"):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    crear_triggers_clasificacion(connection)
+
+def migracion_records(connection):
+    # Récords mantenidos (mejor jornada de cada jugador, máximo anotador de cada jornada)
+    crear_records(connection)
+    reconstruir_records(connection)
+
+# Lista ordenada: la posición (empezando en 1) es la versión que deja aplicada.
+# Las nuevas migraciones se añaden SIEMPRE al final. Una migración puede devolver un
+# aviso (texto) que setup_db muestra junto a ella.
+MIGRACIONES = [
+    ("Tablas Ligas y Puntos", migracion_tablas_base),
+    ("Tabla VersionesLiga", migracion_versiones_liga),
+    ("Tabla Clasificacion y triggers", migracion_clasificacion),
+    ("Índices de Puntos para las consultas de las páginas", migracion_indices_puntos),
+    ("Tabla Jugadores y Puntos por jugador_id", migracion_jugadores),
+    ("Cargas masivas sin triggers fila a fila", migracion_cargas_masivas),
+    ("Tablas de récords MejoresJugador y MejoresJornada", migracion_records),
+]
+
+def obtener_version_esquema(connection):
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+def aplicar_migraciones(engine=engine):
+    """Aplica las migraciones pendientes. Es seguro llamarla en cada arranque
+    (y desde varios procesos a la vez): cada migración va en su propia transacción
+    con BEGIN IMMEDIATE y se vuelve a comprobar la versión tras obtener el bloqueo.
+    Devuelve la lista de migraciones aplicadas."""
+    aplicadas = []
+    for version, (descripcion, migracion) in enumerate(MIGRACIONES, start=1):
+        with engine.connect() as connection:
+            if obtener_version_esquema(connection) >= version:
+                continue
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo aplicarla mientras esperábamos el bloqueo
+                if obtener_version_esquema(connection) < version:
+                    aviso = migracion(connection)
+                    connection.exec_driver_sql(f"PRAGMA user_version = {version}")
+                    aplicadas.append(f"{version}: {descripcion}" + (f" ⚠️ {aviso}" if aviso else ""))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+    return aplicadas
 
 def setup_db():
-    """Crea las tablas Ligas y Puntos si no existen."""
-    with engine.connect() as connection:
-        
-        # 1. Tabla para gestionar múltiples Ligas
-        connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS Ligas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL UNIQUE,
-                temporada TEXT
-            );
-        """))
-        
-        # 2. Tabla de Puntos (ahora incluye liga_id y puntos es INTEGER)
-        connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS Puntos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                liga_id INTEGER NOT NULL,
-                jugador TEXT NOT NULL,
-                jornada INTEGER NOT NULL,
-                puntos INTEGER NOT NULL,
-                UNIQUE(liga_id, jugador, jornada),
-                FOREIGN KEY (liga_id) REFERENCES Ligas(id)
-            );
-        """))
-        connection.commit()
-    print("Base de datos 'fantasy.db', y tablas 'Ligas' y 'Puntos' configuradas.")
+    """Crea/actualiza el esquema de la BD aplicando las migraciones pendientes."""
+    aplicadas = aplicar_migraciones()
+    for migracion in aplicadas:
+        print(f"   - Migración aplicada: {migracion}")
+    print(f"Base de datos '{engine.url.database or ':memory:'}' configurada (esquema v{len(MIGRACIONES)}).")
+
+# --- DIAGNÓSTICO DE ÍNDICES ---
+# Consultas que lanzan las páginas de app.py contra Puntos, para comprobar con
+# EXPLAIN QUERY PLAN qué índice usa cada una (:id = liga de ejemplo).
+# Con una sola liga, ANALYZE ve que liga_id no filtra nada y la matriz sale como
+# "SCAN j" (recorre los pocos jugadores de la tabla); con varias ligas pasa a
+# "SEARCH j USING COVERING INDEX sqlite_autoindex_Jugadores_1 (liga_id=?)".
+CONSULTAS_PAGINAS = {
+    "Matriz de la liga (Clasificación, Tabla Completa, Rendimiento)":
+        "SELECT j.nombre, p.jornada, p.puntos FROM Jugadores j "
+        "LEFT JOIN Puntos p ON p.jugador_id = j.id WHERE j.liga_id = :id",
+    "Clasificación General":
+        SQL_CLASIFICACION,
+    "Resumen de todas las ligas (Home)":
+        SQL_RESUMEN_LIGAS,
+    "Lista de jugadores":
+        "SELECT nombre FROM Jugadores WHERE liga_id = :id ORDER BY nombre",
+    "Última jornada (MAX)":
+        "SELECT MAX(jornada) FROM Puntos WHERE liga_id = :id",
+    "Jornadas registradas (Eliminar Jornada)":
+        "SELECT DISTINCT jornada FROM Puntos WHERE liga_id = :id ORDER BY jornada DESC",
+    "Precarga de una jornada (Entrada Múltiple)":
+        "SELECT j.nombre, p.puntos FROM Puntos p JOIN Jugadores j ON j.id = p.jugador_id "
+        "WHERE p.liga_id = :id AND p.jornada = 1",
+    "Punto individual (Entrada Individual)":
+        "SELECT p.puntos FROM Puntos p JOIN Jugadores j ON j.id = p.jugador_id "
+        "WHERE j.liga_id = :id AND j.nombre = '' AND p.jornada = 1",
+    "Top puntuaciones de la liga (Jornada de Oro)":
+        SQL_TOP_PUNTUACIONES,
+    "Máximo anotador de cada jornada (récords)":
+        SQL_MVP_JORNADAS,
+    "Mejor jornada de cada jugador (récords)":
+        SQL_MEJORES_JUGADORES,
+}
+
+def informe_indices(connection, liga_id=1):
+    """Devuelve {consulta: [líneas del plan]} con el EXPLAIN QUERY PLAN de cada consulta de página."""
+    informe = {}
+    for nombre, sql in CONSULTAS_PAGINAS.items():
+        plan = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), {"id": liga_id, "k": 5}).all()
+        informe[nombre] = [fila[-1] for fila in plan]
+    return informe
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Crea/actualiza las tablas de fantasy.db.")
+    parser.add_argument("--reconstruir-clasificacion", action="store_true",
+                        help="Recalcula la tabla Clasificacion y los récords desde Puntos.")
+    parser.add_argument("--verificar-clasificacion", action="store_true",
+                        help="Comprueba que la tabla Clasificacion y los récords coinciden con Puntos.")
+    parser.add_argument("--explicar-indices", action="store_true",
+                        help="Muestra qué índice usa cada consulta de las páginas.")
+    parser.add_argument("--descartar-huerfanos", action="store_true",
+                        help="Permite que las migraciones descarten puntos de ligas que ya no existen.")
+    args = parser.parse_args()
+    if args.descartar_huerfanos:
+        DESCARTAR_HUERFANOS = True
+
     setup_db()
-    print("Ejecuta 'python db_setup.py' en la terminal para crear la BD.")
\ No newline at end of file
+
+    if args.reconstruir_clasificacion:
+        with engine.begin() as connection:
+            reconstruir_clasificacion(connection)
+            reconstruir_records(connection)
+        print("✅ Clasificación y récords reconstruidos desde la tabla Puntos.")
+
+    if args.verificar_clasificacion:
+        with engine.connect() as connection:
+            diferencias = verificar_clasificacion(connection)
+        if diferencias:
+            print(f"❌ La clasificación no coincide para {len(diferencias)} jugadores:")
+            for liga_id, jugador in diferencias:
+                print(f"   - Liga {liga_id}: {jugador}")
+            print("Ejecuta 'python db_setup.py --reconstruir-clasificacion' para corregirla.")
+        else:
+            print("✅ La clasificación coincide con la tabla Puntos.")
+
+        with engine.connect() as connection:
+            diferencias = verificar_records(connection)
+        if diferencias:
+            print(f"❌ Los récords no coinciden en {len(diferencias)} filas:")
+            for tabla, liga_id, clave in diferencias:
+                print(f"   - {tabla}, liga {liga_id}: {clave}")
+            print("Ejecuta 'python db_setup.py --reconstruir-clasificacion' para corregirlos.")
+        else:
+            print("✅ Los récords coinciden con la tabla Puntos.")
+
+    if args.explicar_indices:
+        with engine.connect() as connection:
+            for nombre, plan in informe_indices(connection).items():
+                print(f"\n🔎 {nombre}")
+                for linea in plan:
+                    print(f"   {linea}")
+
+    if not (args.reconstruir_clasificacion or args.verificar_clasificacion or args.explicar_indices):
+        print("Ejecuta 'python db_setup.py' en la terminal para crear la BD.")
\ No newline at end of file
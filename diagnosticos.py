@@ -0,0 +1,225 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+import numpy as np
+from sqlalchemy import event
+
+# --- DIAGNÓSTICOS DE RENDIMIENTO ---
+# Registro en memoria (compartido por todas las sesiones del proceso) de:
+# - cada consulta SQL: duración, filas afectadas, página y función de app.py que la lanzó,
+# - el tiempo de cada página de main(),
+# - aciertos/fallos de las funciones cacheadas.
+# Cada evento se escribe también como una línea JSON en el logger 'fantasy.diagnosticos'
+# (a fichero si se define FANTASY_LOG_DIAGNOSTICOS). El panel del Admin lee de aquí.
+MAX_MUESTRAS = 1000 # Últimas muestras guardadas por página / consulta / función
+
+registro = logging.getLogger("fantasy.diagnosticos")
+RUTA_LOG = os.environ.get("FANTASY_LOG_DIAGNOSTICOS")
+if RUTA_LOG and not registro.handlers:
+    manejador = logging.FileHandler(RUTA_LOG, encoding="utf-8")
+    manejador.setFormatter(logging.Formatter("%(message)s"))
+    registro.addHandler(manejador)
+    registro.setLevel(logging.INFO)
+
+_cerrojo = threading.Lock()
+_paginas = defaultdict(lambda: deque(maxlen=MAX_MUESTRAS))   # página -> duraciones (s)
+_consultas = defaultdict(lambda: deque(maxlen=MAX_MUESTRAS)) # (página, función, sql) -> (duración, filas)
+_cache = defaultdict(lambda: {"aciertos": 0, "fallos": 0})   # función -> contadores
+_calculos = defaultdict(lambda: deque(maxlen=MAX_MUESTRAS))  # función -> (duración, filas) de los fallos
+
+# Página que se está pintando en este hilo (cada sesión de Streamlit tiene el suyo)
+pagina_actual = contextvars.ContextVar("pagina_actual", default="-")
+# Pila de llamadas cacheadas en curso: el cálculo marca la suya como fallo de caché
+_pila_cache = threading.local()
+# Consulta de en_cache() en curso en este hilo: un fallo no calcula nada
+_solo_consulta = threading.local()
+
+class FueraDeCache(Exception):
+    """Fallo de caché durante en_cache(): se lanza en lugar de calcular (Streamlit no
+    guarda las excepciones, así que la caché queda como estaba)."""
+
+def _log(tipo, **campos):
+    if registro.isEnabledFor(logging.INFO):
+        registro.info(json.dumps({"ts": round(time.time(), 3), "tipo": tipo, **campos}, ensure_ascii=False, default=str))
+
+def _filas(resultado):
+    if hasattr(resultado, "shape"):
+        return int(resultado.shape[0])
+    if hasattr(resultado, "jugadores"): # MatrizLiga: una fila por jugador
+        return len(resultado.jugadores)
+    try:
+        return len(resultado)
+    except TypeError:
+        return None
+
+# --- CONSULTAS SQL ---
+
+def _funcion_llamante():
+    # Función de app.py más interna en la pila (la que lanzó la consulta)
+    marco = sys._getframe(2)
+    while marco is not None:
+        if os.path.basename(marco.f_code.co_filename) == "app.py":
+            return marco.f_code.co_name
+        marco = marco.f_back
+    return "-"
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("diag_inicio", []).append(time.perf_counter())
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - conn.info["diag_inicio"].pop()
+    # En SELECT el driver no conoce las filas hasta leerlas (rowcount = -1)
+    filas = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    pagina, funcion = pagina_actual.get(), _funcion_llamante()
+    sql = " ".join(statement.split())
+    with _cerrojo:
+        _consultas[(pagina, funcion, sql[:120])].append((duracion, filas))
+    _log("consulta", pagina=pagina, funcion=funcion, sql=sql, ms=round(duracion * 1000, 3),
+         filas=filas, executemany=executemany)
+
+def instrumentar_engine(engine):
+    """Registra los hooks de tiempo en el engine (idempotente: app.py se reejecuta en cada interacción)."""
+    if not event.contains(engine, "before_cursor_execute", _antes_de_ejecutar):
+        event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+        event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+# --- PÁGINAS ---
+
+class medir_pagina:
+    """Context manager: mide el tiempo de pintar una página y la deja como página actual
+    para atribuirle las consultas que se lancen dentro."""
+    def __init__(self, pagina):
+        self.pagina = pagina
+
+    def __enter__(self):
+        self.token = pagina_actual.set(self.pagina)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_exc, exc, traza):
+        duracion = time.perf_counter() - self.inicio
+        pagina_actual.reset(self.token)
+        with _cerrojo:
+            _paginas[self.pagina].append(duracion)
+        _log("pagina", pagina=self.pagina, ms=round(duracion * 1000, 3), error=tipo_exc.__name__ if tipo_exc else None)
+        return False
+
+# --- CACHÉ ---
+
+def cache_instrumentada(decorador_cache):
+    """Aplica un decorador de caché de Streamlit (p. ej. st.cache_data(ttl=600)) contando
+    aciertos y fallos. La función devuelta conserva .clear() y __wrapped__ (la original)."""
+    def decorar(funcion):
+        nombre = funcion.__name__
+
+        @functools.wraps(funcion)
+        def calcular(*args, **kwargs):
+            # Solo se ejecuta en un fallo de caché
+            if getattr(_solo_consulta, "activa", False):
+                raise FueraDeCache(nombre)
+            pila = getattr(_pila_cache, "marcas", None)
+            if pila:
+                pila[-1][0] = True
+            inicio = time.perf_counter()
+            resultado = funcion(*args, **kwargs)
+            duracion = time.perf_counter() - inicio
+            with _cerrojo:
+                _calculos[nombre].append((duracion, _filas(resultado)))
+            return resultado
+
+        cacheada = decorador_cache(calcular)
+
+        @functools.wraps(funcion)
+        def llamar(*args, **kwargs):
+            if getattr(_solo_consulta, "activa", False):
+                return cacheada(*args, **kwargs)
+            pila = getattr(_pila_cache, "marcas", None)
+            if pila is None:
+                pila = _pila_cache.marcas = []
+            marca = [False]
+            pila.append(marca)
+            try:
+                return cacheada(*args, **kwargs)
+            finally:
+                pila.pop()
+                with _cerrojo:
+                    _cache[nombre]["fallos" if marca[0] else "aciertos"] += 1
+                _log("cache", funcion=nombre, acierto=not marca[0])
+
+        llamar.clear = cacheada.clear
+        return llamar
+    return decorar
+
+def en_cache(funcion, *args, **kwargs):
+    """True si funcion(*args, **kwargs), decorada con cache_instrumentada, tiene ya su
+    resultado en caché. En un fallo no calcula ni guarda nada (ni cuenta en el panel)."""
+    _solo_consulta.activa = True
+    try:
+        funcion(*args, **kwargs)
+        return True
+    except FueraDeCache:
+        return False
+    finally:
+        _solo_consulta.activa = False
+
+# --- RESÚMENES PARA EL PANEL ---
+
+def _percentiles_ms(valores):
+    valores = np.asarray(valores, dtype=float) * 1000
+    return round(float(np.percentile(valores, 50)), 2), round(float(np.percentile(valores, 95)), 2)
+
+def resumen_paginas():
+    """[{'Página', 'N', 'p50 (ms)', 'p95 (ms)'}] ordenado por p95 descendente."""
+    with _cerrojo:
+        copia = {pagina: list(tiempos) for pagina, tiempos in _paginas.items()}
+    filas = []
+    for pagina, tiempos in copia.items():
+        p50, p95 = _percentiles_ms(tiempos)
+        filas.append({"Página": pagina, "N": len(tiempos), "p50 (ms)": p50, "p95 (ms)": p95})
+    return sorted(filas, key=lambda fila: fila["p95 (ms)"], reverse=True)
+
+def resumen_consultas(limite=20):
+    """Las 'limite' consultas con mayor p95, con su página y función de origen."""
+    with _cerrojo:
+        copia = {clave: list(muestras) for clave, muestras in _consultas.items()}
+    filas = []
+    for (pagina, funcion, sql), muestras in copia.items():
+        p50, p95 = _percentiles_ms([duracion for duracion, _ in muestras])
+        con_filas = [filas_afectadas for _, filas_afectadas in muestras if filas_afectadas is not None]
+        filas.append({
+            "Página": pagina, "Función": funcion, "SQL": sql, "N": len(muestras),
+            "p50 (ms)": p50, "p95 (ms)": p95, "Filas (media)": round(float(np.mean(con_filas)), 1) if con_filas else None,
+        })
+    return sorted(filas, key=lambda fila: fila["p95 (ms)"], reverse=True)[:limite]
+
+def resumen_cache():
+    """Aciertos, fallos y coste de cada fallo por función cacheada."""
+    with _cerrojo:
+        contadores = {nombre: dict(valores) for nombre, valores in _cache.items()}
+        calculos = {nombre: list(muestras) for nombre, muestras in _calculos.items()}
+    filas = []
+    for nombre, valores in sorted(contadores.items()):
+        total = valores["aciertos"] + valores["fallos"]
+        muestras = calculos.get(nombre, [])
+        p50, p95 = _percentiles_ms([duracion for duracion, _ in muestras]) if muestras else (None, None)
+        filas.append({
+            "Función": nombre, "Aciertos": valores["aciertos"], "Fallos": valores["fallos"],
+            "% Acierto": round(100 * valores["aciertos"] / total, 1) if total else None,
+            "Cálculo p50 (ms)": p50, "Cálculo p95 (ms)": p95,
+            "Filas (último)": muestras[-1][1] if muestras else None,
+        })
+    return filas
+
+def reiniciar():
+    """Borra todas las muestras y contadores."""
+    with _cerrojo:
+        _paginas.clear()
+        _consultas.clear()
+        _cache.clear()
+        _calculos.clear()
@@ -0,0 +1,141 @@
+import contextvars
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+import datos
+
+# --- ESCRITOR ÚNICO ---
+# Todas las escrituras de la app pasan por una cola que atiende un solo hilo: las
+# sesiones de Streamlit ya no compiten entre sí por el bloqueo de escritura de SQLite.
+# El hilo agrupa las operaciones que encuentra en cola (hasta MAX_LOTE) en una única
+# transacción, cada una en su propio SAVEPOINT: si una falla solo se deshace esa y
+# las demás se confirman juntas (un solo commit para todo el lote).
+#
+# Si la BD está ocupada por otro proceso (import_data.py, un script...), el lote
+# entero se deshace y se reintenta con espera exponencial. La conexión del escritor
+# usa un busy_timeout corto (ESPERA_BLOQUEO_MS, no los 5 s de datos.PRAGMAS_SQLITE):
+# la espera la controlan los reintentos, con un tope total de MAX_ESPERA.
+# Cada llamante recibe el resultado (o la excepción) de SU operación.
+#
+# Peor caso de un llamante con la BD bloqueada todo el rato: lo que tarden los lotes
+# que tenga delante + MAX_ESPERA + un último intento (ESPERA_BLOQUEO_MS), es decir,
+# ~10,3 s con los valores por defecto; después recibe el error "database is locked".
+MAX_LOTE = int(os.environ.get("FANTASY_ESCRITOR_LOTE", 64))          # Operaciones por transacción
+MAX_ESPERA = float(os.environ.get("FANTASY_ESCRITOR_ESPERA_MAX", 10)) # s de reintentos por lote
+ESPERA_BLOQUEO_MS = 250      # busy_timeout de la conexión del escritor
+ESPERA_INICIAL = 0.05        # s; se duplica en cada reintento (con un 50% de azar)...
+ESPERA_MAXIMA = 1.0          # ...hasta este máximo por reintento
+
+# Engine propio (misma BD) con una sola conexión: solo la usa el hilo escritor
+engine = datos.crear_engine(pool_size=1, max_overflow=0)
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def configurar_espera(dbapi_connection, connection_record):
+        # Se ejecuta después de los PRAGMAs de datos.crear_engine
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {ESPERA_BLOQUEO_MS}")
+        cursor.close()
+
+registro = logging.getLogger("fantasy.escritor")
+
+_cerrojo = threading.Lock()
+_cola = queue.SimpleQueue()
+_hilo = None
+_estadisticas = {"operaciones": 0, "lotes": 0, "reintentos": 0, "errores": 0}
+
+def _iniciar_hilo():
+    # El hilo se crea con la primera escritura, no al importar el módulo
+    global _hilo
+    with _cerrojo:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_atender_cola, name="escritor", daemon=True)
+            _hilo.start()
+
+def bd_ocupada(error):
+    """True si el error es un SQLITE_BUSY / SQLITE_LOCKED (la BD la tiene otro escritor)."""
+    mensaje = str(getattr(error, "orig", error)).lower()
+    return isinstance(error, OperationalError) and ("locked" in mensaje or "busy" in mensaje)
+
+def _ejecutar_lote(lote):
+    """Ejecuta el lote en una transacción. Devuelve [(futuro, resultado, excepción)]."""
+    resultados = []
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            # Toma el bloqueo de escritura al empezar: si está ocupado se falla aquí, antes de trabajar
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        for futuro, contexto, operacion, args, kwargs in lote:
+            savepoint = connection.begin_nested()
+            try:
+                # En el contexto del llamante: las consultas se atribuyen a su página en Diagnósticos
+                resultado = contexto.run(operacion, connection, *args, **kwargs)
+                savepoint.commit()
+                resultados.append((futuro, resultado, None))
+            except Exception as e:
+                if bd_ocupada(e):
+                    raise
+                savepoint.rollback()
+                resultados.append((futuro, None, e))
+        connection.commit()
+    return resultados
+
+def _atender_cola():
+    while True:
+        lote = [_cola.get()]
+        while len(lote) < MAX_LOTE:
+            try:
+                lote.append(_cola.get_nowait())
+            except queue.Empty:
+                break
+
+        inicio = time.monotonic()
+        intento = 0
+        while True:
+            try:
+                resultados = _ejecutar_lote(lote)
+                break
+            except Exception as e:
+                espera = min(ESPERA_INICIAL * 2 ** intento, ESPERA_MAXIMA) * random.uniform(1, 1.5)
+                if bd_ocupada(e) and time.monotonic() - inicio + espera <= MAX_ESPERA:
+                    with _cerrojo:
+                        _estadisticas["reintentos"] += 1
+                    time.sleep(espera)
+                    intento += 1
+                    continue
+                registro.exception("Error al confirmar un lote de %s escrituras", len(lote))
+                resultados = [(futuro, None, e) for futuro, *_ in lote]
+                break
+
+        with _cerrojo:
+            _estadisticas["lotes"] += 1
+            _estadisticas["operaciones"] += len(lote)
+            _estadisticas["errores"] += sum(1 for _, _, error in resultados if error is not None)
+        # Los resultados se entregan tras el commit: quien espera ya ve sus datos en la BD
+        for futuro, resultado, error in resultados:
+            if error is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(error)
+
+def enviar(operacion, *args, **kwargs):
+    """Encola operacion(connection, *args, **kwargs) y devuelve un Future con su resultado.
+    La operación no debe confirmar ni abrir transacciones: lo hace el hilo escritor."""
+    futuro = Future()
+    _cola.put((futuro, contextvars.copy_context(), operacion, args, kwargs))
+    _iniciar_hilo()
+    return futuro
+
+def ejecutar(operacion, *args, **kwargs):
+    """Como enviar(), pero espera al commit y devuelve el resultado de la operación
+    (o lanza su excepción)."""
+    return enviar(operacion, *args, **kwargs).result()
+
+def estado():
+    """Contadores del escritor para el panel de diagnósticos."""
+    with _cerrojo:
+        return {"En cola": _cola.qsize(), **{clave.capitalize(): valor for clave, valor in _estadisticas.items()}}
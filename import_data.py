@@ -1,6 +1,10 @@
+import argparse
+import time
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from io import StringIO
+import datos
+from db_setup import setup_db, iniciar_carga_masiva, finalizar_carga_masiva
 
 # --- CONFIGURACIÓN DE LA IMPORTACIÓN ---
 NOMBRE_LIGA = "Liga AKC 2025-26" 
@@ -21,8 +25,8 @@ La Peina Fazio,47,34,59,47,37,30,86,44,101,72,71,62
 P4nchit0,32,0,35,0,0,0,37,17,17,11,18,61
 """
 
-# Conexión a la BD
-engine = create_engine('sqlite:///fantasy.db')
+# Conexión a la BD (engine compartido con la app)
+engine = datos.engine
 
 def obtener_o_crear_liga(nombre_liga, temporada):
     """Inserta la liga si no existe y devuelve su ID."""
@@ -43,63 +47,206 @@ def obtener_o_crear_liga(nombre_liga, temporada):
             
         return liga_id
 
-def limpiar_datos_liga(liga_id, nombre_liga):
-    """Elimina todos los puntos de una liga antes de la importación masiva."""
-    with engine.connect() as connection:
-        count = connection.execute(text(f"SELECT COUNT(id) FROM Puntos WHERE liga_id = {liga_id}")).scalar()
-        
-        if count > 0:
-            print(f"🚨 Advertencia: Se encontraron {count} puntos existentes para la liga '{nombre_liga}'.")
-            connection.execute(text(f"DELETE FROM Puntos WHERE liga_id = {liga_id}"))
-            connection.commit()
-            print(f"🗑️ Datos de puntos anteriores eliminados correctamente. Listo para re-importar.")
-        
-def importar_tabla_directa(csv_data, liga_id):
-    """Procesa la cadena de texto CSV y la inserta en la tabla Puntos."""
-    print("Iniciando la lectura de datos internos...")
-    
-    # Usamos StringIO para tratar la cadena de texto como un archivo CSV
-    df = pd.read_csv(StringIO(csv_data), header=0, sep=',') 
+def limpiar_datos_liga(connection, liga_id, nombre_liga):
+    """Elimina todos los puntos (y jugadores) de una liga antes de la importación masiva.
+    Sin transacción propia ni triggers: se llama dentro de la carga masiva de importar_csv,
+    así que si la importación falla el borrado también se deshace."""
+    count = connection.execute(text("SELECT COUNT(id) FROM Puntos WHERE liga_id = :id"), {"id": liga_id}).scalar()
+
+    if count > 0:
+        print(f"🚨 Advertencia: Se encontraron {count} puntos existentes para la liga '{nombre_liga}'.")
+        connection.execute(text("DELETE FROM Puntos WHERE liga_id = :id"), {"id": liga_id})
+        connection.execute(text("DELETE FROM Jugadores WHERE liga_id = :id"), {"id": liga_id})
+        print(f"🗑️ Datos de puntos anteriores eliminados (se confirman junto con la importación).")
+
+# --- IMPORTACIÓN POR BLOQUES (CSV ancho o largo) ---
+# Formato ancho: "Nombre,Jornada 1,Jornada 2,..." (una fila por jugador, como DATOS_CSV).
+# Formato largo: columnas "jugador" (o "Nombre"), "jornada" y "puntos" (una fila por registro).
+TAM_BLOQUE = 50_000
+
+def detectar_formato(columnas):
+    """Devuelve 'largo' si el CSV tiene columnas jugador/nombre, jornada y puntos; si no, 'ancho'."""
+    cols = {str(c).strip().lower() for c in columnas}
+    if {'jornada', 'puntos'} <= cols and ('jugador' in cols or 'nombre' in cols):
+        return 'largo'
+    return 'ancho'
+
+def normalizar_bloque(df, formato):
+    """Convierte un bloque del CSV en un DataFrame largo (jugador, jornada, puntos) limpio."""
+    if formato == 'ancho':
+        # --- Tubería de Limpieza y Transformación (MELT) ---
+        df = df.fillna(0)
+        id_nombre = 'Nombre' if 'Nombre' in df.columns else df.columns[0]
+        df_long = pd.melt(df, id_vars=[id_nombre], var_name='jornada', value_name='puntos')
+        df_long = df_long.rename(columns={id_nombre: 'jugador'})
+        df_long['jornada'] = df_long['jornada'].astype(str).str.replace('Jornada ', '', regex=False).str.strip()
+    else:
+        df_long = df.rename(columns=lambda c: str(c).strip().lower()).rename(columns={'nombre': 'jugador'})
+        df_long = df_long[['jugador', 'jornada', 'puntos']]
 
-    # --- Tubería de Limpieza y Transformación (MELT) ---
-    df = df.fillna(0) 
-    
-    df_long = pd.melt(
-        df, 
-        id_vars=['Nombre'], 
-        var_name='Jornada', 
-        value_name='Puntos'
-    )
-    
     # Limpieza y conversión de tipos
-    df_long['Jornada'] = df_long['Jornada'].astype(str).str.replace('Jornada ', '', regex=False).str.strip()
-    df_long['Jornada'] = pd.to_numeric(df_long['Jornada'], errors='coerce').astype('Int64')
-    df_long['Puntos'] = pd.to_numeric(df_long['Puntos'], errors='coerce').astype('Int64')
-    
-    df_long = df_long.dropna(subset=['Jornada', 'Puntos'])
-    df_long = df_long[df_long['Jornada'] > 0]
-    
-    print(f"Se han preparado {len(df_long)} registros válidos para insertar.")
-    
-    # Preparar para la BD
-    df_long = df_long.rename(columns={'Nombre': 'jugador', 'Jornada': 'jornada', 'Puntos': 'puntos'})
-    df_long['liga_id'] = liga_id
+    df_long['jornada'] = pd.to_numeric(df_long['jornada'], errors='coerce')
+    df_long['puntos'] = pd.to_numeric(df_long['puntos'], errors='coerce')
+    df_long = df_long.dropna(subset=['jugador', 'jornada', 'puntos'])
+    df_long = df_long[df_long['jornada'] > 0]
+    df_long['jugador'] = df_long['jugador'].astype(str).str.strip()
+    return df_long.astype({'jornada': 'int64', 'puntos': 'int64'})
+
+def leer_bloques(origen, formato='auto', tam_bloque=TAM_BLOQUE):
+    """Lee el CSV (ruta o buffer) por bloques y devuelve cada uno ya normalizado al formato largo."""
+    for bloque in pd.read_csv(origen, header=0, sep=',', chunksize=tam_bloque):
+        if formato == 'auto':
+            formato = detectar_formato(bloque.columns)
+            print(f"Formato detectado: {formato}")
+        yield normalizar_bloque(bloque, formato)
+
+def importar_csv(origen, liga_id, formato='auto', tam_bloque=TAM_BLOQUE, sustituir=None):
+    """Importa un CSV (ruta o buffer) leyéndolo por bloques de 'tam_bloque' filas.
+    Cada bloque se escribe con un executemany, todos dentro de UNA transacción
+    (si algo falla no queda nada a medias). La clasificación de la liga se
+    recalcula una sola vez al final. Devuelve (registros, segundos).
 
-    # Inserción en SQLite
+    sustituir: nombre de la liga si hay que borrar antes sus puntos y jugadores
+    (en la misma transacción: un fallo de la importación no los borra)."""
+    inicio = time.perf_counter()
+    total = 0
+    ids_jugadores = {} # Caché nombre -> jugador_id compartida entre bloques
+
+    with engine.begin() as connection:
+        iniciar_carga_masiva(connection, liga_id)
+        if sustituir is not None:
+            limpiar_datos_liga(connection, liga_id, sustituir)
+        for num_bloque, df_long in enumerate(leer_bloques(origen, formato, tam_bloque), start=1):
+            total += datos.escribir_puntos(
+                connection, liga_id, df_long.itertuples(index=False, name=None), ids_jugadores
+            )
+            print(f"   Bloque {num_bloque}: {total} registros escritos...")
+        finalizar_carga_masiva(connection, liga_id)
+        datos.incrementar_version_liga(connection, liga_id)
+
+    return total, time.perf_counter() - inicio
+
+# --- IMPORTACIÓN INCREMENTAL (DELTA) ---
+# En lugar de borrar la liga y volver a insertarlo todo, se compara el fichero con
+# los puntos guardados y solo se escriben las celdas nuevas o con otro valor. Si no
+# cambia nada, ni siquiera se incrementa la versión (la caché de la app sigue válida).
+# Con deltas grandes sale más barato desactivar los triggers y recalcular la liga al
+# final (medido: a partir de unas 2.000 filas, los triggers por fila ya son más lentos).
+MIN_CAMBIOS_CARGA_MASIVA = 2_000
+
+def importar_csv_delta(origen, liga_id, formato='auto', tam_bloque=TAM_BLOQUE, borrar_ausentes=False):
+    """Importa un CSV escribiendo solo las diferencias con lo guardado en la liga.
+    borrar_ausentes=True: elimina además los puntos guardados que no aparecen en el fichero.
+    Si el fichero repite una celda (jugador, jornada) cuenta la última fila, como al
+    importarlo entero.
+    Devuelve (resumen, segundos), con resumen = {'nuevos', 'modificados', 'sin_cambios',
+    'eliminados', 'repetidos'}."""
+    inicio = time.perf_counter()
+    resumen = {'nuevos': 0, 'modificados': 0, 'sin_cambios': 0, 'eliminados': 0, 'repetidos': 0}
+
+    # Se lee el fichero completo: las filas repetidas pueden caer en bloques distintos
+    bloques = list(leer_bloques(origen, formato, tam_bloque))
+    if bloques:
+        fichero = pd.concat(bloques, ignore_index=True)
+    else:
+        fichero = pd.DataFrame({'jugador': pd.Series(dtype=str), 'jornada': pd.Series(dtype='int64'),
+                                'puntos': pd.Series(dtype='int64')})
+    sin_repetir = fichero.drop_duplicates(['jugador', 'jornada'], keep='last')
+    resumen['repetidos'] = len(fichero) - len(sin_repetir)
+
+    with engine.begin() as connection:
+        # Puntos guardados de la liga (una consulta); 'fila' identifica cada celda guardada
+        existentes = pd.read_sql(text("""
+            SELECT j.nombre AS jugador, p.jornada, p.puntos AS puntos_bd, p.jugador_id
+            FROM Puntos p JOIN Jugadores j ON j.id = p.jugador_id
+            WHERE p.liga_id = :id
+        """), connection, params={"id": liga_id})
+        existentes['fila'] = range(len(existentes))
+        vistas = pd.Series(False, index=existentes['fila'])
+
+        cruce = sin_repetir.merge(existentes, on=['jugador', 'jornada'], how='left')
+        nuevos = cruce['puntos_bd'].isna()
+        modificados = ~nuevos & (cruce['puntos'] != cruce['puntos_bd'])
+        vistas[cruce.loc[~nuevos, 'fila'].astype('int64')] = True
+
+        resumen['nuevos'] = int(nuevos.sum())
+        resumen['modificados'] = int(modificados.sum())
+        resumen['sin_cambios'] = int((~nuevos & ~modificados).sum())
+        cambios = cruce.loc[nuevos | modificados, ['jugador', 'jornada', 'puntos']]
+        # Sin borrar_ausentes la máscara queda toda a False y no se borra nada
+        ausentes = existentes.loc[~vistas.to_numpy() & borrar_ausentes, ['jugador_id', 'jornada']]
+
+        carga_masiva = len(cambios) + len(ausentes) >= MIN_CAMBIOS_CARGA_MASIVA
+        if carga_masiva:
+            iniciar_carga_masiva(connection, liga_id)
+        datos.escribir_puntos(connection, liga_id, cambios.itertuples(index=False, name=None))
+        resumen['eliminados'] = datos.borrar_puntos(connection, ausentes.itertuples(index=False, name=None))
+        if carga_masiva:
+            finalizar_carga_masiva(connection, liga_id)
+
+        if resumen['nuevos'] or resumen['modificados'] or resumen['eliminados']:
+            datos.incrementar_version_liga(connection, liga_id)
+
+    return resumen, time.perf_counter() - inicio
+
+def importar_tabla_directa(csv_data, liga_id, sustituir=None):
+    """Procesa la cadena de texto CSV y la inserta en la tabla Puntos
+    (sustituyendo los datos de la liga si se pasa su nombre, como en importar_csv)."""
+    print("Iniciando la lectura de datos internos...")
+    
+    # Usamos StringIO para tratar la cadena de texto como un archivo CSV
     try:
-        df_long.to_sql('Puntos', engine, if_exists='append', index=False)
-        print(f"✅ ¡Éxito! {len(df_long)} puntos insertados en la liga ID {liga_id}.")
+        total, segundos = importar_csv(StringIO(csv_data), liga_id, formato='ancho', sustituir=sustituir)
+        print(f"✅ ¡Éxito! {total} puntos insertados en la liga ID {liga_id}.")
     except Exception as e:
-        print(f"❌ ERROR al insertar en la BD: {e}")
+        print(f"❌ ERROR al insertar en la BD (no se ha guardado nada): {e}")
         
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Importa puntos a fantasy.db desde un CSV (ancho o largo).")
+    parser.add_argument("archivo", nargs="?",
+                        help="Ruta del CSV. Sin archivo se importa DATOS_CSV de este fichero.")
+    parser.add_argument("--liga", default=NOMBRE_LIGA, help=f"Nombre de la liga (por defecto: '{NOMBRE_LIGA}').")
+    parser.add_argument("--temporada", default=NOMBRE_TEMPORADA, help="Temporada si hay que crear la liga.")
+    parser.add_argument("--formato", choices=["auto", "ancho", "largo"], default="auto",
+                        help="Formato del CSV (por defecto se detecta por la cabecera).")
+    parser.add_argument("--bloque", type=int, default=TAM_BLOQUE, help="Filas del CSV leídas por bloque.")
+    parser.add_argument("--conservar", action="store_true",
+                        help="No borrar los puntos existentes de la liga (se actualizan/añaden).")
+    parser.add_argument("--delta", action="store_true",
+                        help="Escribir solo las diferencias con los puntos guardados (no borra la liga).")
+    parser.add_argument("--borrar-ausentes", action="store_true",
+                        help="Con --delta: eliminar los puntos guardados que no estén en el fichero.")
+    args = parser.parse_args()
+    if args.borrar_ausentes and not args.delta:
+        parser.error("--borrar-ausentes solo se puede usar junto con --delta")
+
+    # 0. Asegurar que existen las tablas
+    setup_db()
+    
     # 1. Obtener la liga ID (y crearla si no existe)
-    liga_id = obtener_o_crear_liga(NOMBRE_LIGA, NOMBRE_TEMPORADA)
+    liga_id = obtener_o_crear_liga(args.liga, args.temporada)
     
-    # 2. Limpiar datos existentes antes de importar
-    if liga_id:
-        limpiar_datos_liga(liga_id, NOMBRE_LIGA)
-        
-    # 3. Importar los datos
-    if liga_id:
-        importar_tabla_directa(DATOS_CSV, liga_id)
\ No newline at end of file
+    # 2. Importar los datos (sin --conservar, los existentes se borran en la misma transacción)
+    sustituir = None if args.conservar else args.liga
+    if liga_id and args.delta:
+        origen = args.archivo or StringIO(DATOS_CSV)
+        formato = args.formato if args.archivo else 'ancho'
+        print(f"Comparando '{args.archivo or 'DATOS_CSV'}' con los puntos guardados...")
+        try:
+            resumen, segundos = importar_csv_delta(origen, liga_id, formato, args.bloque, args.borrar_ausentes)
+            print(f"✅ Importación incremental completada en {segundos:.2f} s: "
+                  f"{resumen['nuevos']} nuevos, {resumen['modificados']} modificados, "
+                  f"{resumen['eliminados']} eliminados, {resumen['sin_cambios']} sin cambios"
+                  f" ({resumen['repetidos']} filas repetidas en el fichero: cuenta la última).")
+        except Exception as e:
+            print(f"❌ ERROR al importar (no se ha guardado nada): {e}")
+    elif liga_id and args.archivo:
+        print(f"Importando '{args.archivo}' en bloques de {args.bloque} filas...")
+        try:
+            total, segundos = importar_csv(args.archivo, liga_id, args.formato, args.bloque, sustituir)
+            print(f"✅ ¡Éxito! {total} puntos insertados en la liga ID {liga_id} "
+                  f"en {segundos:.2f} s ({total / max(segundos, 1e-9):,.0f} registros/s).")
+        except Exception as e:
+            print(f"❌ ERROR al importar (no se ha guardado nada): {e}")
+    elif liga_id:
+        importar_tabla_directa(DATOS_CSV, liga_id, sustituir)
\ No newline at end of file
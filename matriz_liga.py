@@ -0,0 +1,303 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from functools import cached_property
+from sqlalchemy import text
+
+# --- MATRIZ DE PUNTOS EN MEMORIA ---
+# Una sola lectura de la tabla Puntos por liga. A partir de ella se calculan
+# las vistas de lectura (clasificación por rango, medias, tabla pivote, récords...)
+# sin volver a consultar la base de datos.
+
+@dataclass(frozen=True)
+class MatrizLiga:
+    """Instantánea de los puntos de una liga en formato denso jugadores × jornadas."""
+    jugadores: np.ndarray   # Nombres ordenados alfabéticamente (fila i de la matriz)
+    jornadas: np.ndarray    # Números de jornada ordenados (columna j de la matriz)
+    puntos: np.ndarray      # int64 (n_jugadores, n_jornadas). 0 donde no hay registro
+    presente: np.ndarray    # bool (n_jugadores, n_jornadas). True si existe la fila en Puntos
+    # Sumas prefijas por jugador: columna k = suma de las k primeras jornadas.
+    # La suma de cualquier rango de jornadas son dos lecturas por jugador.
+    acumulado: np.ndarray           # int64 (n_jugadores, n_jornadas + 1)
+    acumulado_presente: np.ndarray  # int64 (n_jugadores, n_jornadas + 1)
+
+    @property
+    def vacia(self):
+        return self.puntos.size == 0
+
+    @cached_property
+    def umbrales(self):
+        """Índice de puntuaciones ordenadas por jugador (se construye al primer uso y
+        vive con la instantánea, es decir, una vez por versión de la liga)."""
+        return construir_indice_umbrales(self)
+
+    @cached_property
+    def nombres_busqueda(self):
+        """Nombres en minúsculas (array de str) para las búsquedas de la Tabla Completa."""
+        return np.char.lower(self.jugadores.astype(str))
+
+    @cached_property
+    def posiciones(self):
+        """Puesto de cada jugador en la clasificación acumulada tras cada jornada
+        (se calcula al primer uso, una vez por versión de la liga)."""
+        return calcular_posiciones(self)
+
+    def preparar_indices(self):
+        """Construye ya los índices perezosos (umbrales y posiciones), p. ej. desde el
+        precálculo, para que ninguna página pague su primer uso."""
+        self.umbrales
+        self.posiciones
+
+
+@dataclass(frozen=True)
+class IndiceUmbrales:
+    """Puntuaciones con registro de todos los jugadores en un único array ordenado por
+    la clave (fila, puntos). Contar cuántas jornadas de un jugador (o de todos a la vez)
+    cumplen '<', '=' o '>' X es una búsqueda binaria, sin recorrer la matriz."""
+    claves: np.ndarray       # int64 ordenado: fila * ancho + (puntos - minimo)
+    columnas: np.ndarray     # Columna de la matriz (jornada) de cada clave
+    inicio_fila: np.ndarray  # int64 (n_jugadores + 1): la fila i ocupa [inicio_fila[i], inicio_fila[i + 1])
+    minimo: int
+    ancho: int               # > rango de puntos: las claves de filas distintas no se solapan
+
+
+def construir_matriz(jugador, jornada, puntos, todos_los_jugadores=None):
+    """Construye la MatrizLiga a partir de las tres columnas del formato largo.
+    todos_los_jugadores: nombres a incluir aunque no tengan ningún registro (fila a 0)."""
+    jugador = np.asarray(jugador, dtype=object)
+    jornada = np.asarray(jornada, dtype=np.int64)
+    puntos = np.asarray(puntos, dtype=np.int64)
+
+    # Índices de fila/columna de cada registro (los ejes quedan ordenados)
+    if todos_los_jugadores is None:
+        nombres, filas = np.unique(jugador, return_inverse=True)
+    else:
+        nombres = np.unique(np.asarray(todos_los_jugadores, dtype=object))
+        filas = np.searchsorted(nombres, jugador)
+    jornadas, columnas = np.unique(jornada, return_inverse=True)
+
+    matriz = np.zeros((len(nombres), len(jornadas)), dtype=np.int64)
+    presente = np.zeros((len(nombres), len(jornadas)), dtype=bool)
+    matriz[filas, columnas] = puntos
+    presente[filas, columnas] = True
+
+    acumulado = np.zeros((len(nombres), len(jornadas) + 1), dtype=np.int64)
+    acumulado_presente = np.zeros((len(nombres), len(jornadas) + 1), dtype=np.int64)
+    np.cumsum(matriz, axis=1, out=acumulado[:, 1:])
+    np.cumsum(presente, axis=1, out=acumulado_presente[:, 1:])
+
+    # La instantánea se comparte entre sesiones: se marca como de solo lectura
+    for arr in (nombres, jornadas, matriz, presente, acumulado, acumulado_presente):
+        arr.flags.writeable = False
+
+    return MatrizLiga(
+        jugadores=nombres, jornadas=jornadas, puntos=matriz, presente=presente,
+        acumulado=acumulado, acumulado_presente=acumulado_presente
+    )
+
+
+def construir_indice_umbrales(m):
+    """Construye el IndiceUmbrales de la matriz (solo celdas con registro)."""
+    filas, columnas = np.nonzero(m.presente)
+    valores = m.puntos[filas, columnas]
+    minimo = int(valores.min()) if valores.size else 0
+    ancho = (int(valores.max()) - minimo if valores.size else 0) + 2
+    claves = filas.astype(np.int64) * ancho + (valores - minimo)
+    orden = np.argsort(claves, kind='stable')
+    inicio_fila = np.zeros(len(m.jugadores) + 1, dtype=np.int64)
+    inicio_fila[1:] = m.acumulado_presente[:, -1]
+    np.cumsum(inicio_fila, out=inicio_fila)
+
+    claves, columnas = claves[orden], columnas[orden]
+    for arr in (claves, columnas, inicio_fila):
+        arr.flags.writeable = False
+    return IndiceUmbrales(claves=claves, columnas=columnas, inicio_fila=inicio_fila, minimo=minimo, ancho=ancho)
+
+
+def calcular_posiciones(m):
+    """Puesto (1 = líder) de cada jugador tras cada jornada según sus puntos acumulados.
+    Empates: comparten puesto y el siguiente salta (1, 2, 2, 4), es decir, el puesto es
+    1 + jugadores con más puntos. Todas las columnas se ordenan en una sola pasada con
+    claves columna * ancho + puntos. Devuelve un array entero compacto (n_jugadores, n_jornadas)."""
+    num_jugadores, num_jornadas = m.puntos.shape
+    tipo = np.min_scalar_type(max(num_jugadores, 1))
+    if m.vacia:
+        return np.zeros((num_jugadores, num_jornadas), dtype=tipo)
+
+    acumulado = m.acumulado[:, 1:]
+    minimo = int(acumulado.min())
+    ancho = int(acumulado.max()) - minimo + 1
+    claves = np.arange(num_jornadas, dtype=np.int64) * ancho + (acumulado - minimo)
+    ordenadas = np.sort(claves, axis=None)
+    # Jugadores de la misma columna con más puntos: los que quedan tras la clave (fin de columna - posición)
+    fin_columna = (np.arange(num_jornadas, dtype=np.int64) + 1) * num_jugadores
+    por_encima = fin_columna - np.searchsorted(ordenadas, claves, side='right')
+    posiciones = (por_encima + 1).astype(tipo)
+    posiciones.flags.writeable = False
+    return posiciones
+
+
+def _limites_umbral(indice, filas, umbral):
+    # Posiciones [izq, der) de las claves iguales a 'umbral' en cada fila. Fuera del
+    # rango de puntos la clave se satura justo antes/después de la fila, sin invadir otra.
+    relativo = min(max(int(umbral) - indice.minimo, -1), indice.ancho - 1)
+    objetivo = filas.astype(np.int64) * indice.ancho + relativo
+    izq = np.searchsorted(indice.claves, objetivo, side='left')
+    der = np.searchsorted(indice.claves, objetivo, side='right')
+    return izq, der
+
+
+def contar_por_umbral(m, op_simbolo, umbral):
+    """Número de jornadas (con registro) de CADA jugador con 'puntos <op> umbral'."""
+    indice = m.umbrales
+    izq, der = _limites_umbral(indice, np.arange(len(m.jugadores)), umbral)
+    if op_simbolo == '>':
+        return indice.inicio_fila[1:] - der
+    elif op_simbolo == '<':
+        return izq - indice.inicio_fila[:-1]
+    return der - izq
+
+
+def cargar_matriz_liga(engine, liga_id):
+    """Lee TODOS los puntos de la liga con una única consulta y construye la matriz.
+    Los jugadores dados de alta sin puntos aparecen con su fila a 0."""
+    df = pd.read_sql(text("""
+        SELECT j.nombre AS jugador, p.jornada, p.puntos
+        FROM Jugadores j
+        LEFT JOIN Puntos p ON p.jugador_id = j.id
+        WHERE j.liga_id = :id
+    """), engine, params={"id": liga_id})
+    con_puntos = df['jornada'].notna()
+    return construir_matriz(
+        df.loc[con_puntos, 'jugador'].to_numpy(),
+        df.loc[con_puntos, 'jornada'].to_numpy(),
+        df.loc[con_puntos, 'puntos'].to_numpy(),
+        todos_los_jugadores=df['jugador'].to_numpy()
+    )
+
+
+# --- VISTAS CALCULADAS SOBRE LA MATRIZ ---
+
+def _ordenar_por(df, columna):
+    # Orden estable: a igualdad de puntos se mantiene el orden alfabético
+    return df.sort_values(by=columna, ascending=False, kind='stable').reset_index(drop=True)
+
+
+def sumas_rango(m, j_inicio, j_fin):
+    """Puntos y jornadas con registro de cada jugador en [j_inicio, j_fin] usando las sumas prefijas."""
+    # Columnas del rango: [desde, hasta) sobre el eje ordenado de jornadas
+    desde = np.searchsorted(m.jornadas, j_inicio, side='left')
+    hasta = max(desde, np.searchsorted(m.jornadas, j_fin, side='right'))
+    totales = m.acumulado[:, hasta] - m.acumulado[:, desde]
+    contadas = m.acumulado_presente[:, hasta] - m.acumulado_presente[:, desde]
+    return totales, contadas
+
+
+def clasificacion_rango(m, j_inicio, j_fin):
+    """Clasificación considerando solo las jornadas en [j_inicio, j_fin] (incluidas)."""
+    totales, contadas = sumas_rango(m, j_inicio, j_fin)
+    # Igual que el GROUP BY original: solo aparecen jugadores con algún registro en el rango
+    con_datos = contadas > 0
+    df = pd.DataFrame({
+        'jugador': m.jugadores[con_datos],
+        'Puntos en el Rango': totales[con_datos],
+        'Jornadas Contadas': contadas[con_datos],
+    })
+    return _ordenar_por(df, 'Puntos en el Rango')
+
+
+def media_por_jornada(m):
+    """Media de puntos de la liga en cada jornada (sobre los registros existentes)."""
+    registros = m.presente.sum(axis=0)
+    medias = np.round(m.puntos.sum(axis=0) / np.maximum(registros, 1), 2)
+    return pd.DataFrame({'jornada': m.jornadas, 'Media de la Jornada': medias})
+
+
+def tabla_pivote(m):
+    """Tabla ancha jugadores × jornadas con columna TOTAL, ordenada por el total."""
+    df = pd.DataFrame(m.puntos, columns=[f"J{j}" for j in m.jornadas])
+    df.insert(0, 'Jugador', m.jugadores)
+    df['TOTAL'] = m.puntos.sum(axis=1)
+    return _ordenar_por(df, 'TOTAL')
+
+
+def filtrar_jugadores(m, busqueda=''):
+    """Filas de los jugadores cuyo nombre contiene 'busqueda' (sin distinguir mayúsculas)."""
+    filas = np.arange(len(m.jugadores))
+    if not busqueda:
+        return filas
+    return filas[np.char.find(m.nombres_busqueda, busqueda.lower()) >= 0]
+
+
+def pagina_pivote(m, pagina=1, tam_pagina=50, orden='TOTAL', descendente=True, busqueda='', j_inicio=None, j_fin=None,
+                  filas=None):
+    """Una página de la tabla ancha: filtra por nombre, ordena (por TOTAL, 'Jugador' o
+    una columna 'J<n>') y solo entonces construye el DataFrame de las filas de la página
+    y las jornadas de [j_inicio, j_fin]. El coste de memoria y lo que se envía al
+    navegador dependen del tamaño de página, no del de la liga.
+    filas: resultado de filtrar_jugadores si quien llama ya lo tiene (p. ej. para
+    contar las páginas); entonces no se vuelve a filtrar y 'busqueda' se ignora.
+    Devuelve (df, filas que cumplen la búsqueda)."""
+    totales = m.acumulado[:, -1]
+    if filas is None:
+        filas = filtrar_jugadores(m, busqueda)
+
+    # Orden estable sobre las filas filtradas (a igualdad, orden alfabético)
+    if orden == 'Jugador':
+        orden_filas = filas[::-1] if descendente else filas
+    else:
+        if orden == 'TOTAL':
+            claves = totales[filas]
+        else:
+            columna = np.searchsorted(m.jornadas, int(orden[1:]))
+            claves = m.puntos[filas, columna]
+        orden_filas = filas[np.argsort(-claves if descendente else claves, kind='stable')]
+
+    inicio = (max(1, pagina) - 1) * tam_pagina
+    seleccion = orden_filas[inicio:inicio + tam_pagina]
+    desde = 0 if j_inicio is None else np.searchsorted(m.jornadas, j_inicio, side='left')
+    hasta = len(m.jornadas) if j_fin is None else np.searchsorted(m.jornadas, j_fin, side='right')
+
+    df = pd.DataFrame(m.puntos[np.ix_(seleccion, np.arange(desde, hasta))],
+                      columns=[f"J{j}" for j in m.jornadas[desde:hasta]])
+    df.insert(0, 'Jugador', m.jugadores[seleccion])
+    df.insert(0, 'Puesto', m.posiciones[seleccion, -1] if len(m.jornadas) else 1)
+    df['TOTAL'] = totales[seleccion]
+    return df, len(filas)
+
+
+def jornadas_por_criterio(m, jugador, op_simbolo, umbral):
+    """Jornadas (y puntos) en las que un jugador cumple 'puntos <op> umbral'."""
+    fila = np.searchsorted(m.jugadores, jugador)
+    if fila >= len(m.jugadores) or m.jugadores[fila] != jugador:
+        return pd.DataFrame({'jugador': [], 'jornada': [], 'puntos': []})
+
+    # Tramo de la fila en el índice ordenado que cumple el criterio
+    indice = m.umbrales
+    izq, der = _limites_umbral(indice, np.array([fila]), umbral)
+    if op_simbolo == '>':
+        desde, hasta = der[0], indice.inicio_fila[fila + 1]
+    elif op_simbolo == '<':
+        desde, hasta = indice.inicio_fila[fila], izq[0]
+    else:
+        desde, hasta = izq[0], der[0]
+    columnas = np.sort(indice.columnas[desde:hasta])
+
+    return pd.DataFrame({
+        'jugador': jugador,
+        'jornada': m.jornadas[columnas],
+        'puntos': m.puntos[fila, columnas],
+    })
+
+
+def ranking_por_criterio(m, op_simbolo, umbral):
+    """Todos los jugadores ordenados por el número de jornadas con 'puntos <op> umbral'."""
+    cumplen = contar_por_umbral(m, op_simbolo, umbral)
+    jugadas = m.acumulado_presente[:, -1]
+    df = pd.DataFrame({
+        'jugador': m.jugadores,
+        'Jornadas que Cumplen': cumplen,
+        'Jornadas Jugadas': jugadas,
+        '% de sus Jornadas': np.round(100 * cumplen / np.maximum(jugadas, 1), 1),
+    })
+    return _ordenar_por(df, 'Jornadas que Cumplen')
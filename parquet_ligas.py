@@ -0,0 +1,152 @@
+import argparse
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import text
+import datos
+from db_setup import setup_db, iniciar_carga_masiva, finalizar_carga_masiva
+
+# --- COPIAS DE LIGAS EN PARQUET ---
+# Una copia es una tabla larga (liga, temporada, jugador, jornada, puntos) en Parquet
+# comprimido. Sirve para backups, para mover ligas entre instalaciones y para
+# preparar bases de datos de prueba sin pasar por el CSV de import_data.py.
+# Los jugadores sin puntos van con jornada/puntos nulos y las ligas sin jugadores
+# con jugador nulo, para que la copia restaure la liga completa.
+ESQUEMA = pa.schema([
+    ("liga", pa.string()),
+    ("temporada", pa.string()),
+    ("jugador", pa.string()),
+    ("jornada", pa.int32()),
+    ("puntos", pa.int64()),
+])
+COMPRESION = "zstd"
+
+def leer_tabla_ligas(engine, liga_id=None):
+    """Devuelve los datos de una liga (o de todas) como pyarrow.Table con ESQUEMA."""
+    filtro = "" if liga_id is None else "WHERE l.id = :id"
+    params = {} if liga_id is None else {"id": liga_id}
+    with engine.connect() as connection:
+        filas = connection.execute(text(f"""
+            SELECT l.nombre, l.temporada, j.nombre, p.jornada, p.puntos
+            FROM Ligas l
+            LEFT JOIN Jugadores j ON j.liga_id = l.id
+            LEFT JOIN Puntos p ON p.jugador_id = j.id
+            {filtro}
+            ORDER BY l.id, j.nombre, p.jornada
+        """), params).all()
+    columnas = list(zip(*filas)) if filas else [()] * len(ESQUEMA)
+    return pa.Table.from_arrays(
+        [pa.array(columna, type=campo.type) for columna, campo in zip(columnas, ESQUEMA)], schema=ESQUEMA
+    )
+
+def exportar_ligas(engine, destino, liga_id=None):
+    """Escribe la copia en 'destino' (ruta o buffer binario). Devuelve el número de filas."""
+    tabla = leer_tabla_ligas(engine, liga_id)
+    pq.write_table(tabla, destino, compression=COMPRESION)
+    return tabla.num_rows
+
+def _columna_numpy(tabla, nombre):
+    # Sin nulos y en un solo bloque, Arrow entrega la columna a NumPy sin copiarla
+    return tabla[nombre].combine_chunks().to_numpy(zero_copy_only=True)
+
+def _id_liga(connection, nombre, temporada):
+    connection.execute(text(
+        "INSERT OR IGNORE INTO Ligas (nombre, temporada) VALUES (:nombre, :temporada)"
+    ), {"nombre": nombre, "temporada": temporada})
+    return connection.execute(text("SELECT id FROM Ligas WHERE nombre = :nombre"), {"nombre": nombre}).scalar()
+
+def importar_tabla_liga(connection, liga_id, tabla):
+    """Sustituye jugadores y puntos de la liga por los de 'tabla' (filas de una sola liga).
+    Sin transacción propia. Devuelve el número de puntos escritos."""
+    iniciar_carga_masiva(connection, liga_id)
+    connection.execute(text("DELETE FROM Puntos WHERE liga_id = :id"), {"id": liga_id})
+    connection.execute(text("DELETE FROM Jugadores WHERE liga_id = :id"), {"id": liga_id})
+
+    con_jugador = tabla.filter(pc.is_valid(tabla["jugador"]))
+    ids = datos.obtener_ids_jugadores(connection, liga_id, pc.unique(con_jugador["jugador"]).to_pylist())
+
+    # Jugador codificado como diccionario: se resuelve un ID por nombre distinto y
+    # los índices (int32, sin copia) se traducen a jugador_id con un solo take
+    con_puntos = con_jugador.filter(pc.and_(pc.is_valid(con_jugador["jornada"]), pc.is_valid(con_jugador["puntos"])))
+    codificado = con_puntos["jugador"].combine_chunks().dictionary_encode()
+    ids_por_codigo = np.array([ids[nombre] for nombre in codificado.dictionary.to_pylist()], dtype=np.int64)
+    escritos = datos.escribir_puntos_por_id(
+        connection, liga_id,
+        ids_por_codigo[codificado.indices.to_numpy(zero_copy_only=True)],
+        _columna_numpy(con_puntos, "jornada"),
+        _columna_numpy(con_puntos, "puntos"),
+    )
+
+    finalizar_carga_masiva(connection, liga_id)
+    datos.incrementar_version_liga(connection, liga_id)
+    return escritos
+
+def leer_copia(origen, liga_destino=None):
+    """Lee una copia Parquet (ruta o buffer) y comprueba que se puede importar.
+    liga_destino: nombre con el que importar la liga (solo si la copia tiene una)."""
+    tabla = pq.read_table(origen, schema=ESQUEMA)
+    num_ligas = len(pc.unique(tabla["liga"]))
+    if liga_destino and num_ligas != 1:
+        raise ValueError(f"La copia contiene {num_ligas} ligas: no se puede importar con otro nombre.")
+    return tabla
+
+def escribir_copia(connection, tabla, liga_destino=None):
+    """Escribe las ligas de una copia ya leída (leer_copia). Cada liga se crea si no
+    existe y, si existe, sus datos se sustituyen. Sin transacción propia.
+    Devuelve {nombre_liga: (liga_id, puntos_escritos)}."""
+    resultado = {}
+    for nombre in pc.unique(tabla["liga"]).to_pylist():
+        tabla_liga = tabla.filter(pc.equal(tabla["liga"], nombre))
+        destino = liga_destino or nombre
+        liga_id = _id_liga(connection, destino, tabla_liga["temporada"][0].as_py())
+        resultado[destino] = (liga_id, importar_tabla_liga(connection, liga_id, tabla_liga))
+    return resultado
+
+def importar_ligas(engine, origen, liga_destino=None):
+    """Importa una copia Parquet (ruta o buffer) en una única transacción.
+    Devuelve {nombre_liga: puntos_escritos}."""
+    tabla = leer_copia(origen, liga_destino)
+    with engine.begin() as connection:
+        resultado = escribir_copia(connection, tabla, liga_destino)
+    return {nombre: escritos for nombre, (_, escritos) in resultado.items()}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exporta/importa ligas de fantasy.db en formato Parquet.")
+    subcomandos = parser.add_subparsers(dest="accion", required=True)
+    p_exportar = subcomandos.add_parser("exportar", help="Guarda una liga (o todas) en un fichero Parquet.")
+    p_exportar.add_argument("archivo", help="Fichero .parquet de destino.")
+    p_exportar.add_argument("--liga", help="Nombre de la liga (por defecto, todas).")
+    p_importar = subcomandos.add_parser("importar", help="Restaura las ligas de un fichero Parquet.")
+    p_importar.add_argument("archivo", help="Fichero .parquet de origen.")
+    p_importar.add_argument("--liga", help="Importar la liga de la copia con este nombre.")
+    args = parser.parse_args()
+
+    setup_db()
+    engine = datos.engine
+    inicio = time.perf_counter()
+
+    if args.accion == "exportar":
+        liga_id = None
+        if args.liga:
+            with engine.connect() as connection:
+                liga_id = connection.execute(text(
+                    "SELECT id FROM Ligas WHERE nombre = :nombre"
+                ), {"nombre": args.liga}).scalar()
+            if liga_id is None:
+                parser.error(f"No existe la liga '{args.liga}'.")
+        filas = exportar_ligas(engine, args.archivo, liga_id)
+        print(f"✅ {filas} filas exportadas a '{args.archivo}' en {time.perf_counter() - inicio:.2f} s.")
+    else:
+        try:
+            resultado = importar_ligas(engine, args.archivo, args.liga)
+        except Exception as e:
+            print(f"❌ ERROR al importar (no se ha guardado nada): {e}")
+        else:
+            segundos = time.perf_counter() - inicio
+            total = sum(resultado.values())
+            for nombre, escritos in resultado.items():
+                print(f"   - {nombre}: {escritos} puntos")
+            print(f"✅ {total} puntos importados en {segundos:.2f} s "
+                  f"({total / max(segundos, 1e-9):,.0f} registros/s).")
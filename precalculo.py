@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- PRECÁLCULO EN SEGUNDO PLANO ---
+# Tras una escritura, un pool de hilos del proceso de Streamlit recalcula las vistas
+# cacheadas de la liga con la versión nueva (matriz, clasificación, récords...).
+# Mientras tanto las páginas de consulta siguen leyendo la última versión ya
+# calculada (sus entradas de caché están completas y son coherentes entre sí) y
+# pasan a la nueva cuando está lista: ninguna visita paga el recálculo.
+# Solo mientras esas entradas sigan en caché: si ya caducaron (ttl) o se
+# desalojaron (max_entries), la página recalcularía con los datos actuales pero
+# las guardaría con la versión antigua; en ese caso se lee con la de la BD.
+#
+# Las escrituras de otros procesos (import_data.py, scripts) se detectan al leer:
+# la versión de la BD es más nueva que la lista y se programa el recálculo igual.
+MAX_HILOS = int(os.environ.get("FANTASY_PRECALCULO_HILOS", 1))
+
+registro = logging.getLogger("fantasy.precalculo")
+
+_cerrojo = threading.Lock()
+_ejecutor = None
+_listas = {}       # liga_id -> versión cuyas vistas ya están en caché
+_en_curso = set()  # ligas con un recálculo en marcha
+_repetir = set()   # ligas que volvieron a cambiar durante su recálculo
+
+def _obtener_ejecutor():
+    # El pool se crea con la primera escritura, no al importar el módulo
+    global _ejecutor
+    with _cerrojo:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=MAX_HILOS, thread_name_prefix="precalculo")
+        return _ejecutor
+
+def _recalcular(liga_id, calentar):
+    # Recalcula hasta que no queden cambios pendientes de la liga
+    while True:
+        try:
+            version = calentar(liga_id)
+        except Exception:
+            registro.exception("Error al precalcular la liga %s", liga_id)
+            version = None
+        with _cerrojo:
+            if version is None:
+                # Sin una versión completa que ofrecer: las lecturas vuelven a usar la de la BD
+                _listas.pop(liga_id, None)
+            elif version > _listas.get(liga_id, -1):
+                _listas[liga_id] = version
+            if liga_id in _repetir:
+                _repetir.discard(liga_id)
+                continue
+            _en_curso.discard(liga_id)
+            return
+
+def programar(liga_id, calentar):
+    """Encarga el recálculo de la liga. calentar(liga_id) debe leer la versión actual
+    de la BD, rellenar las cachés con ella y devolverla. Si ya hay un recálculo en
+    marcha para la liga, se repite al terminar (varias escrituras seguidas = un recálculo más)."""
+    with _cerrojo:
+        if liga_id in _en_curso:
+            _repetir.add(liga_id)
+            return
+        _en_curso.add(liga_id)
+    try:
+        _obtener_ejecutor().submit(_recalcular, liga_id, calentar)
+    except Exception:
+        with _cerrojo:
+            _en_curso.discard(liga_id)
+        raise
+
+def version_lectura(liga_id, version_bd, calentar, en_cache):
+    """Versión con la que deben leer las páginas de consulta: la de la BD si sus vistas
+    ya están calculadas, y si no la última que calentar() haya terminado, programando
+    el recálculo de la nueva. La versión anterior solo se usa si en_cache(liga_id,
+    versión) confirma que sus vistas siguen en caché. Sin ninguna disponible (primera
+    lectura de la liga en este proceso, o entradas caducadas) se lee con la de la BD:
+    la página calcula lo que necesite con los datos actuales, y la versión solo queda
+    como lista cuando calentar() la completa."""
+    with _cerrojo:
+        lista = _listas.get(liga_id)
+        if lista is not None and lista >= version_bd:
+            return version_bd
+        pendiente = liga_id in _en_curso
+    if not pendiente:
+        programar(liga_id, calentar)
+    if lista is None:
+        return version_bd
+    if en_cache(liga_id, lista):
+        return lista
+    with _cerrojo:
+        # Ya no se puede servir: que las siguientes lecturas no vuelvan a comprobarla
+        if _listas.get(liga_id) == lista:
+            del _listas[liga_id]
+    return version_bd
+
+def estado():
+    """[{'Liga', 'Versión lista', 'Recalculando'}] para el panel de diagnósticos."""
+    with _cerrojo:
+        return [
+            {"Liga": liga_id, "Versión lista": version, "Recalculando": liga_id in _en_curso}
+            for liga_id, version in sorted(_listas.items())
+        ]
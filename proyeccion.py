@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# --- PROYECCIÓN MONTE CARLO DE LA CLASIFICACIÓN FINAL ---
+# Se simulan las jornadas que faltan sorteando, para cada jugador, una de sus
+# puntuaciones registradas (su distribución empírica, tal como está en Puntos).
+# Todo va vectorizado sobre (simulaciones × jugadores) y las jornadas restantes se
+# acumulan por grupos (un sorteo por grupo, ver tabla_sumas), así que la memoria es
+# la de un bloque de simulaciones. Las tablas de sumas se construyen una sola vez por
+# proyección (preparar_sorteos) y las comparten todas las tareas.
+# En ligas grandes las tareas se reparten entre procesos (NumPy libera el GIL en
+# parte, pero el sorteo y la indexación no): cada proceso recibe las tablas una vez,
+# con su grupo de tareas, en lugar de reconstruirlas en cada tarea.
+CELDAS_POR_BLOQUE = 4_000_000      # simulaciones × jugadores por bloque (~32 MB por array int64)
+SIMULACIONES_POR_TAREA = 10_000    # simulaciones de cada tarea del pool
+MIN_CELDAS_PROCESOS = 50_000_000   # simulaciones × jugadores × jornadas a partir de las que se usa el pool
+MAX_TABLA = 8_000_000              # valores de la tabla de sumas de varias jornadas (ver tabla_sumas)
+MAX_PROCESOS = int(os.environ.get("FANTASY_PROYECCION_PROCESOS", os.cpu_count() or 1))
+
+_cerrojo = threading.Lock()
+_ejecutor = None
+
+def _obtener_ejecutor():
+    # Pool creado con la primera proyección grande. 'spawn': no hereda los hilos del
+    # servidor de Streamlit (fork con hilos puede dejar cerrojos tomados en el hijo).
+    global _ejecutor
+    with _cerrojo:
+        if _ejecutor is None:
+            _ejecutor = ProcessPoolExecutor(max_workers=MAX_PROCESOS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _ejecutor
+
+
+def distribuciones(m):
+    """Puntuaciones registradas de todos los jugadores en un único array, contiguas por
+    jugador: (valores, inicio, cuenta). Reutiliza el índice ordenado de la matriz."""
+    indice = m.umbrales
+    filas = np.repeat(np.arange(len(m.jugadores)), np.diff(indice.inicio_fila))
+    valores = indice.claves - filas * indice.ancho + indice.minimo
+    return valores, indice.inicio_fila[:-1], np.diff(indice.inicio_fila)
+
+
+def tabla_sumas(valores, inicio, cuenta, tam_grupo):
+    """Para cada jugador, la suma de TODAS las combinaciones ordenadas de 'tam_grupo'
+    puntuaciones suyas (cuenta^tam_grupo valores), contiguas por jugador.
+    Sortear un valor de la tabla equivale exactamente a sumar 'tam_grupo' sorteos
+    independientes: se simulan varias jornadas con un solo sorteo.
+    Devuelve (tabla, inicio, cuenta). Un jugador sin registros tiene la tabla [0]."""
+    tablas = []
+    for desde, num in zip(inicio, cuenta):
+        propios = valores[desde:desde + num] if num else np.zeros(1, dtype=valores.dtype)
+        sumas = propios
+        for _ in range(tam_grupo - 1):
+            sumas = np.add.outer(sumas, propios).ravel()
+        tablas.append(sumas)
+    cuentas = np.array([len(tabla) for tabla in tablas], dtype=np.uint64)
+    inicios = np.zeros(len(tablas), dtype=np.uint64)
+    np.cumsum(cuentas[:-1], out=inicios[1:])
+    return np.concatenate(tablas).astype(np.int32), inicios, cuentas
+
+
+def tamano_grupo(cuenta, jornadas_restantes):
+    """Mayor número de jornadas por sorteo cuya tabla de sumas cabe en MAX_TABLA."""
+    tam = 1
+    cuenta = np.maximum(cuenta, 1).astype(np.float64)
+    while tam < jornadas_restantes and (cuenta ** (tam + 1)).sum() <= MAX_TABLA:
+        tam += 1
+    return tam
+
+
+def preparar_sorteos(valores, inicio, cuenta, jornadas_restantes):
+    """Tablas de sumas (ver tabla_sumas) con las que se simulan las jornadas restantes:
+    sorteos completos de 'tam' jornadas (la misma tabla, repetida) más uno del resto.
+    Devuelve la lista de (tabla, inicio, cuenta), una entrada por sorteo."""
+    if not jornadas_restantes:
+        return []
+    tam = tamano_grupo(cuenta, jornadas_restantes)
+    sorteos = [tabla_sumas(valores, inicio, cuenta, tam)] * (jornadas_restantes // tam)
+    if jornadas_restantes % tam:
+        sorteos.append(tabla_sumas(valores, inicio, cuenta, jornadas_restantes % tam))
+    return sorteos
+
+
+def simular_bloque(sorteos, totales, simulaciones, semilla):
+    """Simula 'simulaciones' finales de temporada con las tablas de preparar_sorteos.
+    Devuelve los contadores por jugador:
+    (títulos, podios, últimos puestos, suma de puntos finales, suma de cuadrados)."""
+    rng = np.random.default_rng(semilla)
+    num_jugadores = len(totales)
+    titulos = np.zeros(num_jugadores, dtype=np.int64)
+    podios = np.zeros(num_jugadores, dtype=np.int64)
+    ultimos = np.zeros(num_jugadores, dtype=np.int64)
+    suma = np.zeros(num_jugadores, dtype=np.float64)
+    suma_cuadrados = np.zeros(num_jugadores, dtype=np.float64)
+
+    tam_bloque = max(1, CELDAS_POR_BLOQUE // max(num_jugadores, 1))
+    for desde in range(0, simulaciones, tam_bloque):
+        n = min(tam_bloque, simulaciones - desde)
+        celdas = n * num_jugadores
+        finales = np.broadcast_to(totales, (n, num_jugadores)).astype(np.int32)
+        for tabla, inicios, cuentas in sorteos:
+            # Entero uniforme en [0, cuenta) de cada jugador: (32 bits aleatorios × cuenta) >> 32
+            bits = rng.bit_generator.random_raw((celdas + 1) // 2).view(np.uint32)[:celdas]
+            azar = bits.astype(np.uint64).reshape(n, num_jugadores)
+            azar *= cuentas
+            azar >>= 32
+            azar += inicios
+            finales += np.take(tabla, azar)
+        suma += finales.sum(axis=0, dtype=np.float64)
+        suma_cuadrados += np.einsum('ij,ij->j', finales, finales, dtype=np.float64)
+
+        # Clave de orden = puntos y 16 bits aleatorios de desempate: los empates a puntos
+        # no favorecen al orden alfabético
+        desempate = rng.bit_generator.random_raw((celdas + 3) // 4).view(np.uint16)[:celdas]
+        claves = finales.astype(np.int64)
+        claves <<= 16
+        claves |= desempate.reshape(n, num_jugadores)
+        simulacion = np.arange(n)
+        ultimos += np.bincount(claves.argmin(axis=1), minlength=num_jugadores)
+        # Podio: tres pasadas de argmax (más barato que ordenar cada simulación)
+        for puesto in range(min(3, num_jugadores)):
+            primero = claves.argmax(axis=1)
+            if puesto == 0:
+                titulos += np.bincount(primero, minlength=num_jugadores)
+            podios += np.bincount(primero, minlength=num_jugadores)
+            claves[simulacion, primero] = np.iinfo(np.int64).min
+    return titulos, podios, ultimos, suma, suma_cuadrados
+
+
+def simular_tareas(sorteos, totales, tareas):
+    """Ejecuta las tareas [(simulaciones, semilla)] con las mismas tablas y suma sus
+    contadores (los de simular_bloque). Es lo que recibe cada proceso del pool."""
+    resultados = [simular_bloque(sorteos, totales, n, semilla) for n, semilla in tareas]
+    return tuple(sum(partes) for partes in zip(*resultados))
+
+
+def simular(m, jornadas_temporada, simulaciones=10_000, semilla=0):
+    """Proyección de la clasificación final: una fila por jugador con la probabilidad (%)
+    de ser campeón, de acabar en el podio y de acabar último, y los puntos finales
+    esperados. Ordenada por probabilidad de título y puntos esperados."""
+    columnas = ['jugador', 'Puntos Actuales', 'Puntos Esperados', 'Desviación',
+                '% Campeón', '% Podio', '% Último']
+    if m.vacia or simulaciones <= 0:
+        return pd.DataFrame(columns=columnas)
+
+    num_jugadores = len(m.jugadores)
+    restantes = max(0, int(jornadas_temporada) - int(m.jornadas.max()))
+    totales = m.acumulado[:, -1]
+    sorteos = preparar_sorteos(*distribuciones(m), restantes)
+
+    # Tareas de SIMULACIONES_POR_TAREA con semillas derivadas: el resultado solo depende
+    # de la semilla, se repartan o no entre procesos
+    tamanos = [min(SIMULACIONES_POR_TAREA, simulaciones - desde)
+               for desde in range(0, simulaciones, SIMULACIONES_POR_TAREA)]
+    tareas = list(zip(tamanos, np.random.SeedSequence(semilla).spawn(len(tamanos))))
+
+    if len(tareas) > 1 and MAX_PROCESOS > 1 and simulaciones * num_jugadores * restantes >= MIN_CELDAS_PROCESOS:
+        # Un grupo de tareas por proceso: las tablas se envían una vez a cada uno
+        grupos = [tareas[i::MAX_PROCESOS] for i in range(min(MAX_PROCESOS, len(tareas)))]
+        resultados = list(_obtener_ejecutor().map(simular_tareas, [sorteos] * len(grupos),
+                                                  [totales] * len(grupos), grupos))
+    else:
+        resultados = [simular_tareas(sorteos, totales, tareas)]
+    titulos, podios, ultimos, suma, suma_cuadrados = (sum(partes) for partes in zip(*resultados))
+
+    media = suma / simulaciones
+    desviacion = np.sqrt(np.maximum(suma_cuadrados / simulaciones - media ** 2, 0))
+    df = pd.DataFrame({
+        'jugador': m.jugadores,
+        'Puntos Actuales': m.acumulado[:, -1],
+        'Puntos Esperados': np.round(media, 1),
+        'Desviación': np.round(desviacion, 1),
+        '% Campeón': np.round(100 * titulos / simulaciones, 2),
+        '% Podio': np.round(100 * podios / simulaciones, 2),
+        '% Último': np.round(100 * ultimos / simulaciones, 2),
+    }, columns=columnas)
+    return df.sort_values(by=['% Campeón', 'Puntos Esperados'], ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Las pruebas nunca tocan fantasy.db: datos.engine se crea al importar el módulo con
+# FANTASY_DB_URL, así que se fija aquí, antes de que ningún test importe datos.py.
+CARPETA_PRUEBAS = tempfile.mkdtemp(prefix="fantasy_pruebas_")
+os.environ["FANTASY_DB_URL"] = f"sqlite:///{os.path.join(CARPETA_PRUEBAS, 'pruebas.db')}"
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
@@ -0,0 +1,20 @@
+import pytest
+import autenticacion
+
+@pytest.fixture(autouse=True)
+def limitador_vacio():
+    autenticacion._fallos.clear()
+    yield
+    autenticacion._fallos.clear()
+
+def test_los_intentos_sin_respuesta_a_tiempo_cuentan_para_el_limitador(monkeypatch):
+    monkeypatch.setattr(autenticacion, "TIMEOUT_VERIFICACION", 0.0001)
+    for _ in range(autenticacion.MAX_INTENTOS):
+        resultado, datos_usuario = autenticacion.verificar_credenciales("quien_sea", "x")
+        assert (resultado, datos_usuario) == (autenticacion.OCUPADO, None)
+    assert autenticacion.segundos_bloqueo("quien_sea") > 0
+    assert autenticacion.verificar_credenciales("quien_sea", "x")[0] == autenticacion.BLOQUEADO
+
+def test_usuario_inexistente_es_incorrecto_y_cuenta_como_fallo():
+    assert autenticacion.verificar_credenciales("no_existe", "x") == (autenticacion.INCORRECTO, None)
+    assert len(autenticacion._fallos["no_existe"]) == 1
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+import benchmark
+from conftest import RAIZ
+
+def _informe(medianas):
+    return {"resultados": [
+        {"escala": escala, "caso": caso, "mediana_s": mediana}
+        for (escala, caso), mediana in medianas.items()
+    ]}
+
+def _comparar_cli(tmp_path, base, nuevo, *opciones):
+    ruta_base, ruta_nuevo = tmp_path / "base.json", tmp_path / "nuevo.json"
+    ruta_base.write_text(json.dumps(base), encoding="utf-8")
+    ruta_nuevo.write_text(json.dumps(nuevo), encoding="utf-8")
+    return subprocess.run(
+        [sys.executable, os.path.join(RAIZ, "benchmark.py"), "comparar", str(ruta_base), str(ruta_nuevo), *opciones],
+        capture_output=True, text=True, encoding="utf-8", cwd=tmp_path,
+    )
+
+def test_comparar_ordena_de_peor_a_mejor_ratio():
+    base = _informe({(10, "a"): 1.0, (10, "b"): 1.0, (10, "c"): 1.0})
+    nuevo = _informe({(10, "a"): 0.5, (10, "b"): 2.0, (10, "c"): 1.0, (10, "solo_nuevo"): 1.0})
+    filas = benchmark.comparar(base, nuevo)
+    assert [(caso, ratio) for _, caso, _, _, ratio in filas] == [("b", 2.0), ("c", 1.0), ("a", 0.5)]
+
+def test_comparar_sin_regresiones_sale_con_0(tmp_path):
+    base = _informe({(10, "a"): 1.0, (1000, "a"): 2.0})
+    nuevo = _informe({(10, "a"): 1.1, (1000, "a"): 1.0})
+    resultado = _comparar_cli(tmp_path, base, nuevo)
+    assert resultado.returncode == 0, resultado.stdout + resultado.stderr
+    assert "REGRESIÓN" not in resultado.stdout
+    assert "mejora" in resultado.stdout
+
+def test_comparar_con_regresion_sale_con_1(tmp_path):
+    base = _informe({(10, "a"): 1.0, (10, "b"): 1.0})
+    nuevo = _informe({(10, "a"): 1.0, (10, "b"): 1.3})
+    resultado = _comparar_cli(tmp_path, base, nuevo)
+    assert resultado.returncode == 1, resultado.stdout + resultado.stderr
+    assert resultado.stdout.count("REGRESIÓN") == 1
+
+def test_comparar_respeta_el_umbral(tmp_path):
+    base = _informe({(10, "a"): 1.0})
+    nuevo = _informe({(10, "a"): 1.3})
+    assert _comparar_cli(tmp_path, base, nuevo, "--umbral", "1.5").returncode == 0
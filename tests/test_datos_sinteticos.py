@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+import datos
+import datos_sinteticos
+from db_setup import aplicar_migraciones
+
+@pytest.fixture(scope="module")
+def engine():
+    aplicar_migraciones(datos.engine)
+    return datos.engine
+
+@pytest.mark.parametrize("distribucion", datos_sinteticos.DISTRIBUCIONES)
+def test_generar_puntos_forma_y_valores(distribucion):
+    df = datos_sinteticos.generar_puntos(25, 10, distribucion, semilla=3)
+    assert list(df.columns) == ["jugador", "jornada", "puntos"]
+    assert len(df) == 25 * 10
+    assert df["jugador"].nunique() == 25
+    assert sorted(df["jornada"].unique()) == list(range(1, 11))
+    assert (df["puntos"] >= 0).all()
+    assert np.issubdtype(df["puntos"].dtype, np.integer)
+    assert not df.duplicated(["jugador", "jornada"]).any()
+
+def test_generar_puntos_es_reproducible_con_la_semilla():
+    a = datos_sinteticos.generar_puntos(50, 5, semilla=7)
+    b = datos_sinteticos.generar_puntos(50, 5, semilla=7)
+    c = datos_sinteticos.generar_puntos(50, 5, semilla=8)
+    pd.testing.assert_frame_equal(a, b)
+    assert not a["puntos"].equals(c["puntos"])
+
+def test_generar_puntos_nombres_ordenados_como_numeros():
+    nombres = datos_sinteticos.generar_puntos(120, 1)["jugador"].tolist()
+    assert nombres == sorted(nombres)
+
+def test_generar_puntos_con_ausencias():
+    df = datos_sinteticos.generar_puntos(200, 20, prob_ausencia=0.5, semilla=1)
+    assert 0.4 * 200 * 20 < len(df) < 0.6 * 200 * 20
+    assert len(datos_sinteticos.generar_puntos(10, 5, prob_ausencia=1.0)) == 0
+
+def test_generar_puntos_distribucion_desconocida():
+    with pytest.raises(ValueError):
+        datos_sinteticos.generar_puntos(10, 5, "exponencial")
+
+def test_crear_liga_sintetica_escribe_puntos_y_clasificacion(engine):
+    df = datos_sinteticos.generar_puntos(30, 6, semilla=2)
+    liga_id = datos_sinteticos.crear_liga_sintetica(engine, "Prueba sintética", df)
+    with engine.connect() as connection:
+        assert connection.execute(text(
+            "SELECT COUNT(*) FROM Puntos WHERE liga_id = :id"), {"id": liga_id}).scalar() == len(df)
+        assert datos.obtener_version_liga(connection, liga_id) == 1
+    clasificacion = datos.leer_clasificacion(engine, liga_id).set_index("jugador")["Puntos Totales"]
+    esperada = df.groupby("jugador")["puntos"].sum()
+    pd.testing.assert_series_equal(clasificacion.sort_index(), esperada.sort_index(), check_names=False)
+
+def test_crear_liga_sintetica_sustituye_la_liga(engine):
+    primera = datos_sinteticos.generar_puntos(40, 4, semilla=4)
+    segunda = datos_sinteticos.generar_puntos(10, 3, semilla=5)
+    liga_id = datos_sinteticos.crear_liga_sintetica(engine, "Prueba sustitución", primera)
+    assert datos_sinteticos.crear_liga_sintetica(engine, "Prueba sustitución", segunda) == liga_id
+    assert datos.leer_jugadores(engine, liga_id) == sorted(segunda["jugador"].unique())
+    assert datos.leer_max_jornada(engine, liga_id) == 3
+    with engine.connect() as connection:
+        assert datos.obtener_version_liga(connection, liga_id) == 2
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import text
+import datos
+import db_setup
+
+def _bd_en_version_4(ruta):
+    """BD con el esquema anterior a la tabla Jugadores: una liga con puntos y 2 puntos
+    de una liga ya borrada (se insertan sin comprobar las FOREIGN KEY)."""
+    engine = datos.crear_engine(f"sqlite:///{ruta}")
+    for version, (_, migracion) in enumerate(db_setup.MIGRACIONES[:4], start=1):
+        with engine.begin() as connection:
+            migracion(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {version}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        connection.execute(text("INSERT INTO Ligas (id, nombre) VALUES (1, 'Viva')"))
+        connection.execute(text(
+            "INSERT INTO Puntos (liga_id, jugador, jornada, puntos) VALUES "
+            "(1, 'Ana', 1, 10), (1, 'Ana', 2, 20), (1, 'Bea', 1, 5), (99, 'Eva', 1, 7), (99, 'Eva', 2, 8)"
+        ))
+    return engine
+
+def test_migracion_jugadores_aborta_si_descartaria_puntos(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_setup, "DESCARTAR_HUERFANOS", False)
+    engine = _bd_en_version_4(tmp_path / "antigua.db")
+    with pytest.raises(db_setup.MigracionConPerdidas, match="2 puntos"):
+        db_setup.aplicar_migraciones(engine)
+    with engine.connect() as connection:
+        # Nada se ha tocado: sigue en la versión 4 con todos sus puntos
+        assert db_setup.obtener_version_esquema(connection) == 4
+        assert connection.execute(text("SELECT COUNT(*) FROM Puntos")).scalar() == 5
+
+def test_migracion_jugadores_descarta_con_permiso_y_lo_cuenta(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_setup, "DESCARTAR_HUERFANOS", True)
+    engine = _bd_en_version_4(tmp_path / "antigua.db")
+    aplicadas = db_setup.aplicar_migraciones(engine)
+    assert any(m.startswith("5:") and "descartados 2 puntos" in m for m in aplicadas)
+    with engine.connect() as connection:
+        assert db_setup.obtener_version_esquema(connection) == len(db_setup.MIGRACIONES)
+        assert connection.execute(text("SELECT COUNT(*) FROM Puntos")).scalar() == 3
+    assert datos.leer_clasificacion(engine, 1)["Puntos Totales"].tolist() == [30, 5]
+
+def test_migraciones_sin_huerfanos_no_avisan(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_setup, "DESCARTAR_HUERFANOS", False)
+    engine = datos.crear_engine(f"sqlite:///{tmp_path / 'nueva.db'}")
+    aplicadas = db_setup.aplicar_migraciones(engine)
+    assert len(aplicadas) == len(db_setup.MIGRACIONES)
+    assert not any("⚠️" in m for m in aplicadas)
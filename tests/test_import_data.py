@@ -0,0 +1,69 @@
+from io import StringIO
+import pytest
+from sqlalchemy import text
+import datos
+import datos_sinteticos
+import import_data
+from db_setup import aplicar_migraciones
+
+@pytest.fixture(scope="module")
+def engine():
+    aplicar_migraciones(datos.engine)
+    return datos.engine
+
+def _csv_largo(df):
+    return StringIO(df.to_csv(index=False))
+
+def _puntos(engine, liga_id):
+    with engine.connect() as connection:
+        return dict(connection.execute(text(
+            "SELECT j.nombre || '-' || p.jornada, p.puntos FROM Puntos p "
+            "JOIN Jugadores j ON j.id = p.jugador_id WHERE p.liga_id = :id"
+        ), {"id": liga_id}).all())
+
+def test_delta_con_filas_repetidas_cuenta_la_ultima(engine):
+    df = datos_sinteticos.generar_puntos(3, 2, semilla=1)
+    liga_id = datos_sinteticos.crear_liga_sintetica(engine, "Delta repetidos", df)
+    nombre = df["jugador"].iloc[0]
+    repetidas = df.copy()
+    repetidas.loc[len(repetidas)] = [nombre, 3, 10]   # nueva, repetida en otro bloque
+    repetidas.loc[len(repetidas)] = [nombre, 1, 500]  # modificada...
+    repetidas.loc[len(repetidas)] = [nombre, 3, 20]
+    repetidas.loc[len(repetidas)] = [nombre, 1, 600]  # ...y vuelta a modificar
+
+    resumen, _ = import_data.importar_csv_delta(_csv_largo(repetidas), liga_id, "largo", tam_bloque=4)
+
+    assert resumen == {"nuevos": 1, "modificados": 1, "sin_cambios": 5, "eliminados": 0, "repetidos": 3}
+    puntos = _puntos(engine, liga_id)
+    assert puntos[f"{nombre}-1"] == 600 and puntos[f"{nombre}-3"] == 20
+    assert len(puntos) == 7
+
+def test_delta_grande_usa_carga_masiva_y_recalcula(engine, monkeypatch):
+    monkeypatch.setattr(import_data, "MIN_CAMBIOS_CARGA_MASIVA", 5)
+    llamadas = []
+    for nombre in ("iniciar_carga_masiva", "finalizar_carga_masiva"):
+        original = getattr(import_data, nombre)
+        monkeypatch.setattr(import_data, nombre,
+                            lambda c, l, n=nombre, f=original: (llamadas.append(n), f(c, l)))
+    df = datos_sinteticos.generar_puntos(4, 3, semilla=2)
+    liga_id = datos_sinteticos.crear_liga_sintetica(engine, "Delta masivo", df)
+    cambiado = df.assign(puntos=df["puntos"] + 1)
+    cambiado = cambiado[cambiado["jornada"] < 3]  # la jornada 3 queda ausente
+
+    resumen, _ = import_data.importar_csv_delta(_csv_largo(cambiado), liga_id, "largo", borrar_ausentes=True)
+
+    assert llamadas == ["iniciar_carga_masiva", "finalizar_carga_masiva"]
+    assert resumen["modificados"] == 8 and resumen["eliminados"] == 4
+    esperada = cambiado.groupby("jugador")["puntos"].sum().sort_values(ascending=False)
+    clasificacion = datos.leer_clasificacion(engine, liga_id)
+    assert clasificacion["Puntos Totales"].tolist() == esperada.tolist()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM CargasMasivas")).scalar() == 0
+
+def test_delta_pequeno_no_usa_carga_masiva(engine, monkeypatch):
+    monkeypatch.setattr(import_data, "iniciar_carga_masiva", lambda *a: pytest.fail("carga masiva"))
+    df = datos_sinteticos.generar_puntos(2, 2, semilla=3)
+    liga_id = datos_sinteticos.crear_liga_sintetica(engine, "Delta pequeño", df)
+    resumen, _ = import_data.importar_csv_delta(_csv_largo(df.assign(puntos=df["puntos"] + 1)), liga_id, "largo")
+    assert resumen["modificados"] == 4
+    assert datos.leer_clasificacion(engine, liga_id)["Puntos Totales"].sum() == df["puntos"].sum() + 4
@@ -0,0 +1,36 @@
+import numpy as np
+import datos_sinteticos
+import matriz_liga
+import proyeccion
+
+def _matriz(jugadores=40, jornadas=10):
+    df = datos_sinteticos.generar_puntos(jugadores, jornadas, prob_ausencia=0.1, semilla=11)
+    return matriz_liga.construir_matriz(df["jugador"], df["jornada"], df["puntos"])
+
+def test_preparar_sorteos_cubre_las_jornadas_restantes(monkeypatch):
+    monkeypatch.setattr(proyeccion, "MAX_TABLA", 5_000)
+    valores, inicio, cuenta = proyeccion.distribuciones(_matriz())
+    sorteos = proyeccion.preparar_sorteos(valores, inicio, cuenta, 7)
+    tam = proyeccion.tamano_grupo(cuenta, 7)
+    assert 1 < tam < 7
+    assert len(sorteos) == 7 // tam + (1 if 7 % tam else 0)
+    # Los sorteos completos comparten la misma tabla (se construye una sola vez)
+    assert all(sorteo is sorteos[0] for sorteo in sorteos[:7 // tam])
+    assert proyeccion.preparar_sorteos(valores, inicio, cuenta, 0) == []
+
+def test_repartir_tareas_en_grupos_no_cambia_el_resultado():
+    m = _matriz()
+    sorteos = proyeccion.preparar_sorteos(*proyeccion.distribuciones(m), 5)
+    totales = m.acumulado[:, -1]
+    tareas = list(zip([300, 300, 200], np.random.SeedSequence(4).spawn(3)))
+    juntas = proyeccion.simular_tareas(sorteos, totales, tareas)
+    grupos = [proyeccion.simular_tareas(sorteos, totales, tareas[i::2]) for i in range(2)]
+    por_grupos = tuple(sum(partes) for partes in zip(*grupos))
+    for a, b in zip(juntas, por_grupos):
+        np.testing.assert_allclose(a, b)
+
+def test_simular_probabilidades_coherentes():
+    df = proyeccion.simular(_matriz(), 15, simulaciones=2_000, semilla=1)
+    assert round(df["% Campeón"].sum()) == 100
+    assert round(df["% Podio"].sum()) == 300
+    assert df.equals(proyeccion.simular(_matriz(), 15, simulaciones=2_000, semilla=1))